@@ -0,0 +1,704 @@
+# asmcode.py
+'''
+Código nativo x86-64
+====================
+Traduce el AST (con los nombres resueltos) a assembly x86-64 (sintaxis AT&T de GNU
+as, System V) y lo enlaza con el runtime pl0rt.c usando el compilador
+de C del sistema para obtener un ejecutable.
+
+Cada función PL0 es una función nativa con su frame en la pila:
+
+    16+8*(n-1-i)(%rbp)  argumento i (los apila el llamador)
+     8(%rbp)            dirección de retorno
+     0(%rbp)            %rbp del llamador
+    -8(%rbp)            enlace estático (llega en %r10; 0 en nivel 0)
+    -16(%rbp)           valor de retorno
+    -24-8*s(%rbp)       slot s (parámetros y variables, como en interp.py)
+
+Las variables de funciones que encierran a la actual se alcanzan
+siguiendo el enlace estático tantas veces como diga su Binding. Los
+enteros son de 64 bits; un flotante ocupa una palabra con los bits del
+double. Una expresión deja su valor en %rax (int y bool) o en %xmm0
+(float) y los valores intermedios se apilan.
+
+Un array es un puntero a un bloque del runtime con la longitud en la
+primera palabra: a[i] está en 8(a,i,8) y cada acceso compara i con la
+longitud, menos los que bounds.py demuestra dentro del rango. Los
+arrays locales se reservan al entrar a la función y se liberan al
+salir, menos el que devuelve la función: ese queda para el llamador y
+no se libera. Los parámetros array son el mismo puntero (por
+referencia, como en el intérprete).
+
+Los errores en tiempo de ejecución (índice fuera de rango, división
+por cero, entrada inválida) llaman a pl0_error con la línea del nodo,
+que los escribe en stderr y termina con código 1.
+
+usage: python asmcode.py file.pl0 [out]
+'''
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+
+from bounds import BoundsAnalysis
+from cfg import functions
+from model import *
+from interp import PL0RuntimeError, decode_string
+from resolve import Resolver
+from typeinfo import datatype, element_type, expr_type, return_types
+from typesys import bool_type, check_binary_code, check_unary_code, float_type, int_type, lookup_type, opcodes
+
+RUNTIME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pl0rt.c')
+
+LINK, RETVAL = -8, -16
+
+_int_ops = {'+': 'addq', '-': 'subq', '*': 'imulq'}
+_float_ops = {'+': 'addsd', '-': 'subsd', '*': 'mulsd', '/': 'divsd'}
+_conditions = {'<': 'l', '<=': 'le', '>': 'g', '>=': 'ge', '==': 'e', '!=': 'ne'}
+_negated = {'<': 'ge', '<=': 'g', '>': 'le', '>=': 'l', '==': 'ne', '!=': 'e'}
+
+
+def slot_offset(slot):
+    return -24 - 8 * slot
+
+
+def type_name(dtype):
+    if isinstance(dtype, ArrayType):
+        return f'{dtype.name}[]'
+    return dtype.name if dtype else 'nothing'
+
+
+def same_type(a, b):
+    if isinstance(a, ArrayType) and isinstance(b, ArrayType):
+        return a.name == b.name
+    return a is b
+
+
+class AsmGenerator(Visitor):
+    '''
+    Genera el assembly de un Program. lines(node) da la línea de un
+    nodo para los mensajes de error; con comment(node), cada
+    instrucción PL0 va precedida de un comentario (opción -D).
+    '''
+    def __init__(self, lines=None, comment=None):
+        self.lines = lines or (lambda node: 0)
+        self.comment = comment
+        self.names = {}         # id(FunDefinition) -> etiqueta
+        self.returns = {}       # id(FunDefinition) -> tipo de retorno
+        self.functions = []     # código de cada función (listas de líneas)
+        self.code = None        # función que se está generando
+        self.func = None
+        self.loops = []         # etiquetas de salida de los while abiertos
+        self.nlabels = 0
+        self.floats = {}        # bits del double -> etiqueta
+        self.strings = {}       # texto -> etiqueta
+        self.errors = {}        # (mensaje, línea) -> etiqueta
+        self.stubs = []
+        self.bounds = None      # bounds.BoundsAnalysis del programa
+
+    @classmethod
+    def generate(cls, node, lines=None, comment=None):
+        '''
+        Generador que ya recorrió node: el assembly sale de assembly()
+        y la cuenta de chequeos eliminados de bounds.
+        '''
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        errors = Resolver.resolve(node)
+        if errors:
+            raise PL0RuntimeError(*errors[0])
+        gen = cls(lines, comment)
+        gen.bounds = BoundsAnalysis(node)
+        gen.visit(node)
+        return gen
+
+    @classmethod
+    def gencode(cls, node, lines=None, comment=None):
+        return cls.generate(node, lines, comment).assembly()
+
+    def assembly(self):
+        out = ['\t.text']
+        for code in self.functions:
+            out.extend(code)
+        out.extend(self.stubs)
+        out.append('\t.section .rodata')
+        if self.floats:
+            out.append('\t.balign 8')
+        for bits, label in self.floats.items():
+            out.append(f'{label}:\t.quad {bits:#x}')
+        for text, label in self.strings.items():
+            out.append(f'{label}:\t.asciz "{escape(text)}"')
+        out.append('\t.section .note.GNU-stack,"",@progbits')
+        return '\n'.join(out) + '\n'
+
+    # Emisión ----------------------------------------------------------
+    def emit(self, instruction):
+        self.code.append('\t' + instruction)
+
+    def place(self, label):
+        self.code.append(label + ':')
+
+    def new_label(self):
+        self.nlabels += 1
+        return f'.L{self.nlabels}'
+
+    def float_label(self, value):
+        bits = struct.unpack('<Q', struct.pack('<d', value))[0]
+        if bits not in self.floats:
+            self.floats[bits] = f'.LF{len(self.floats)}'
+        return self.floats[bits]
+
+    def string_label(self, text):
+        if text not in self.strings:
+            self.strings[text] = f'.LS{len(self.strings)}'
+        return self.strings[text]
+
+    def error_label(self, message, node):
+        '''
+        Etiqueta de un salto que termina el programa con message; una
+        sola por mensaje y línea.
+        '''
+        key = (message, self.lines(node))
+        if key not in self.errors:
+            label = self.errors[key] = f'.LE{len(self.errors)}'
+            self.stubs += [
+                f'{label}:',
+                f'\tleaq {self.string_label(message)}(%rip), %rdi',
+                f'\tmovq ${key[1]}, %rsi',
+                '\tandq $-16, %rsp',
+                '\tcall pl0_error',
+            ]
+        return self.errors[key]
+
+    def ccall(self, name):
+        # El ABI pide la pila alineada a 16 en una llamada a C; %rbx
+        # lo preserva el runtime
+        self.emit('movq %rsp, %rbx')
+        self.emit('andq $-16, %rsp')
+        self.emit(f'call {name}')
+        self.emit('movq %rbx, %rsp')
+
+    def push(self, dtype):
+        if dtype is float_type:
+            self.emit('movq %xmm0, %rax')
+        self.emit('pushq %rax')
+
+    def frame(self, depth):
+        '''
+        Registro con el frame que está depth enlaces estáticos arriba.
+        '''
+        if depth == 0:
+            return '%rbp'
+        self.emit(f'movq {LINK}(%rbp), %r11')
+        for _ in range(depth - 1):
+            self.emit(f'movq {LINK}(%r11), %r11')
+        return '%r11'
+
+    def address(self, loc):
+        return f'{slot_offset(loc.binding.slot)}({self.frame(loc.binding.depth)})'
+
+    def load(self, dtype, operand):
+        if dtype is float_type:
+            self.emit(f'movsd {operand}, %xmm0')
+        else:
+            self.emit(f'movq {operand}, %rax')
+
+    def store(self, dtype, operand):
+        if dtype is float_type:
+            self.emit(f'movsd %xmm0, {operand}')
+        else:
+            self.emit(f'movq %rax, {operand}')
+
+    def expect(self, n, dtype):
+        '''
+        Genera n y comprueba que su tipo sea dtype: en código nativo un
+        int y un float no son intercambiables como en el intérprete.
+        '''
+        result = self.visit(n)
+        if not same_type(result, dtype):
+            raise PL0RuntimeError(f'Type mismatch: expected {type_name(dtype)}, got {type_name(result)}', n)
+        return result
+
+    def operand(self, n):
+        '''
+        Operando directo (inmediato o memoria) para una hoja que no
+        necesita código propio, o None.
+        '''
+        if isinstance(n, Integer) and -2**31 <= int(n.value) < 2**31:
+            return f'${int(n.value)}'
+        if isinstance(n, Float):
+            return f'{self.float_label(float(n.value))}(%rip)'
+        if isinstance(n, SimpleLocation) and n.binding.depth == 0 \
+           and not isinstance(n.binding.decl.datatype, ArrayType):
+            return f'{slot_offset(n.binding.slot)}(%rbp)'
+        return None
+
+    # Declaraciones ----------------------------------------------------
+    def visit(self, n: Program):
+        funcs = functions(n)
+        self.returns = return_types(funcs)
+        for k, func in enumerate(funcs):
+            self.names[id(func)] = f'pl0_{k}_{func.name}'
+        for func in n.funclist:
+            self.visit(func)
+        for func in n.funclist:
+            if func.name == 'main':
+                self.entry(func)
+                return
+        raise PL0RuntimeError('Program has no main function')
+
+    def entry(self, main):
+        # pl0_main preserva los registros que usa el código generado;
+        # los parámetros de main, si tiene, empiezan en cero
+        nparms = len(main.parmlist.parmlist) if main.parmlist else 0
+        self.code = []
+        self.functions.append(self.code)
+        self.code += ['\t.globl pl0_main', '\t.type pl0_main, @function', 'pl0_main:']
+        self.emit('pushq %rbx')
+        self.emit('pushq %rbp')
+        for _ in range(nparms):
+            self.emit('pushq $0')
+        self.emit('xorl %r10d, %r10d')
+        self.emit(f'call {self.names[id(main)]}')
+        self.emit(f'addq ${8 * nparms}, %rsp')
+        self.emit('popq %rbp')
+        self.emit('popq %rbx')
+        self.emit('ret')
+
+    def visit(self, n: FunDefinition):
+        outer = (self.code, self.func, self.loops)
+        self.code, self.func, self.loops = [], n, []
+        self.functions.append(self.code)
+        self.exit = self.new_label()
+
+        parms = n.parmlist.parmlist if n.parmlist else []
+        locals_ = n.varlist.varlist if n.varlist else []
+        arrays = [var for var in locals_
+                  if isinstance(var, VarDefinition) and isinstance(var.datatype, ArrayType)]
+
+        label = self.names[id(n)]
+        self.code += [f'\t.type {label}, @function', f'{label}:']
+        self.emit('pushq %rbp')
+        self.emit('movq %rsp, %rbp')
+        size = (16 + 8 * n.nslots + 15) // 16 * 16
+        self.emit(f'subq ${size}, %rsp')
+        self.emit(f'movq %r10, {LINK}(%rbp)')
+        # Valor de retorno y variables en cero
+        nzero = n.nslots - len(parms) + 1
+        if nzero > 8:
+            self.emit(f'leaq {slot_offset(n.nslots - 1)}(%rbp), %rdi')
+            self.emit(f'movl ${nzero - 1}, %ecx')
+            self.emit('xorl %eax, %eax')
+            self.emit('rep stosq')
+            self.emit(f'movq %rax, {RETVAL}(%rbp)')
+        else:
+            self.emit(f'movq $0, {RETVAL}(%rbp)')
+            for slot in range(len(parms), n.nslots):
+                self.emit(f'movq $0, {slot_offset(slot)}(%rbp)')
+        for i, parm in enumerate(parms):
+            self.emit(f'movq {16 + 8 * (len(parms) - 1 - i)}(%rbp), %rax')
+            self.emit(f'movq %rax, {slot_offset(parm.slot)}(%rbp)')
+        for var in arrays:
+            self.expect(var.datatype.dim, int_type)
+            self.emit('movq %rax, %rdi')
+            self.ccall('pl0_array_new')
+            self.emit(f'movq %rax, {slot_offset(var.slot)}(%rbp)')
+
+        self.visit(n.stmtlist)
+
+        self.place(self.exit)
+        returns_array = isinstance(self.returns[id(n)], ArrayType)
+        for var in arrays:
+            self.emit(f'movq {slot_offset(var.slot)}(%rbp), %rdi')
+            if returns_array:
+                # El array que se devuelve lo sigue usando el llamador
+                keep = self.new_label()
+                self.emit(f'cmpq {RETVAL}(%rbp), %rdi')
+                self.emit(f'je {keep}')
+                self.ccall('pl0_array_free')
+                self.place(keep)
+            else:
+                self.ccall('pl0_array_free')
+        self.emit(f'movq {RETVAL}(%rbp), %rax')
+        self.emit('leave')
+        self.emit('ret')
+
+        self.code, self.func, self.loops = outer
+        for var in locals_:
+            if isinstance(var, FunDefinition):
+                self.visit(var)
+
+    # Instrucciones ----------------------------------------------------
+    def statement(self, n):
+        if self.comment and not isinstance(n, StmtList):
+            self.code.append(f'# {self.comment(n)}')
+        self.visit(n)
+
+    def visit(self, n: StmtList):
+        for stmt in n.stmtlist:
+            self.statement(stmt)
+
+    def visit(self, n: Skip):
+        pass
+
+    def visit(self, n: Assign):
+        loc = n.location
+        if isinstance(loc, ArrayLocation):
+            # Como en el intérprete: valor, índice y después el array
+            self.push(self.expect(n.expr, element_type(loc.binding.decl)))
+            self.element(loc)
+            self.emit('popq %rdx')
+            self.emit('movq %rdx, 8(%rcx,%rax,8)')
+        else:
+            dtype = self.expect(n.expr, datatype(loc.binding.decl))
+            self.store(dtype, self.address(loc))
+
+    def visit(self, n: While):
+        top, done = self.new_label(), self.new_label()
+        self.place(top)
+        self.branch_false(n.relation, done)
+        self.loops.append(done)
+        self.statement(n.stmt)
+        self.loops.pop()
+        self.emit(f'jmp {top}')
+        self.place(done)
+
+    def visit(self, n: IfStmt):
+        skip = self.new_label()
+        self.branch_false(n.relation, skip)
+        self.statement(n.thenstmt)
+        if n.elsestmt:
+            done = self.new_label()
+            self.emit(f'jmp {done}')
+            self.place(skip)
+            self.statement(n.elsestmt)
+            self.place(done)
+        else:
+            self.place(skip)
+
+    def visit(self, n: Return):
+        dtype = self.expect(n.value, self.returns[id(self.func)])
+        if dtype is float_type:
+            self.emit('movq %xmm0, %rax')
+        self.emit(f'movq %rax, {RETVAL}(%rbp)')
+        self.emit(f'jmp {self.exit}')
+
+    def visit(self, n: Break):
+        if not self.loops:
+            raise PL0RuntimeError('break outside of a while loop', n)
+        self.emit(f'jmp {self.loops[-1]}')
+
+    def visit(self, n: Print):
+        self.emit(f'leaq {self.string_label(decode_string(n.value))}(%rip), %rdi')
+        self.ccall('pl0_print')
+
+    def visit(self, n: Write):
+        dtype = self.visit(n.expr)
+        if isinstance(dtype, ArrayType):
+            raise PL0RuntimeError(f'Cannot write {type_name(dtype)}', n)
+        if dtype is float_type:
+            self.ccall('pl0_write_float')
+            return
+        self.emit('movq %rax, %rdi')
+        self.ccall('pl0_write_bool' if dtype is bool_type else 'pl0_write_int')
+
+    def visit(self, n: Read):
+        loc = n.location
+        dtype = element_type(loc.binding.decl)
+        self.emit(f'leaq {self.string_label(loc.name)}(%rip), %rdi')
+        self.emit(f'movq ${self.lines(n)}, %rsi')
+        if dtype is float_type:
+            self.ccall('pl0_read_float')
+        else:
+            self.ccall('pl0_read_int')
+        if isinstance(loc, ArrayLocation):
+            self.push(dtype)
+            self.element(loc)
+            self.emit('popq %rdx')
+            self.emit('movq %rdx, 8(%rcx,%rax,8)')
+        else:
+            self.store(dtype, self.address(loc))
+
+    def visit(self, n: FuncCall):
+        # Una llamada usada como instrucción descarta el resultado
+        decl = n.binding.decl
+        args = n.arglist.arglist if n.arglist else []
+        nparms = len(decl.parmlist.parmlist) if decl.parmlist else 0
+        if len(args) != nparms:
+            raise PL0RuntimeError(f'{n.name} expects {nparms} arguments, got {len(args)}', n)
+        for arg, parm in zip(args, decl.parmlist.parmlist if args else []):
+            self.push(self.expect(arg, datatype(parm)))
+        if decl.level:
+            self.emit(f'movq {self.frame(n.binding.depth)}, %r10')
+        self.emit(f'call {self.names[id(decl)]}')
+        if args:
+            self.emit(f'addq ${8 * len(args)}, %rsp')
+        dtype = self.returns[id(decl)]
+        if dtype is float_type:
+            self.emit('movq %rax, %xmm0')
+        return dtype
+
+    # Expresiones ------------------------------------------------------
+    def visit(self, n: Integer):
+        value = int(n.value)
+        if not -2**63 <= value < 2**63:
+            raise PL0RuntimeError(f'Integer constant {value} does not fit in 64 bits', n)
+        if value == 0:
+            self.emit('xorl %eax, %eax')
+        elif -2**31 <= value < 2**31:
+            self.emit(f'movq ${value}, %rax')
+        else:
+            self.emit(f'movabsq ${value}, %rax')
+        return int_type
+
+    def visit(self, n: Float):
+        self.emit(f'movsd {self.float_label(float(n.value))}(%rip), %xmm0')
+        return float_type
+
+    def visit(self, n: SimpleLocation):
+        dtype = datatype(n.binding.decl)
+        self.load(dtype, self.address(n))
+        return dtype
+
+    def visit(self, n: ArrayLocation):
+        dtype = element_type(n.binding.decl)
+        self.element(n)
+        self.load(dtype, '8(%rcx,%rax,8)')
+        return dtype
+
+    def element(self, n):
+        # Índice en %rax y array en %rcx, ya comparado con la longitud
+        # (sin signo: un índice negativo también queda fuera) salvo que
+        # bounds.py haya demostrado que está en rango
+        self.expect(n.index, int_type)
+        self.emit(f'movq {self.address(n)}, %rcx')
+        if self.bounds and id(n) in self.bounds.safe:
+            return
+        self.emit('cmpq (%rcx), %rax')
+        self.emit(f'jae {self.error_label(f"Index out of range in {n.name}", n)}')
+
+    def visit(self, n: TypeCast):
+        source = self.visit(n.expr)
+        if source not in (int_type, float_type):
+            raise PL0RuntimeError(f'Cannot convert {type_name(source)} to {n.name}', n)
+        target = lookup_type(n.name)
+        if target is float_type and source is not float_type:
+            self.emit('cvtsi2sdq %rax, %xmm0')
+        elif target is int_type and source is float_type:
+            self.emit('cvttsd2siq %xmm0, %rax')
+        return target
+
+    def operands(self, n):
+        '''
+        Evalúa n.left en %rax/%xmm0 y devuelve (tipo de los operandos,
+        operando derecho): un inmediato o una dirección si n.right es
+        una hoja, si no %rcx o %xmm1 con su valor ya calculado.
+        '''
+        left, right = n.left, n.right
+        direct = self.operand(right)
+        ltype = self.visit(left)
+        rtype = expr_type(right, self.returns) if direct else None
+        if not direct:
+            self.push(ltype)
+            rtype = self.visit(right)
+        if check_binary_code(opcodes[n.op], ltype, rtype) is None:
+            raise PL0RuntimeError(f'Unsupported operation {type_name(ltype)} {n.op} {type_name(rtype)}', n)
+        if direct:
+            return ltype, direct
+        if ltype is float_type:
+            self.emit('movapd %xmm0, %xmm1')
+            self.emit('movsd (%rsp), %xmm0')
+            self.emit('addq $8, %rsp')
+            return ltype, '%xmm1'
+        self.emit('movq %rax, %rcx')
+        self.emit('popq %rax')
+        return ltype, '%rcx'
+
+    def visit(self, n: Binary):
+        dtype, right = self.operands(n)
+        if dtype is float_type:
+            if n.op == '/':
+                if right != '%xmm1':
+                    self.emit(f'movsd {right}, %xmm1')
+                right = '%xmm1'
+                # Un NaN no es cero: ucomisd lo marca con PF
+                ok = self.new_label()
+                self.emit('xorpd %xmm2, %xmm2')
+                self.emit('ucomisd %xmm2, %xmm1')
+                self.emit(f'jp {ok}')
+                self.emit(f'je {self.error_label("Division by zero", n)}')
+                self.place(ok)
+            self.emit(f'{_float_ops[n.op]} {right}, %xmm0')
+        elif n.op == '/':
+            self.divide(right, n)
+        elif n.op == '*' and right.startswith('$'):
+            self.emit(f'imulq {right}, %rax, %rax')
+        else:
+            self.emit(f'{_int_ops[n.op]} {right}, %rax')
+        return dtype
+
+    def divide(self, right, n):
+        # idiv trunca hacia cero como interp.idiv; MIN / -1 desborda en
+        # idiv, así que -1 se resuelve con neg
+        if right.startswith('$'):
+            divisor = int(right[1:])
+            if divisor == -1:
+                self.emit('negq %rax')
+                return
+            self.emit(f'movq {right}, %rcx')
+            if divisor == 0:
+                self.emit(f'jmp {self.error_label("Division by zero", n)}')
+                return
+        else:
+            if right != '%rcx':
+                self.emit(f'movq {right}, %rcx')
+            self.emit('testq %rcx, %rcx')
+            self.emit(f'je {self.error_label("Division by zero", n)}')
+            divide, done = self.new_label(), self.new_label()
+            self.emit('cmpq $-1, %rcx')
+            self.emit(f'jne {divide}')
+            self.emit('negq %rax')
+            self.emit(f'jmp {done}')
+            self.place(divide)
+            self.emit('cqto')
+            self.emit('idivq %rcx')
+            self.place(done)
+            return
+        self.emit('cqto')
+        self.emit('idivq %rcx')
+
+    def compare(self, n):
+        '''
+        Compara los operandos de una relación. Para enteros deja los
+        flags y devuelve n.op (para jcc/setcc); para flotantes deja el
+        resultado en %rax y devuelve None.
+        '''
+        dtype, right = self.operands(n)
+        if dtype is not float_type:
+            self.emit(f'cmpq {right}, %rax')
+            return n.op
+        if right != '%xmm1':
+            self.emit(f'movsd {right}, %xmm1')
+        # ucomisd deja CF=ZF=PF=1 si alguno es NaN: seta/setae dan
+        # falso, == y != miran PF
+        if n.op in ('<', '<='):
+            self.emit('ucomisd %xmm0, %xmm1')
+            self.emit('seta %al' if n.op == '<' else 'setae %al')
+        elif n.op in ('>', '>='):
+            self.emit('ucomisd %xmm1, %xmm0')
+            self.emit('seta %al' if n.op == '>' else 'setae %al')
+        elif n.op == '==':
+            self.emit('ucomisd %xmm1, %xmm0')
+            self.emit('sete %al')
+            self.emit('setnp %cl')
+            self.emit('andb %cl, %al')
+        else:
+            self.emit('ucomisd %xmm1, %xmm0')
+            self.emit('setne %al')
+            self.emit('setp %cl')
+            self.emit('orb %cl, %al')
+        self.emit('movzbq %al, %rax')
+        return None
+
+    def visit(self, n: Logical):
+        if n.op in ('and', 'or'):
+            done = self.new_label()
+            self.expect(n.left, bool_type)
+            self.emit('testq %rax, %rax')
+            self.emit(f'{"je" if n.op == "and" else "jne"} {done}')
+            self.expect(n.right, bool_type)
+            self.place(done)
+            return bool_type
+        op = self.compare(n)
+        if op:
+            self.emit(f'set{_conditions[op]} %al')
+            self.emit('movzbq %al, %rax')
+        return bool_type
+
+    def branch_false(self, n, target):
+        '''
+        Salta a target si la condición n es falsa; las comparaciones de
+        enteros saltan directamente con los flags.
+        '''
+        if isinstance(n, Logical) and n.op == 'and':
+            self.branch_false(n.left, target)
+            self.branch_false(n.right, target)
+            return
+        if isinstance(n, Logical) and n.op != 'or':
+            op = self.compare(n)
+            if op:
+                self.emit(f'j{_negated[op]} {target}')
+                return
+        else:
+            self.expect(n, bool_type)
+        self.emit('testq %rax, %rax')
+        self.emit(f'je {target}')
+
+    def visit(self, n: Unary):
+        dtype = self.visit(n.fact)
+        if check_unary_code(opcodes[n.op], dtype) is None:
+            raise PL0RuntimeError(f'Unsupported operation {n.op} {type_name(dtype)}', n)
+        if n.op == 'not':
+            self.emit('xorq $1, %rax')
+        elif n.op == '-':
+            if dtype is float_type:
+                self.emit('movq %xmm0, %rax')
+                self.emit('btcq $63, %rax')
+                self.emit('movq %rax, %xmm0')
+            else:
+                self.emit('negq %rax')
+        return dtype
+
+
+def escape(text):
+    # Texto para .asciz: bytes UTF-8, con escapes octales fuera de ASCII
+    out = []
+    for byte in text.encode('utf-8'):
+        c = chr(byte)
+        if c in '"\\':
+            out.append('\\' + c)
+        elif 32 <= byte < 127:
+            out.append(c)
+        else:
+            out.append(f'\\{byte:03o}')
+    return ''.join(out)
+
+
+def assemble(assembly, out, cc=None):
+    '''
+    Enlaza el assembly con pl0rt.c en el ejecutable out. cc es el
+    compilador de C (por defecto $CC o cc).
+    '''
+    cc = cc or os.environ.get('CC') or 'cc'
+    if not shutil.which(cc):
+        raise PL0RuntimeError(f'C compiler {cc!r} not found')
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'program.s')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write(assembly)
+        result = subprocess.run([cc, '-O2', '-o', out, source, RUNTIME, '-lm'],
+                                capture_output=True, text=True)
+    if result.returncode:
+        raise PL0RuntimeError(f'{cc} failed:\n{result.stderr.strip()}')
+
+
+def main(argv):
+    from context import Context
+
+    if len(argv) not in (2, 3):
+        raise SystemExit('usage: python asmcode.py file.pl0 [out]')
+    context = Context()
+    with open(argv[1], encoding='utf-8') as f:
+        context.analyze(f.read())
+    assembly = context.assembly()
+    if assembly is None:
+        sys.exit(1)
+    if len(argv) == 3:
+        context.executable(argv[2], assembly)
+    else:
+        print(assembly, end='')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,145 @@
+# batch.py
+'''
+Compilación de muchos archivos en paralelo
+==========================================
+Recibe archivos, directorios (se buscan los *.pl0 recursivamente) o
+patrones glob, y reparte el análisis léxico, sintáctico y semántico de
+cada archivo entre varios procesos (ProcessPoolExecutor).
+
+Cada proceso crea un único Context (con su Lexer y su Parser) al
+arrancar y lo reutiliza para todos los archivos que le tocan. Los
+resultados se reportan en el orden de la lista de archivos, sin
+importar qué proceso termina primero, así que la salida es la misma
+con 1 o con N procesos (salvo los tiempos).
+
+Salvo con --no-cache, cada proceso usa el cache de cache.py: los
+archivos que no cambiaron desde la última compilación se recuperan de
+disco (columna 'cached' en la salida) y no pasan por el parser ni el
+checker.
+
+usage: python batch.py [-j JOBS] [--scanner {sly,fast}] [--no-cache] input [input ...]
+'''
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List
+
+from cache import ASTCache
+from context import Context
+from errors import Diagnostic
+
+
+@dataclass(slots=True)
+class FileResult:
+    fname: str
+    parse_time: float = 0.0     # lexer + parser (segundos)
+    check_time: float = 0.0     # resolución de nombres + checker
+    cached: bool = False        # recuperado del cache (todo en parse_time)
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+
+
+def expand(inputs):
+    '''
+    Lista ordenada y sin repetidos de los archivos a compilar.
+    '''
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, '**', '*.pl0'), recursive=True))
+        elif glob.has_magic(item):
+            files.extend(glob.glob(item, recursive=True))
+        else:
+            files.append(item)
+    return sorted(set(files))
+
+
+# Context de cada proceso (ver init_worker)
+_context = None
+
+
+def init_worker(scanner='sly', cache=True):
+    global _context
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    _context = Context(quiet=True, scanner=scanner, cache=ASTCache() if cache else None)
+
+
+def compile_file(fname):
+    result = FileResult(fname)
+    try:
+        with open(fname, encoding='utf-8') as file:
+            source = file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        result.diagnostics.append(Diagnostic('input', str(e)))
+        return result
+
+    _context.analyze(source, check=True)
+    result.parse_time = _context.parse_time
+    result.check_time = _context.check_time
+    result.cached = _context.cached
+    result.diagnostics = list(_context.diagnostics)
+    return result
+
+
+def compile_files(files, jobs=None, scanner='sly', cache=True):
+    '''
+    Compila los archivos y devuelve sus FileResult en el mismo orden.
+    Con jobs=1 todo corre en este proceso.
+    '''
+    if jobs == 1:
+        init_worker(scanner, cache)
+        return [compile_file(fname) for fname in files]
+    jobs = jobs or os.cpu_count()
+    chunksize = max(1, len(files) // (jobs * 8))
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(scanner, cache)) as pool:
+        return list(pool.map(compile_file, files, chunksize=chunksize))
+
+
+def run_batch(inputs, jobs=None, scanner='sly', cache=True, out=sys.stdout):
+    '''
+    Compila y reporta. Devuelve la cantidad de archivos con errores.
+    '''
+    files = expand(inputs)
+    jobs = jobs or os.cpu_count()
+    t = time.perf_counter()
+    results = compile_files(files, jobs, scanner, cache)
+    wall = time.perf_counter() - t
+
+    failed = 0
+    for r in results:
+        status = f'{len(r.diagnostics)} errors' if r.diagnostics else 'ok'
+        if r.cached:
+            status += ' (cached)'
+        print(f'{r.fname:<40} parse {r.parse_time * 1000:8.2f}ms  '
+              f'check {r.check_time * 1000:8.2f}ms  {status}', file=out)
+        for d in r.diagnostics:
+            print(f'    {r.fname}:{d.lineno}: [{d.stage}] {d.message}', file=out)
+        failed += bool(r.diagnostics)
+
+    busy = sum(r.parse_time + r.check_time for r in results)
+    print(f'\n{len(files)} files, {failed} with errors, {jobs} jobs', file=out)
+    print(f'parse {sum(r.parse_time for r in results):.3f}s  '
+          f'check {sum(r.check_time for r in results):.3f}s  '
+          f'wall {wall:.3f}s  parallelism {busy / wall if wall else 0:.1f}x  '
+          f'{len(files) / wall if wall else 0:.0f} files/sec', file=out)
+    if cache:
+        hits = sum(r.cached for r in results)
+        print(f'cache {hits} hits, {len(results) - hits} misses', file=out)
+    return failed
+
+
+def main(argv):
+    import argparse
+    cli = argparse.ArgumentParser(prog='batch.py', description='Check many PL0 files in parallel')
+    cli.add_argument('input', nargs='+', help='files, directories or glob patterns')
+    cli.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    cli.add_argument('--scanner', choices=['fast', 'sly'], default='sly')
+    cli.add_argument('--no-cache', action='store_true', help='do not use the on-disk AST cache')
+    args = cli.parse_args(argv[1:])
+    sys.exit(1 if run_batch(args.input, args.jobs, args.scanner, not args.no_cache) else 0)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,1113 @@
+# bench.py
+'''
+Benchmarks del compilador de PL0.
+
+usage: bench.py [-h] {startup,interp,vm,dispatch,memory,types,stream,scanner,resolve,cache,incremental,daemon,imports,fold,dce,cfg,dataflow,native,ssa,calls,memo,arrays,bounds} ...
+
+Cada subcomando mide una parte del compilador y reporta los tiempos
+en la salida estándar. Ejemplo:
+
+    python bench.py startup -n 10
+'''
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def report(title, samples, unit='s'):
+    print(f'{title:<32} min {min(samples):9.4f}{unit}  '
+          f'median {statistics.median(samples):9.4f}{unit}  (n={len(samples)})')
+
+
+def parse_source(source):
+    from plex import Lexer
+    from pparser import Parser
+    return Parser(quiet=True).parse(Lexer(quiet=True).tokenize(source))
+
+
+def spigot_source(n):
+    with open(os.path.join(HERE, 'Pi_Spigot.pl0'), encoding='utf-8') as f:
+        return f.read().replace('n := 1000', f'n := {n}')
+
+
+def run_python(code, **env):
+    # Medida tomada dentro de un interprete nuevo (evita contar el
+    # arranque de Python, que es igual en ambos casos)
+    out = subprocess.run([sys.executable, '-c', code], cwd=HERE,
+                         env={**os.environ, **env},
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+# ---------------------------------------------------------------------
+#  startup: import de pparser con y sin tablas LALR en cache
+# ---------------------------------------------------------------------
+IMPORT_PARSER = '''
+import time
+import plex, model
+t = time.perf_counter()
+import pparser
+print(time.perf_counter() - t)
+'''
+
+
+def bench_startup(args):
+    import pparser
+    cold, warm = [], []
+    for _ in range(args.number):
+        shutil.rmtree(pparser.cachedir, ignore_errors=True)
+        cold.append(run_python(IMPORT_PARSER))
+        warm.append(run_python(IMPORT_PARSER))
+    report('import pparser (cold)', cold)
+    report('import pparser (warm)', warm)
+    print(f'speedup: {statistics.median(cold) / statistics.median(warm):.1f}x')
+
+
+# ---------------------------------------------------------------------
+#  interp: operaciones por segundo del intérprete en Pi_Spigot.pl0
+# ---------------------------------------------------------------------
+def bench_interp(args):
+    from interp import Interpreter
+    ast = parse_source(spigot_source(args.digits))
+
+    counter = Interpreter(count=True, stdout=io.StringIO())
+    counter.compile(ast)()
+    ops = counter.ops
+
+    samples = []
+    for _ in range(args.number):
+        out = io.StringIO()
+        run = Interpreter(stdout=out).compile(ast)
+        t = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - t)
+
+    print(f'Pi_Spigot n={args.digits}: {out.getvalue()[:12].strip()}... ({ops} ops)')
+    report('closure interpreter', samples)
+    print(f'ops/sec: {ops / statistics.median(samples):,.0f}')
+
+
+# ---------------------------------------------------------------------
+#  vm: máquina virtual de bytecode contra el intérprete de closures
+# ---------------------------------------------------------------------
+def bench_vm(args):
+    from interp import Interpreter
+    from ircode import IRGenerator, VM
+    ast = parse_source(spigot_source(args.digits))
+    module = IRGenerator.gencode(ast)
+    size = sum(len(fn.code) // 2 for fn in module.functions)
+    print(f'Pi_Spigot n={args.digits}: {size} instructions, {len(module.consts)} constants')
+
+    engines = {
+        'closure interpreter': lambda out: Interpreter(stdout=out).compile(ast),
+        'bytecode vm': lambda out: VM(module, stdout=out).run,
+    }
+    for name, prepare in engines.items():
+        samples = []
+        for _ in range(args.number):
+            run = prepare(io.StringIO())
+            t = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - t)
+        report(name, samples)
+
+
+# ---------------------------------------------------------------------
+#  dispatch: tabla por clase contra multimethod en el Checker
+# ---------------------------------------------------------------------
+def synthetic_program(nodes):
+    '''
+    Programa con una función main y asignaciones de la forma
+    a := a + b * 2 - b / 3 (11 nodos cada una) hasta sumar 'nodes'.
+    '''
+    from model import (Assign, Binary, FunDefinition, Integer, Program,
+                       SimpleLocation, VarDefinition)
+    from typesys import int_type
+    stmts = []
+    for _ in range(nodes // 11):
+        expr = Binary('-',
+                      Binary('+', SimpleLocation('a'),
+                             Binary('*', SimpleLocation('b'), Integer(2, int_type))),
+                      Binary('/', SimpleLocation('b'), Integer(3, int_type)))
+        stmts.append(Assign(SimpleLocation('a'), expr))
+    varlist = [VarDefinition('a', int_type), VarDefinition('b', int_type)]
+    return Program([FunDefinition('main', [], varlist, stmts)])
+
+
+def bench_dispatch(args):
+    from multimethod import multimethod
+    with redirect_stdout(io.StringIO()):
+        from checker import Checker, Symtab
+    from resolve import Resolver
+
+    # El mismo Checker, pero con 'visit' despachado por multimethod
+    visit = multimethod(lambda self, n: None)
+    for func in Checker._visitors.values():
+        visit.register(func)
+    MultiChecker = type('MultiChecker', (Checker,), {'visit': visit})
+
+    program = synthetic_program(args.nodes)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    Resolver.resolve(program)
+    for name, checker in [('multimethod', MultiChecker), ('dispatch table', Checker)]:
+        samples = []
+        for _ in range(args.number):
+            t = time.perf_counter()
+            checker().visit(program, Symtab())
+            samples.append(time.perf_counter() - t)
+        report(f'Checker, {name}', samples)
+
+
+# ---------------------------------------------------------------------
+#  memory: memoria del AST con y sin __slots__ (tracemalloc)
+# ---------------------------------------------------------------------
+def generated_source(stmts):
+    body = ';\n'.join('    a := a + b * 2 - (b / 3) * (a - 1)' for _ in range(stmts))
+    return f'fun main()\n  a: int;\n  b: int;\nbegin\n{body}\nend\n'
+
+
+AST_MEMORY = '''
+import gc, sys, tracemalloc
+from bench import parse_source, generated_source
+source = generated_source(%d)
+tracemalloc.start()
+ast = parse_source(source)
+gc.collect()
+print(tracemalloc.get_traced_memory()[0])
+'''
+
+
+def bench_memory(args):
+    nodes = args.stmts * 15
+    print(f'generated program: {args.stmts} statements, ~{nodes} nodes')
+    sizes = {}
+    for name, slots in [('dataclass (__dict__)', '0'), ('dataclass (__slots__)', '1')]:
+        sizes[name] = run_python(AST_MEMORY % args.stmts, PL0_AST_SLOTS=slots)
+        print(f'{name:<32} {sizes[name] / 2**20:8.2f} MiB  {sizes[name] / nodes:6.1f} B/node')
+    before, after = sizes.values()
+    print(f'reduction: {100 * (1 - after / before):.1f}%')
+
+
+# ---------------------------------------------------------------------
+#  types: tipos compartidos (int_type, float_type) en los literales
+# ---------------------------------------------------------------------
+def bench_types(args):
+    import gc
+    import tracemalloc
+    from model import Float, Integer, Parameter, SimpleType, VarDefinition
+
+    with open(os.path.join(HERE, 'test2', 'bigexpr.pl0'), encoding='utf-8') as f:
+        source = f.read() * args.scale
+
+    tracemalloc.start()
+    t = time.perf_counter()
+    ast = parse_source(source)
+    elapsed = time.perf_counter() - t
+
+    typed = []
+    stack = [ast]
+    while stack:
+        n = stack.pop()
+        if isinstance(n, (Integer, Float)):
+            typed.append(n)
+        elif isinstance(n, (VarDefinition, Parameter)) and isinstance(n.datatype, SimpleType):
+            typed.append(n)
+        elif isinstance(n, list):
+            stack.extend(n)
+        elif hasattr(n, '__dataclass_fields__'):
+            stack.extend(getattr(n, name) for name in n.__dataclass_fields__)
+    distinct = len({id(n.dtype if isinstance(n, (Integer, Float)) else n.datatype) for n in typed})
+
+    gc.collect()
+    shared = tracemalloc.get_traced_memory()[0]
+
+    # El AST como lo dejaba el parser antes: un SimpleType por literal
+    # o declaración
+    for n in typed:
+        if isinstance(n, (Integer, Float)):
+            n.dtype = SimpleType(n.dtype.name)
+        else:
+            n.datatype = SimpleType(n.datatype.name)
+    gc.collect()
+    fresh = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f'bigexpr.pl0 x{args.scale}: parsed in {elapsed:.2f}s, {len(typed)} typed literals/declarations')
+    print(f'SimpleType objects: {len(typed)} before, {distinct} now')
+    print(f'AST memory: {fresh / 2**20:.2f} MiB before, {shared / 2**20:.2f} MiB now '
+          f'({(fresh - shared) / 2**20:.2f} MiB less)')
+
+
+# ---------------------------------------------------------------------
+#  stream: rendimiento de lexer -> parser en modo silencioso
+# ---------------------------------------------------------------------
+def bench_stream(args):
+    from plex import Lexer
+    from pparser import Parser
+
+    source = generated_source(args.stmts)
+    lines = source.count('\n')
+
+    samples = []
+    for _ in range(args.number):
+        t = time.perf_counter()
+        ntokens = sum(1 for _ in Lexer(quiet=True).tokenize(source))
+        samples.append(time.perf_counter() - t)
+    lexing = statistics.median(samples)
+    report('lexer', samples)
+
+    samples = []
+    for _ in range(args.number):
+        t = time.perf_counter()
+        Parser(quiet=True).parse(Lexer(quiet=True).tokenize(source))
+        samples.append(time.perf_counter() - t)
+    parsing = statistics.median(samples)
+    report('lexer -> parser', samples)
+
+    print(f'{lines} lines, {ntokens} tokens, {len(source) / 2**20:.2f} MiB')
+    print(f'lexer:           {ntokens / lexing:12,.0f} tokens/sec  {lines / lexing:10,.0f} lines/sec')
+    print(f'lexer -> parser: {ntokens / parsing:12,.0f} tokens/sec  {lines / parsing:10,.0f} lines/sec')
+
+
+# ---------------------------------------------------------------------
+#  scanner: Scanner escrito a mano contra el Lexer de SLY
+# ---------------------------------------------------------------------
+def bench_scanner(args):
+    import glob
+    from plex import Lexer, Scanner
+
+    sources = []
+    for fname in sorted(glob.glob(os.path.join(HERE, 'test2', '*.pl0'))):
+        with open(fname, encoding='utf-8') as f:
+            sources.append(f.read())
+    chunk = '\n'.join(sources)
+    source = chunk * max(1, int(args.mib * 2**20 / len(chunk)))
+    print(f'throughput source: test2/*.pl0 repeated, {len(source) / 2**20:.1f} MiB')
+
+    for name, lexer in [('sly Lexer', Lexer), ('Scanner', Scanner)]:
+        samples = []
+        for _ in range(args.number):
+            t = time.perf_counter()
+            ntokens = sum(1 for _ in lexer(quiet=True).tokenize(source))
+            samples.append(time.perf_counter() - t)
+        report(name, samples)
+        median = statistics.median(samples)
+        print(f'{"":<32} {ntokens / median:12,.0f} tokens/sec  {len(source) / 2**20 / median:6.2f} MiB/sec')
+
+
+# ---------------------------------------------------------------------
+#  resolve: enlace de nombres en funciones muy anidadas
+# ---------------------------------------------------------------------
+def nested_source(depth, refs):
+    '''
+    main contiene f1, que contiene f2, ... hasta f<depth>. La función
+    más interna usa 'refs' veces la variable de main.
+    '''
+    body = ';\n'.join('    y := y + x0' for _ in range(refs))
+    source = f'fun f{depth}()\n  y: int;\nbegin\n{body}\nend'
+    for level in reversed(range(depth)):
+        name = f'f{level}' if level else 'main'
+        source = f'fun {name}()\n  x{level}: int;\n{source};\nbegin\n  skip\nend'
+    return source
+
+
+def bench_resolve(args):
+    from model import SimpleLocation, VarDefinition
+    from resolve import Resolver
+    with redirect_stdout(io.StringIO()):
+        from checker import Symtab
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    print(f'{args.refs} references to a variable of main from the innermost function')
+    for depth in args.depth:
+        ast = parse_source(nested_source(depth, args.refs))
+
+        main = ast.funclist[0]
+        x0 = main.varlist.varlist[0]
+        ref = SimpleLocation('x0')
+
+        # Lo que hacía el checker: Symtab.get sube por la cadena de
+        # tablas en cada referencia
+        env = Symtab()
+        env.add('main', main)
+        env = Symtab(env)
+        env.add('x0', x0)
+        for level in range(1, depth + 1):
+            env = Symtab(env)
+            env.add(f'x{level}', None)
+
+        # Resolver con los mismos alcances abiertos
+        resolver = Resolver()
+        resolver.open_scope()
+        resolver.declare(main)
+        resolver.open_scope()
+        resolver.declare(x0)
+        for level in range(1, depth + 1):
+            resolver.open_scope()
+
+        lookups = {'Symtab.get': lambda: env.get('x0'),
+                   'Resolver.bind': lambda: resolver.bind(ref, VarDefinition)}
+        times = {}
+        for name, lookup in lookups.items():
+            samples = []
+            for _ in range(args.number):
+                t = time.perf_counter()
+                for _ in range(args.refs):
+                    lookup()
+                samples.append(time.perf_counter() - t)
+            times[name] = statistics.median(samples) / args.refs * 1e9
+
+        t = time.perf_counter()
+        Resolver.resolve(ast)
+        whole = time.perf_counter() - t
+        print(f'depth {depth:4}:  ' + '  '.join(f'{name} {ns:6.0f} ns' for name, ns in times.items())
+              + f'   (whole program resolved in {whole * 1000:.1f} ms)')
+
+
+# ---------------------------------------------------------------------
+#  cache: análisis completo contra recuperación del cache en disco
+# ---------------------------------------------------------------------
+def bench_cache(args):
+    import tempfile
+    from batch import expand
+    from cache import ASTCache
+    from context import Context
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    files = {}
+    for fname in expand(args.inputs):
+        with open(fname, encoding='utf-8') as f:
+            files[fname] = f.read()
+    groups = {f'{len(files)} files': list(files.values()),
+              f'generated, {args.stmts} stmts': [generated_source(args.stmts)]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ASTCache(tmp)
+        context = Context(quiet=True, cache=cache)
+        for title, sources in groups.items():
+            times = {'cold': 0.0, 'warm': 0.0}
+            for source in sources:
+                for run in times:
+                    t = time.perf_counter()
+                    context.analyze(source, check=True)
+                    times[run] += time.perf_counter() - t
+            print(f'{title:<28} cold (parse + check + store) {times["cold"] * 1000:9.1f} ms  '
+                  f'warm (load) {times["warm"] * 1000:8.1f} ms  {times["cold"] / times["warm"]:5.1f}x')
+        print(cache.stats())
+
+
+# ---------------------------------------------------------------------
+#  incremental: editar una función de un programa con muchas funciones
+# ---------------------------------------------------------------------
+def functions_source(nfuncs, stmts):
+    # f0 ... fN-1, cada una llama a la anterior
+    funcs = []
+    for k in range(nfuncs):
+        call = f'f{k - 1}(a)' if k else 'a'
+        body = ';\n'.join(f'    b := b + {call} * {s}' for s in range(stmts))
+        funcs.append(f'fun f{k}(a: int)\n  b: int;\nbegin\n    b := 0;\n{body};\n    return b\nend\n')
+    funcs.append(f'fun main()\nbegin\n    write(f{nfuncs - 1}(1))\nend\n')
+    return '\n'.join(funcs)
+
+
+def bench_incremental(args):
+    from context import Context
+    from incremental import Document
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    context = Context(quiet=True)
+    for nfuncs in args.funcs:
+        source = functions_source(nfuncs, args.stmts)
+        t = time.perf_counter()
+        context.analyze(source, check=True)
+        full = time.perf_counter() - t
+        document = Document(source)
+
+        # Editar el cuerpo de la función del medio (mismo tipo de
+        # retorno) y después cambiar su tipo de retorno
+        k = nfuncs // 2
+        edits = {'body': (f'b := b + f{k - 1}(a) * 0', f'b := b + f{k - 1}(a) * 7'),
+                 'return type': ('return b', 'return 1.5')}
+        lines = []
+        for what, (old, new) in edits.items():
+            start = source.index(old, source.index(f'fun f{k}('))
+            samples = []
+            for _ in range(args.number):
+                r = document.edit(start, start + len(old), new)
+                samples.append(r.time)
+                document.edit(start, start + len(new), old)
+            lines.append(f'{what} {statistics.median(samples) * 1000:7.2f} ms '
+                         f'(reparsed {r.chars} chars, rechecked {r.rechecked})')
+        print(f'{nfuncs:5} functions, {len(source):8} chars:  full check {full * 1000:8.1f} ms  '
+              + '  '.join(lines))
+
+
+# ---------------------------------------------------------------------
+#  daemon: llamadas al CLI en frío contra peticiones al servidor
+# ---------------------------------------------------------------------
+def bench_daemon(args):
+    import tempfile
+    import daemon
+
+    fname = os.path.join(HERE, args.file)
+    stdin = args.stdin.replace('\\n', '\n')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'daemon.sock')
+        env = {**os.environ, 'PL0_DAEMON_SOCKET': path}
+
+        def command(argv):
+            def run():
+                subprocess.run([sys.executable, *argv], cwd=HERE, env=env, input=stdin,
+                               capture_output=True, text=True)
+            return run
+
+        daemon.start(path)
+        try:
+            cases = {
+                'run':   {'cold CLI (pl0.py -R)': command(['pl0.py', '-R', fname]),
+                          'client (daemon.py run)': command(['daemon.py', 'run', fname]),
+                          'socket round-trip': lambda: daemon.request(
+                              {'cmd': 'run', 'file': fname, 'stdin': stdin}, path)},
+                'check': {'cold CLI (pl0.py -B -j1)': command(['pl0.py', '-B', '-j', '1', fname]),
+                          'client (daemon.py check)': command(['daemon.py', 'check', fname]),
+                          'socket round-trip': lambda: daemon.request(
+                              {'cmd': 'check', 'file': fname}, path)},
+            }
+            print(f'{args.file}')
+            for what, calls in cases.items():
+                for title, call in calls.items():
+                    call()
+                    samples = []
+                    for _ in range(args.number):
+                        t = time.perf_counter()
+                        call()
+                        samples.append((time.perf_counter() - t) * 1000)
+                    report(f'{what}: {title}', samples, 'ms')
+        finally:
+            daemon.request({'cmd': 'stop'}, path)
+
+
+# ---------------------------------------------------------------------
+#  imports: qué carga pl0.py al arrancar (python -X importtime)
+# ---------------------------------------------------------------------
+def import_times(module):
+    # [(módulo, propio, acumulado)] en microsegundos, de -X importtime
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         cwd=HERE, capture_output=True, text=True, check=True)
+    times = []
+    for line in out.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'self' not in line:
+            own, total, name = line[len('import time:'):].split('|')
+            times.append((name.strip(), int(own), int(total)))
+    return times
+
+
+def bench_imports(args):
+    for module in args.modules:
+        times = import_times(module)
+        total = next(t for name, _, t in times if name == module)
+        print(f'import {module}: {total / 1000:.1f} ms, {len(times)} modules')
+        for name, own, cumulative in sorted(times, key=lambda t: -t[1])[:args.top]:
+            print(f'    {name:<32} self {own / 1000:7.2f} ms  cumulative {cumulative / 1000:7.2f} ms')
+
+    samples = []
+    for _ in range(args.number):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, 'pl0.py', '-R', 'test3/hello.pl0'], cwd=HERE,
+                       capture_output=True, check=True)
+        samples.append((time.perf_counter() - t) * 1000)
+    report('pl0.py -R test3/hello.pl0', samples, 'ms')
+
+
+# ---------------------------------------------------------------------
+#  fold, dce: nodos que eliminan las pasadas de optimize.py
+# ---------------------------------------------------------------------
+def optimize_corpus(inputs, run, total, verbose=False):
+    '''
+    Aplica run(ast) -> stats a cada archivo que se puede parsear y suma
+    los campos de los stats en total.
+    '''
+    from dataclasses import fields
+    from batch import expand
+    from context import Context
+    from resolve import Resolver
+
+    # Las pasadas no necesitan el checker: basta el AST y sus enlaces,
+    # así que se cuentan también los programas con errores de tipos
+    # (pero no los que Context.optimize deja como están)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    context = Context(quiet=True)
+    skipped = 0
+    for fname in expand(inputs):
+        with open(fname, encoding='utf-8') as f:
+            context.analyze(f.read())
+        t = time.perf_counter()
+        if context.have_errors or Resolver.resolve(context.ast):
+            skipped += 1
+            continue
+        stats = run(context.ast)
+        elapsed = time.perf_counter() - t
+        if verbose or stats != type(stats)(stats.nodes_before, stats.nodes_before):
+            print(f'{fname:<36} {stats}  {elapsed * 1000:7.2f} ms')
+        for field in fields(total):
+            setattr(total, field.name, getattr(total, field.name) + getattr(stats, field.name))
+    print(f'{"total":<36} {total}')
+    print(f'{skipped} files with syntax or name errors skipped')
+
+
+def bench_fold(args):
+    from optimize import ConstantFolder, FoldStats
+    optimize_corpus(args.inputs, ConstantFolder.fold, FoldStats(), args.verbose)
+
+
+def bench_dce(args):
+    from optimize import ConstantFolder, DeadCodeEliminator, EliminationStats
+
+    def run(ast):
+        # Después del plegado, como en Context.optimize
+        ConstantFolder.fold(ast)
+        return DeadCodeEliminator.eliminate(ast)
+    optimize_corpus(args.inputs, run, EliminationStats(), args.verbose)
+
+# ---------------------------------------------------------------------
+#  cfg: construcción del grafo de flujo en programas cada vez más grandes
+# ---------------------------------------------------------------------
+def structured_source(groups):
+    # Cada grupo: un while con un if/else, un break y un return (6 instrucciones)
+    group = ('    while a < 100 do begin\n'
+             '      if a > b then a := a + 1 else b := b + 1;\n'
+             '      if b > 50 then break;\n'
+             '      a := a * 2\n'
+             '    end;\n'
+             '    if a == 7 then return a')
+    body = ';\n'.join(group for _ in range(groups))
+    return f'fun main()\n  a: int;\n  b: int;\nbegin\n{body};\n    return b\nend\n'
+
+
+def bench_cfg(args):
+    import cfg
+    from optimize import count_nodes
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for groups in args.groups:
+        ast = parse_source(structured_source(groups))
+        nodes = count_nodes(ast)
+        samples = []
+        for _ in range(args.number):
+            t = time.perf_counter()
+            graph = cfg.build(ast)[0]
+            samples.append(time.perf_counter() - t)
+        best = min(samples)
+        print(f'{groups * 6:>7} stmts {nodes:>8} nodes  {graph.nblocks:>7} blocks {len(graph.succ):>7} edges  '
+              f'{best * 1000:8.2f} ms  {best / nodes * 1e6:6.3f} us/node')
+
+# ---------------------------------------------------------------------
+#  dataflow: análisis con vectores de bits en funciones generadas
+# ---------------------------------------------------------------------
+def dataflow_source(groups, nvars):
+    # Como structured_source, pero cada grupo usa otras variables
+    body = []
+    for k in range(groups):
+        a, b, c = (f'v{(3 * k + i) % nvars}' for i in range(3))
+        body.append(f'    while {a} < 100 do begin\n'
+                    f'      if {a} > {b} then {a} := {a} + {c} else {b} := {b} + 1;\n'
+                    f'      if {c} > 50 then break;\n'
+                    f'      {c} := {a} * 2\n'
+                    f'    end;\n'
+                    f'    if {b} == 7 then return {a}')
+    decls = ''.join(f'  v{i}: int;\n' for i in range(nvars))
+    body = ';\n'.join(body)
+    return f'fun main()\n{decls}begin\n{body};\n    return v0\nend\n'
+
+
+def set_liveness(facts):
+    # La misma lista de trabajo que dataflow.liveness, con sets
+    from collections import deque
+    from dataflow import bits
+    graph = facts.graph
+    gen, kill = [], []
+    for lo, hi in facts.blocks():
+        used, defined = set(), set()
+        for i in range(lo, hi):
+            used |= set(bits(facts.uses[i])) - defined
+            defined |= set(bits(facts.defs[i]))
+        gen.append(used)
+        kill.append(defined)
+    before = [set() for _ in range(graph.nblocks)]
+    after = [set() for _ in range(graph.nblocks)]
+    work = deque(graph.postorder())
+    queued = set(work)
+    while work:
+        b = work.popleft()
+        queued.discard(b)
+        after[b] = set().union(*(before[s] for s in graph.successors(b)))
+        value = gen[b] | (after[b] - kill[b])
+        if value != before[b]:
+            before[b] = value
+            for p in graph.predecessors(b):
+                if p not in queued:
+                    queued.add(p)
+                    work.append(p)
+    return before, after
+
+
+def bench_dataflow(args):
+    import cfg
+    import dataflow
+    from resolve import Resolver
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for groups in args.groups:
+        ast = parse_source(dataflow_source(groups, args.vars))
+        Resolver.resolve(ast)
+        graph = cfg.build(ast)[0]
+        print(f'{groups * 6} stmts, {args.vars} variables: {graph.nblocks} blocks, {len(graph.succ)} edges')
+        facts = dataflow.Facts(graph)
+        analyses = [('uses/defs', lambda: dataflow.Facts(graph)),
+                    ('liveness (bitsets)', lambda: dataflow.liveness(facts)),
+                    ('liveness (sets)', lambda: set_liveness(facts)),
+                    ('reaching definitions', lambda: dataflow.reaching_definitions(facts)),
+                    ('definite assignment', lambda: dataflow.definite_assignment(facts))]
+        for title, analysis in analyses:
+            samples = []
+            for _ in range(args.number):
+                t = time.perf_counter()
+                analysis()
+                samples.append((time.perf_counter() - t) * 1000)
+            report(f'  {title}', samples, 'ms')
+        live = dataflow.liveness(facts)
+        print(f'  liveness: {live.visits} block visits ({live.visits / graph.nblocks:.2f} per block)')
+
+# ---------------------------------------------------------------------
+#  native: ejecutable x86-64 (asmcode.py) contra el intérprete
+# ---------------------------------------------------------------------
+def bench_native(args):
+    import tempfile
+    from asmcode import AsmGenerator, assemble
+    from interp import Interpreter
+    from ircode import IRGenerator, VM
+    ast = parse_source(spigot_source(args.digits))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exe = os.path.join(tmp, 'pi_spigot')
+        t = time.perf_counter()
+        assembly = AsmGenerator.gencode(ast)
+        generated = time.perf_counter() - t
+        assemble(assembly, exe)
+        built = time.perf_counter() - t
+        print(f'Pi_Spigot n={args.digits}: {assembly.count(chr(10))} lines of assembly, '
+              f'codegen {generated * 1000:.1f}ms, codegen + cc {built * 1000:.0f}ms')
+
+        # El ejecutable se mide como proceso aparte (incluye su arranque)
+        def native(out):
+            def run():
+                result = subprocess.run([exe], capture_output=True, text=True, check=True)
+                out.write(result.stdout)
+            return run
+
+        module = IRGenerator.gencode(ast)
+        engines = {
+            'closure interpreter': lambda out: Interpreter(stdout=out).compile(ast),
+            'bytecode vm': lambda out: VM(module, stdout=out).run,
+            'native x86-64': native,
+        }
+        medians, outputs = {}, {}
+        for name, prepare in engines.items():
+            samples = []
+            for _ in range(args.number):
+                out = io.StringIO()
+                run = prepare(out)
+                t = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - t)
+            report(name, samples)
+            medians[name] = statistics.median(samples)
+            outputs[name] = out.getvalue()
+
+    if len(set(outputs.values())) != 1:
+        raise SystemExit('outputs differ between engines')
+    print(f'same output; native speedup: {medians["closure interpreter"] / medians["native x86-64"]:.0f}x '
+          f'vs interpreter, {medians["bytecode vm"] / medians["native x86-64"]:.0f}x vs vm')
+
+
+def bench_ssa(args):
+    from interp import Interpreter
+    from ssa import Machine, PassManager, build
+    ast = parse_source(spigot_source(args.digits))
+    out = io.StringIO()
+    Interpreter(stdout=out).compile(ast)()
+    expected = out.getvalue()
+
+    plain = build(ast)
+    optimized = build(ast)
+    print(f'Pi_Spigot n={args.digits}: {plain.size()} IR instructions')
+    for result in PassManager().run(optimized):
+        print(f'  {result}')
+
+    counts = {}
+    for name, module in (('unoptimized', plain), ('optimized', optimized)):
+        samples = []
+        for _ in range(args.number):
+            out = io.StringIO()
+            machine = Machine(module, stdout=out)
+            t = time.perf_counter()
+            machine.run()
+            samples.append(time.perf_counter() - t)
+            if out.getvalue() != expected:
+                raise SystemExit(f'{name} IR output differs from the interpreter')
+        report(f'{name} ({machine.count} executed)', samples)
+        counts[name] = machine.count
+    print(f'same output; executed instructions '
+          f'{1 - counts["optimized"] / counts["unoptimized"]:.1%} fewer after optimization')
+
+
+RECURSIVE_SOURCE = '''
+fun fib(n: int)
+begin
+  if n < 2 then return n
+  else return fib(n - 1) + fib(n - 2)
+end
+
+fun sum(n: int)
+begin
+  if n == 0 then return 0
+  else return n + sum(n - 1)
+end
+
+fun main()
+begin
+  write(%s)
+end
+'''
+
+
+def bench_calls(args):
+    from interp import Interpreter, PL0RuntimeError
+    from ssa import Machine, PassManager, build
+    programs = {
+        f'Pi_Spigot n={args.digits}': parse_source(spigot_source(args.digits)),
+        f'fib({args.fib})': parse_source(RECURSIVE_SOURCE % f'fib({args.fib})'),
+        f'sum({args.depth})': parse_source(RECURSIVE_SOURCE % f'sum({args.depth})'),
+    }
+    for title, ast in programs.items():
+        out = io.StringIO()
+        try:
+            Interpreter(stdout=out).compile(ast)()
+            expected = out.getvalue()
+        except RecursionError:
+            expected = 'Stack overflow'
+        print(f'{title}: interpreter -> {expected.splitlines()[-1]!r}')
+        for name, passes in (('unoptimized', []), ('optimized', None)):
+            module = build(ast)
+            PassManager(passes).run(module)
+            samples = []
+            for _ in range(args.number):
+                out = io.StringIO()
+                machine = Machine(module, stdout=out)
+                t = time.perf_counter()
+                try:
+                    machine.run()
+                    result = out.getvalue()
+                except PL0RuntimeError as e:
+                    result = str(e)
+                samples.append(time.perf_counter() - t)
+            same = 'same output' if result == expected else f'-> {result.splitlines()[-1]!r}'
+            report(f'  {name} ({machine.calls} calls)', samples)
+            print(f'    {same}')
+
+
+def bench_memo(args):
+    from interp import Interpreter
+    programs = {
+        f'fib({args.fib})': parse_source(RECURSIVE_SOURCE % f'fib({args.fib})'),
+        f'Pi_Spigot n={args.digits}': parse_source(spigot_source(args.digits)),
+    }
+    for title, ast in programs.items():
+        print(title)
+        outputs = set()
+        for name, memo in (('plain', 0), (f'memo (LRU {args.size})', args.size)):
+            samples = []
+            for _ in range(args.number):
+                out = io.StringIO()
+                interp = Interpreter(stdout=out, memo=memo)
+                run = interp.compile(ast)
+                t = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - t)
+            outputs.add(out.getvalue())
+            report(f'  {name}', samples)
+            for cache in interp.caches:
+                print(f'    {cache}')
+        if len(outputs) != 1:
+            raise SystemExit('outputs differ with memoization')
+
+
+def array_source(length):
+    return f'''
+fun main()
+  i: int;
+  s: int;
+  a: int[{length}];
+begin
+  while i < {length} do begin a[i] := i * 3; i := i + 1 end;
+  i := 0;
+  while i < {length} do begin s := s + a[i]; i := i + 1 end;
+  write(s)
+end
+'''
+
+
+def bench_arrays(args):
+    import interp
+    from interp import Interpreter, new_array
+
+    def timed(make, n):
+        samples = []
+        for _ in range(args.number):
+            t = time.perf_counter()
+            make(n)
+            samples.append(time.perf_counter() - t)
+        return min(samples)
+
+    def list_array(zero, length):
+        return [zero] * length
+
+    print(f'{"length":>10} {"list alloc":>12} {"array alloc":>12} {"list bytes":>14} {"array bytes":>14}')
+    for k in range(3, args.max + 1):
+        n = 10 ** k
+        alloc_list = timed(lambda n: list_array(0, n), n)
+        alloc_array = timed(lambda n: new_array(0, n), n)
+        # Llenos con enteros distintos: la lista guarda punteros a int
+        # de Python, el array los 8 bytes de cada uno
+        values = range(1 << 40, (1 << 40) + n)
+        filled = list(values)
+        list_bytes = sys.getsizeof(filled) + sum(map(sys.getsizeof, filled))
+        del filled
+        array_bytes = sys.getsizeof(new_array(0, n))
+        print(f'{n:>10} {alloc_list * 1000:10.3f}ms {alloc_array * 1000:10.3f}ms '
+              f'{list_bytes:>14,} {array_bytes:>14,}')
+
+    print(f'\ninterpreter: fill and sum a PL0 int[n] (up to 10^{args.run_max})')
+    for k in range(3, args.run_max + 1):
+        n = 10 ** k
+        ast = parse_source(array_source(n))
+        outputs = set()
+        for storage, make in (('list', list_array), ('array', new_array)):
+            for check in (True, False):
+                interp.new_array = make
+                try:
+                    samples = []
+                    for _ in range(args.number):
+                        out = io.StringIO()
+                        run = Interpreter(stdout=out, bounds_check=check).compile(ast)
+                        t = time.perf_counter()
+                        run()
+                        samples.append(time.perf_counter() - t)
+                finally:
+                    interp.new_array = new_array
+                outputs.add(out.getvalue())
+                report(f'  n={n} {storage}{"" if check else " unchecked"}', samples)
+        if len(outputs) != 1:
+            raise SystemExit('outputs differ between storages')
+
+
+def bench_bounds(args):
+    import tempfile
+    import asmcode
+    import bounds
+    from asmcode import AsmGenerator, assemble
+    from bounds import BoundsAnalysis
+    from interp import Interpreter
+    from resolve import Resolver
+    ast = parse_source(spigot_source(args.digits))
+
+    class Checked(BoundsAnalysis):
+        # Sin eliminar nada: todos los accesos con su chequeo
+        def __init__(self, ast):
+            super().__init__(ast)
+            self.safe = set()
+
+    def patched(analysis, make):
+        bounds.BoundsAnalysis = asmcode.BoundsAnalysis = analysis
+        try:
+            return make()
+        finally:
+            bounds.BoundsAnalysis = asmcode.BoundsAnalysis = BoundsAnalysis
+
+    def timed(run, out):
+        samples = []
+        for _ in range(args.number):
+            out.seek(0)
+            out.truncate()
+            t = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - t)
+        return samples
+
+    Resolver.resolve(ast)
+    print(f'Pi_Spigot n={args.digits}: {BoundsAnalysis(ast)}')
+    outputs = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, analysis in (('checked', Checked), ('eliminated', BoundsAnalysis)):
+            out = io.StringIO()
+            run = patched(analysis, lambda: Interpreter(stdout=out).compile(ast))
+            report(f'interpreter {name}', timed(run, out))
+            outputs.add(out.getvalue())
+
+            exe = os.path.join(tmp, name)
+            assembly = patched(analysis, lambda: AsmGenerator.gencode(ast))
+            assemble(assembly, exe)
+
+            def native():
+                result = subprocess.run([exe], capture_output=True, text=True, check=True)
+                out.write(result.stdout)
+            report(f'native {name} ({assembly.count("cmpq (%rcx)")} checks)', timed(native, out))
+            outputs.add(out.getvalue())
+    if len(outputs) != 1:
+        raise SystemExit('outputs differ with and without bounds checks')
+
+
+def parse_args():
+    cli = argparse.ArgumentParser(
+        prog='bench.py',
+        description='Benchmarks for the PL0 compiler')
+    sub = cli.add_subparsers(dest='bench', required=True)
+
+    startup = sub.add_parser('startup', help='Parser import time, cold vs warm table cache')
+    startup.add_argument('-n', '--number', type=int, default=10)
+    startup.set_defaults(func=bench_startup)
+
+    interp = sub.add_parser('interp', help='Interpreter ops/sec on Pi_Spigot.pl0')
+    interp.add_argument('-n', '--number', type=int, default=3)
+    interp.add_argument('--digits', type=int, default=1000)
+    interp.set_defaults(func=bench_interp)
+
+    vm = sub.add_parser('vm', help='Bytecode VM vs closure interpreter on Pi_Spigot.pl0')
+    vm.add_argument('-n', '--number', type=int, default=3)
+    vm.add_argument('--digits', type=int, default=200)
+    vm.set_defaults(func=bench_vm)
+
+    dispatch = sub.add_parser('dispatch', help='Checker with dispatch table vs multimethod')
+    dispatch.add_argument('-n', '--number', type=int, default=5)
+    dispatch.add_argument('--nodes', type=int, default=100000)
+    dispatch.set_defaults(func=bench_dispatch)
+
+    memory = sub.add_parser('memory', help='AST memory with and without __slots__')
+    memory.add_argument('--stmts', type=int, default=20000)
+    memory.set_defaults(func=bench_memory)
+
+    types = sub.add_parser('types', help='Shared SimpleType instances on bigexpr.pl0 scaled up')
+    types.add_argument('--scale', type=int, default=20)
+    types.set_defaults(func=bench_types)
+
+    stream = sub.add_parser('stream', help='Lexer and parser throughput (tokens/sec, lines/sec)')
+    stream.add_argument('-n', '--number', type=int, default=3)
+    stream.add_argument('--stmts', type=int, default=20000)
+    stream.set_defaults(func=bench_stream)
+
+    scanner = sub.add_parser('scanner', help='Hand-written Scanner vs SLY Lexer throughput')
+    scanner.add_argument('-n', '--number', type=int, default=3)
+    scanner.add_argument('--mib', type=float, default=4)
+    scanner.set_defaults(func=bench_scanner)
+
+    resolve = sub.add_parser('resolve', help='Name lookups in deeply nested functions: Symtab chain vs Resolver')
+    resolve.add_argument('-n', '--number', type=int, default=5)
+    resolve.add_argument('--refs', type=int, default=20000)
+    resolve.add_argument('--depth', type=int, nargs='+', default=[1, 8, 32, 128])
+    resolve.set_defaults(func=bench_resolve)
+
+    cache = sub.add_parser('cache', help='Analysis from scratch vs on-disk AST cache hit')
+    cache.add_argument('inputs', nargs='*', default=['test2', 'test3'])
+    cache.add_argument('--stmts', type=int, default=20000)
+    cache.set_defaults(func=bench_cache)
+
+    incremental = sub.add_parser('incremental', help='Edit one function: incremental re-check vs full check')
+    incremental.add_argument('-n', '--number', type=int, default=5)
+    incremental.add_argument('--funcs', type=int, nargs='+', default=[10, 100, 1000])
+    incremental.add_argument('--stmts', type=int, default=10)
+    incremental.set_defaults(func=bench_incremental)
+
+    daemon = sub.add_parser('daemon', help='Cold CLI calls vs round-trips to the resident compiler')
+    daemon.add_argument('-n', '--number', type=int, default=10)
+    daemon.add_argument('--file', default='test3/fact.pl0')
+    daemon.add_argument('--stdin', default='10\\n')
+    daemon.set_defaults(func=bench_daemon)
+
+    imports = sub.add_parser('imports', help='Import-time report for pl0.py and the library modules')
+    imports.add_argument('modules', nargs='*', default=['pl0', 'context', 'batch', 'incremental'])
+    imports.add_argument('-n', '--number', type=int, default=5)
+    imports.add_argument('--top', type=int, default=8)
+    imports.set_defaults(func=bench_imports)
+
+    fold = sub.add_parser('fold', help='AST node-count reduction from constant folding')
+    fold.add_argument('inputs', nargs='*', default=['test2', 'test3', 'Pi_Spigot.pl0'])
+    fold.add_argument('-v', '--verbose', action='store_true', help='also list files with nothing to fold')
+    fold.set_defaults(func=bench_fold)
+
+    dce = sub.add_parser('dce', help='Statements, branches, loops and variables removed as dead code')
+    dce.add_argument('inputs', nargs='*', default=['test2', 'test3', 'Pi_Spigot.pl0'])
+    dce.add_argument('-v', '--verbose', action='store_true', help='also list files with nothing removed')
+    dce.set_defaults(func=bench_dce)
+
+    cfg = sub.add_parser('cfg', help='Control-flow graph construction time vs program size')
+    cfg.add_argument('groups', nargs='*', type=int, default=[250, 1000, 4000, 16000],
+                     help='while/if groups in the generated function (6 statements each)')
+    cfg.add_argument('-n', '--number', type=int, default=5)
+    cfg.set_defaults(func=bench_cfg)
+
+    dataflow = sub.add_parser('dataflow', help='Liveness, reaching definitions and definite assignment on generated functions')
+    dataflow.add_argument('groups', nargs='*', type=int, default=[250, 1000, 4000],
+                          help='while/if groups in the generated function (6 statements each)')
+    dataflow.add_argument('--vars', type=int, default=200, help='local variables in the function')
+    dataflow.add_argument('-n', '--number', type=int, default=3)
+    dataflow.set_defaults(func=bench_dataflow)
+
+    native = sub.add_parser('native', help='Native x86-64 executable vs interpreter and VM on Pi_Spigot.pl0')
+    native.add_argument('-n', '--number', type=int, default=3)
+    native.add_argument('--digits', type=int, default=1000)
+    native.set_defaults(func=bench_native)
+
+    ssa = sub.add_parser('ssa', help='SSA pass pipeline on Pi_Spigot.pl0: per-pass report and executed instructions')
+    ssa.add_argument('-n', '--number', type=int, default=3)
+    ssa.add_argument('--digits', type=int, default=200)
+    ssa.set_defaults(func=bench_ssa)
+
+    calls = sub.add_parser('calls', help='Calls executed and time with inlining and tail calls in the SSA IR')
+    calls.add_argument('-n', '--number', type=int, default=3)
+    calls.add_argument('--digits', type=int, default=100)
+    calls.add_argument('--fib', type=int, default=20)
+    calls.add_argument('--depth', type=int, default=100000)
+    calls.set_defaults(func=bench_calls)
+
+    memo = sub.add_parser('memo', help='Interpreter with and without memoization of pure functions')
+    memo.add_argument('-n', '--number', type=int, default=3)
+    memo.add_argument('--fib', type=int, default=25)
+    memo.add_argument('--digits', type=int, default=100)
+    memo.add_argument('--size', type=int, default=1024)
+    memo.set_defaults(func=bench_memo)
+
+    arrays = sub.add_parser('arrays', help='Typed array buffers vs lists, length 10^3 to 10^7')
+    arrays.add_argument('-n', '--number', type=int, default=3)
+    arrays.add_argument('--max', type=int, default=7, help='largest length is 10^MAX')
+    arrays.add_argument('--run-max', type=int, default=5, help='largest length run in the interpreter')
+    arrays.set_defaults(func=bench_arrays)
+
+    bounds = sub.add_parser('bounds', help='Array bounds checks eliminated by range analysis on Pi_Spigot.pl0')
+    bounds.add_argument('-n', '--number', type=int, default=3)
+    bounds.add_argument('--digits', type=int, default=300)
+    bounds.set_defaults(func=bench_bounds)
+
+    return cli.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    args.func(args)
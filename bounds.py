@@ -0,0 +1,334 @@
+# bounds.py
+'''
+Eliminación de chequeos de rango
+================================
+Cada ArrayLocation controla en ejecución que 0 <= índice < len(array).
+Este análisis demuestra esa condición en tiempo de compilación para
+los accesos que puede, y el intérprete y el código nativo omiten el
+chequeo en esos.
+
+Las cotas son formas lineales (símbolo, constante): el símbolo es una
+variable int que nadie asigna en todo el programa (un parámetro que no
+cambia, o una local que queda en cero) y vale lo mismo durante toda la
+vida del frame, o None si la cota es solo la constante. La longitud de
+un array local que nunca se reasigna es la forma lineal de su dim,
+como len + 1 en a: int[len + 1].
+
+Cada función se recorre en orden con los hechos que valen en cada
+punto: para sus variables int locales que no usan funciones anidadas,
+listas de cotas inferiores y superiores. Los hechos salen de
+
+* el cero inicial de las variables locales;
+* asignaciones v := E con E lineal, o v := w + c a partir de los
+  hechos de w (v := v + 1 corre las cotas de v);
+* las relaciones de while, if y del lado izquierdo de un and
+  (i <= len da la cota superior len, i >= 1 la inferior 1).
+
+En la cabecera de un while solo sobreviven los hechos que valen en
+todas las vueltas: una variable que el cuerpo solo incrementa
+(v := v + c, c >= 0) es una variable de inducción creciente y
+conserva sus cotas inferiores; si solo la decrementa conserva las
+superiores; cualquier otra asignación la descarta. Después del if
+quedan los hechos comunes a las dos ramas.
+
+Un acceso es seguro si alguna cota inferior del índice es una
+constante >= 0 y alguna superior tiene el mismo símbolo que la
+longitud y una constante menor. Las cuentas son con enteros sin
+límite, como en el intérprete; el código nativo las hace con 64 bits.
+
+usage: python bounds.py file.pl0
+'''
+import sys
+
+from cfg import functions, own_nodes
+from model import *
+
+RELATIONS = {'<', '<=', '>', '>=', '==', '!='}
+FLIP = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+NEGATE = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '==': '!=', '!=': '=='}
+
+
+def is_int(decl):
+    return (isinstance(decl, (Parameter, VarDefinition))
+            and isinstance(decl.datatype, SimpleType) and decl.datatype.name == 'int')
+
+
+def shift(facts, c):
+    lows, highs = facts
+    return [(s, k + c) for s, k in lows], [(s, k + c) for s, k in highs]
+
+
+def offset(n):
+    '''
+    (variable, c) si n es v + c, c + v o v - c con c literal.
+    '''
+    if isinstance(n, Binary) and n.op in ('+', '-'):
+        if isinstance(n.left, SimpleLocation) and isinstance(n.right, Integer):
+            return n.left, n.right.value if n.op == '+' else -n.right.value
+        if n.op == '+' and isinstance(n.left, Integer) and isinstance(n.right, SimpleLocation):
+            return n.right, n.left.value
+    return None, None
+
+
+class BoundsAnalysis:
+    '''
+    Analiza un programa ya resuelto (resolve.Resolver). safe tiene los
+    id de los ArrayLocation que no necesitan chequeo y total la
+    cantidad de accesos a arrays.
+    '''
+    def __init__(self, ast):
+        self.assigned = set()   # id(decl) de variables que se asignan
+        self.escaped = set()    # id(decl) que usa una función anidada
+        funcs = functions(ast)
+        for func in funcs:
+            for n in own_nodes(func):
+                if (isinstance(n, (Assign, Read)) and isinstance(n.location, SimpleLocation)
+                        and n.location.binding):
+                    self.assigned.add(id(n.location.binding.decl))
+                if isinstance(n, (SimpleLocation, ArrayLocation)) and n.binding and n.binding.depth:
+                    self.escaped.add(id(n.binding.decl))
+        self.safe = set()
+        self.total = 0
+        for func in funcs:
+            self.function(func)
+
+    @property
+    def eliminated(self):
+        return len(self.safe)
+
+    def __str__(self):
+        return f'bounds checks: eliminated {self.eliminated} of {self.total}'
+
+    # Formas lineales ----------------------------------------------------
+    def invariant(self, decl):
+        return is_int(decl) and id(decl) not in self.assigned
+
+    def linear(self, n):
+        '''
+        (id del símbolo o None, constante) si n es lineal, si no None.
+        '''
+        if isinstance(n, Integer):
+            return None, n.value
+        if isinstance(n, SimpleLocation):
+            if n.binding and self.invariant(n.binding.decl):
+                return id(n.binding.decl), 0
+            return None
+        if isinstance(n, Unary) and n.op in ('+', '-'):
+            fact = self.linear(n.fact)
+            if fact is None or (n.op == '-' and fact[0] is not None):
+                return None
+            return fact if n.op == '+' else (None, -fact[1])
+        if isinstance(n, Binary) and n.op in ('+', '-'):
+            left, right = self.linear(n.left), self.linear(n.right)
+            if left is None or right is None:
+                return None
+            if n.op == '+' and (left[0] is None or right[0] is None):
+                return left[0] if right[0] is None else right[0], left[1] + right[1]
+            if n.op == '-' and right[0] is None:
+                return left[0], left[1] - right[1]
+        return None
+
+    def value(self, n, facts):
+        '''
+        (cotas inferiores, cotas superiores) de la expresión n, o None.
+        '''
+        form = self.linear(n)
+        if form is not None:
+            return [form], [form]
+        if isinstance(n, SimpleLocation):
+            return facts.get(id(n.binding.decl)) if n.binding else None
+        var, c = offset(n)
+        if var is not None and var.binding and id(var.binding.decl) in facts:
+            return shift(facts[id(var.binding.decl)], c)
+        return None
+
+    def length(self, n):
+        decl = n.binding.decl if n.binding else None
+        if (isinstance(decl, VarDefinition) and isinstance(decl.datatype, ArrayType)
+                and id(decl) not in self.assigned):
+            return self.linear(decl.datatype.dim)
+        return None
+
+    # Hechos -------------------------------------------------------------
+    def variable(self, n):
+        # id de la variable seguida si n es una de ellas, si no None
+        if isinstance(n, SimpleLocation) and n.binding and id(n.binding.decl) in self.tracked:
+            return id(n.binding.decl)
+        return None
+
+    def condition(self, n, truth, facts):
+        '''
+        Agrega a facts lo que vale cuando n da truth.
+        '''
+        if isinstance(n, Unary) and n.op == 'not':
+            self.condition(n.fact, not truth, facts)
+        elif isinstance(n, Logical) and n.op == ('and' if truth else 'or'):
+            self.condition(n.left, truth, facts)
+            self.condition(n.right, truth, facts)
+        elif isinstance(n, Logical) and n.op in RELATIONS:
+            op = n.op if truth else NEGATE[n.op]
+            var, form = self.variable(n.left), self.linear(n.right)
+            if var is None or form is None:
+                var, form, op = self.variable(n.right), self.linear(n.left), FLIP[op]
+            if var is None or form is None:
+                return
+            lows, highs = facts.get(var, ([], []))
+            sym, c = form
+            if op in ('>', '>=', '=='):
+                lows = lows + [(sym, c + 1 if op == '>' else c)]
+            if op in ('<', '<=', '=='):
+                highs = highs + [(sym, c - 1 if op == '<' else c)]
+            facts[var] = lows, highs
+
+    def assign(self, var, facts, bounds):
+        if bounds is None or not (bounds[0] or bounds[1]):
+            facts.pop(var, None)
+        else:
+            facts[var] = bounds
+
+    def deltas(self, body):
+        '''
+        {variable: dirección} de las variables seguidas que asigna body:
+        1 si solo crecen, -1 si solo decrecen, None si cambian de otra
+        forma.
+        '''
+        found = {}
+        stack = [body]
+        while stack:
+            n = stack.pop()
+            if isinstance(n, list):
+                stack.extend(n)
+                continue
+            if not isinstance(n, Node) or isinstance(n, (FunDefinition, DataType)):
+                continue
+            stack.extend(children(n))
+            if not isinstance(n, (Assign, Read)):
+                continue
+            var = self.variable(n.location)
+            if var is None:
+                continue
+            step = None
+            if isinstance(n, Assign):
+                source, c = offset(n.expr)
+                if source is not None and self.variable(source) == var:
+                    step = 1 if c >= 0 else -1
+            if var in found and found[var] != step:
+                step = None
+            found[var] = step
+        return found
+
+    # Recorrido ----------------------------------------------------------
+    def function(self, func):
+        parms = func.parmlist.parmlist if func.parmlist else []
+        local = func.varlist.varlist if func.varlist else []
+        self.tracked = {id(decl) for decl in parms + local
+                        if is_int(decl) and id(decl) not in self.escaped}
+        facts = {}
+        for var in local:
+            if isinstance(var, VarDefinition) and isinstance(var.datatype, ArrayType):
+                self.expr(var.datatype.dim, {})
+            elif id(var) in self.tracked:
+                facts[id(var)] = [(None, 0)], [(None, 0)]
+        self.stmt(func.stmtlist, facts)
+
+    def access(self, n, facts):
+        self.expr(n.index, facts)
+        self.total += 1
+        index, length = self.value(n.index, facts), self.length(n)
+        if index is None or length is None:
+            return
+        lows, highs = index
+        if (any(sym is None and c >= 0 for sym, c in lows)
+                and any(sym == length[0] and c < length[1] for sym, c in highs)):
+            self.safe.add(id(n))
+
+    def expr(self, n, facts):
+        if isinstance(n, list):
+            for item in n:
+                self.expr(item, facts)
+        elif isinstance(n, ArrayLocation):
+            self.access(n, facts)
+        elif isinstance(n, Logical) and n.op in ('and', 'or'):
+            # El lado derecho solo se evalúa si el izquierdo no decide
+            self.expr(n.left, facts)
+            right = dict(facts)
+            self.condition(n.left, n.op == 'and', right)
+            self.expr(n.right, right)
+        elif isinstance(n, Node) and not isinstance(n, (FunDefinition, DataType)):
+            for child in children(n):
+                self.expr(child, facts)
+
+    def stmt(self, n, facts):
+        '''
+        Recorre n con los hechos de antes y deja en facts los de después.
+        '''
+        if isinstance(n, StmtList):
+            for stmt in n.stmtlist:
+                self.stmt(stmt, facts)
+        elif isinstance(n, Assign):
+            self.expr(n.expr, facts)
+            if isinstance(n.location, ArrayLocation):
+                self.access(n.location, facts)
+            elif (var := self.variable(n.location)) is not None:
+                self.assign(var, facts, self.value(n.expr, facts))
+        elif isinstance(n, Read):
+            if isinstance(n.location, ArrayLocation):
+                self.access(n.location, facts)
+            elif (var := self.variable(n.location)) is not None:
+                facts.pop(var, None)
+        elif isinstance(n, IfStmt):
+            self.expr(n.relation, facts)
+            then, other = dict(facts), dict(facts)
+            self.condition(n.relation, True, then)
+            self.condition(n.relation, False, other)
+            self.stmt(n.thenstmt, then)
+            self.stmt(n.elsestmt, other)
+            facts.clear()
+            for var, (lows, highs) in then.items():
+                if var in other:
+                    self.assign(var, facts, ([b for b in lows if b in other[var][0]],
+                                             [b for b in highs if b in other[var][1]]))
+        elif isinstance(n, While):
+            steps = self.deltas(n.stmt)
+            for var, (lows, highs) in list(facts.items()):
+                if var in steps:
+                    step = steps[var]
+                    self.assign(var, facts, (lows if step == 1 else [],
+                                             highs if step == -1 else []))
+            # Lo que queda vale en cada vuelta y también a la salida
+            self.expr(n.relation, facts)
+            body = dict(facts)
+            self.condition(n.relation, True, body)
+            self.stmt(n.stmt, body)
+        else:
+            self.expr(n, facts)
+
+
+def main(argv):
+    from context import Context
+    from resolve import Resolver
+
+    if len(argv) != 2:
+        raise SystemExit('usage: python bounds.py file.pl0')
+    context = Context()
+    with open(argv[1], encoding='utf-8') as f:
+        context.parse(f.read())
+    if context.have_errors:
+        sys.exit(1)
+    errors = Resolver.resolve(context.ast)
+    for message, node in errors:
+        context.error(message, node)
+    if errors:
+        sys.exit(1)
+    analysis = BoundsAnalysis(context.ast)
+    accesses = [(context.parser.line_position(n), func.name, n)
+                for func in functions(context.ast)
+                for n in own_nodes(func) if isinstance(n, ArrayLocation)]
+    for line, name, n in sorted(accesses, key=lambda access: access[:2]):
+        print(f'{line:>5}: {name}: {context.find_source(n):<24} '
+              f'{"safe" if id(n) in analysis.safe else "checked"}')
+    print(analysis)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
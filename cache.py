@@ -0,0 +1,203 @@
+# cache.py
+'''
+Cache de compilación
+====================
+Guarda en disco el resultado del análisis de un programa (el AST de
+model.py, ya chequeado si se pidió, sus diagnósticos y las posiciones
+de los nodos en el fuente) para no repetir el lexer, el parser y el
+checker sobre archivos que no cambiaron.
+
+La clave de cada entrada es un sha256 del fuente, del tipo de análisis
+('parse' o 'check') y de la versión del compilador: una firma de los
+módulos del front-end y de todos los del repositorio que ellos
+importan, así que cualquier cambio en el lexer, el parser, el modelo,
+el checker o lo que usa el checker (typeinfo, cfg, ...) invalida el
+cache.
+
+Las entradas son archivos <clave>.pickle en cachedir/ast. Cada acierto
+actualiza la fecha de modificación del archivo y, cuando el total
+supera maxsize bytes, se borran las entradas usadas hace más tiempo
+(LRU). El tamaño por defecto es 64 MiB (variable PL0_CACHE_SIZE).
+'''
+import hashlib
+import os
+import pickle
+import sys
+from ast import Import, ImportFrom, parse
+from contextlib import contextmanager
+
+import sly
+
+from model import SLOTS
+from pparser import cachedir
+
+# Módulos cuyo código define el resultado del análisis (más los que
+# importan, ver frontend_files)
+_frontend = ['errors.py', 'model.py', 'plex.py', 'pparser.py', 'resolve.py',
+             'checker.py', 'typesys.py', 'cache.py']
+
+_here = os.path.dirname(os.path.abspath(__file__))
+_version = None
+
+
+def frontend_files(directory):
+    '''
+    Los módulos de _frontend y los del directorio que importan, directa
+    o indirectamente, en el nivel del módulo (los import dentro de
+    funciones, como los de main(), no cuentan).
+    '''
+    found = []
+    stack = list(reversed(_frontend))
+    while stack:
+        name = stack.pop()
+        path = os.path.join(directory, name)
+        if name in found or not os.path.exists(path):
+            continue
+        found.append(name)
+        with open(path, encoding='utf-8') as f:
+            tree = parse(f.read(), path)
+        for stmt in tree.body:
+            if isinstance(stmt, Import):
+                stack.extend(alias.name + '.py' for alias in stmt.names)
+            elif isinstance(stmt, ImportFrom) and stmt.module and not stmt.level:
+                stack.append(stmt.module + '.py')
+    return found
+
+
+def compiler_version():
+    global _version
+    if _version is None:
+        h = hashlib.sha256()
+        h.update(f'{sys.version_info[:2]} {sly.__version__} slots={SLOTS}'.encode())
+        for name in frontend_files(_here):
+            with open(os.path.join(_here, name), 'rb') as f:
+                h.update(f.read())
+        _version = h.hexdigest()
+    return _version
+
+
+@contextmanager
+def recursion_limit(limit):
+    # pickle recorre el AST recursivamente: el límite se sube solo
+    # mientras dura la operación
+    old = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old, limit))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(old)
+
+
+def ast_positions(ast, parser):
+    '''
+    Lista de (nodo, línea, (inicio, fin)) de los nodos de ast cuya
+    posición conoce el parser.
+    '''
+    lines = getattr(parser, '_line_positions', {})
+    indices = getattr(parser, '_index_positions', {})
+    positions = []
+    seen = set()
+    stack = [ast]
+    while stack:
+        n = stack.pop()
+        if isinstance(n, list):
+            stack.extend(n)
+        elif hasattr(n, '__dataclass_fields__') and id(n) not in seen:
+            seen.add(id(n))
+            if id(n) in indices:
+                positions.append((n, lines[id(n)], indices[id(n)]))
+            stack.extend(getattr(n, name) for name in n.__dataclass_fields__)
+    return positions
+
+
+class ASTCache:
+    '''
+    Cache LRU en disco, con contadores de aciertos y fallos.
+    '''
+    def __init__(self, directory=None, maxsize=None):
+        self.directory = directory or os.path.join(cachedir, 'ast')
+        self.maxsize = maxsize or int(os.environ.get('PL0_CACHE_SIZE', 64 * 2**20))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, source, kind):
+        h = hashlib.sha256()
+        h.update(compiler_version().encode())
+        h.update(kind.encode())
+        h.update(source.encode('utf-8'))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def load(self, key):
+        '''
+        Entrada guardada con la clave dada, o None.
+        '''
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f, recursion_limit(20000):
+                record = pickle.load(f)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, RecursionError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def store(self, key, record):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f'{self.path(key)}.{os.getpid()}'
+            with open(tmp, 'wb') as f, recursion_limit(20000):
+                pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(key))
+        except (OSError, pickle.PicklingError, RecursionError):
+            # El cache es opcional: si no se puede escribir, se ignora
+            return
+        self.evict()
+
+    def entries(self):
+        # (última vez usada, tamaño, ruta) de cada entrada
+        try:
+            scan = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        entries = []
+        for entry in scan:
+            if entry.name.endswith('.pickle'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.maxsize:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.evictions += 1
+            total -= size
+            if total <= self.maxsize:
+                break
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        entries = self.entries()
+        size = sum(size for _, size, _ in entries)
+        return (f'cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, '
+                f'{len(entries)} entries, {size / 2**20:.2f} of {self.maxsize / 2**20:.0f} MiB')
@@ -0,0 +1,309 @@
+# cfg.py
+'''
+Grafo de flujo de control
+=========================
+Baja el cuerpo de cada FunDefinition a bloques básicos con aristas
+explícitas, para que los análisis de flujo de datos recorran un grafo
+en lugar de la anidación de While, IfStmt y StmtList.
+
+Un bloque es una secuencia de nodos que se ejecutan uno detrás de
+otro: instrucciones (Assign, Read, Write, Print, Return y llamadas
+usadas como instrucción) y, al final, la condición de un if o de un
+while cuando el bloque termina en un salto condicional. Skip y Break
+no aparecen como nodos: Break es una arista hacia la salida del while.
+
+Todo se guarda en arreglos de enteros indexados por número de bloque:
+
+    nodes           lista de los nodos de todos los bloques, en orden
+    start[b]        índice en nodes del primer nodo del bloque b;
+                    start[nblocks] = len(nodes)
+    succ_index[b]   las aristas que salen de b son
+                    succ[succ_index[b]:succ_index[b + 1]]
+    pred_index[b]   ídem para las que entran (pred)
+
+El bloque 0 es la entrada y el último (vacío) es la salida, a donde
+llegan todos los Return y el final del cuerpo. Un bloque que termina
+en condición tiene dos sucesores: primero el de la condición
+verdadera y después el de la falsa. El código inalcanzable (después de
+un Return o de un Break) queda en bloques sin predecesores.
+
+Construir el grafo visita cada instrucción una vez y ordena las
+aristas con un conteo, así que el tiempo es lineal en el tamaño de
+la función.
+
+usage: python cfg.py file.pl0
+'''
+import sys
+from array import array
+
+from model import *
+
+
+class CFG:
+    '''
+    Grafo de flujo de una función (ver el docstring del módulo).
+    '''
+    def __init__(self, func, nodes, start, succ_index, succ, pred_index, pred):
+        self.func = func
+        self.nodes = nodes
+        self.start = start
+        self.succ_index = succ_index
+        self.succ = succ
+        self.pred_index = pred_index
+        self.pred = pred
+
+    @property
+    def nblocks(self):
+        return len(self.start) - 1
+
+    @property
+    def entry(self):
+        return 0
+
+    @property
+    def exit(self):
+        return len(self.start) - 2
+
+    def block(self, b):
+        return self.nodes[self.start[b]:self.start[b + 1]]
+
+    def successors(self, b):
+        return self.succ[self.succ_index[b]:self.succ_index[b + 1]]
+
+    def predecessors(self, b):
+        return self.pred[self.pred_index[b]:self.pred_index[b + 1]]
+
+    def condition(self, b):
+        '''
+        Condición con la que termina el bloque b, o None.
+        '''
+        if self.succ_index[b + 1] - self.succ_index[b] == 2:
+            return self.nodes[self.start[b + 1] - 1]
+        return None
+
+    def postorder(self):
+        '''
+        Bloques alcanzables desde la entrada, en postorden.
+        '''
+        order = array('i')
+        seen = bytearray(self.nblocks)
+        seen[self.entry] = 1
+        stack = [(self.entry, self.succ_index[self.entry])]
+        while stack:
+            b, i = stack[-1]
+            if i < self.succ_index[b + 1]:
+                stack[-1] = (b, i + 1)
+                s = self.succ[i]
+                if not seen[s]:
+                    seen[s] = 1
+                    stack.append((s, self.succ_index[s]))
+            else:
+                stack.pop()
+                order.append(b)
+        return order
+
+    def dump(self, describe=lambda node: type(node).__name__):
+        lines = [f'fun {self.func.name}: {self.nblocks} blocks, {len(self.succ)} edges']
+        for b in range(self.nblocks):
+            preds = ' '.join(f'B{p}' for p in self.predecessors(b)) or '-'
+            succs = ' '.join(f'B{s}' for s in self.successors(b)) or '-'
+            name = ' (entry)' if b == self.entry else ' (exit)' if b == self.exit else ''
+            lines.append(f'  B{b}{name}  preds {preds}  succs {succs}')
+            for node in self.block(b):
+                lines.append(f'      {describe(node)}')
+        return '\n'.join(lines)
+
+
+def compress(nblocks, edges, key, value):
+    # (índice, destinos) de las aristas agrupadas por edge[key], con un
+    # conteo: estable, así que se respeta el orden en que se agregaron
+    index = array('i', bytes(4 * (nblocks + 1)))
+    for edge in edges:
+        index[edge[key] + 1] += 1
+    for b in range(nblocks):
+        index[b + 1] += index[b]
+    targets = array('i', bytes(4 * len(edges)))
+    fill = array('i', index)
+    for edge in edges:
+        targets[fill[edge[key]]] = edge[value]
+        fill[edge[key]] += 1
+    return index, targets
+
+
+class Builder(Visitor):
+    '''
+    Construye el CFG de una función. self.open dice si la ejecución
+    puede llegar al final del bloque actual (es False después de un
+    Return o de un Break, hasta que empiece un bloque nuevo).
+    '''
+    def __init__(self):
+        self.nodes = []
+        self.start = array('i')
+        self.edges = []         # (origen, destino) en el orden en que se agregan
+        self.loops = []         # bloques con un Break, por cada while abierto
+        self.returns = []       # bloques que terminan en Return
+        self.current = self.new_block()
+
+    @classmethod
+    def build(cls, func):
+        builder = cls()
+        builder.visit(func.stmtlist)
+        last, falls = builder.current, builder.open
+        exit = builder.new_block()
+        if falls:
+            builder.edge(last, exit)
+        for b in builder.returns:
+            builder.edge(b, exit)
+        builder.start.append(len(builder.nodes))
+
+        nblocks = len(builder.start) - 1
+        succ_index, succ = compress(nblocks, builder.edges, 0, 1)
+        pred_index, pred = compress(nblocks, builder.edges, 1, 0)
+        return CFG(func, builder.nodes, builder.start, succ_index, succ, pred_index, pred)
+
+    def new_block(self):
+        self.start.append(len(self.nodes))
+        self.current = len(self.start) - 1
+        self.open = True
+        return self.current
+
+    def edge(self, source, target):
+        self.edges.append((source, target))
+
+    def append(self, node):
+        if not self.open:
+            # Código inalcanzable: bloque sin predecesores
+            self.new_block()
+        self.nodes.append(node)
+
+    def label(self):
+        '''
+        Bloque que puede ser destino de un salto: el actual si está
+        vacío (salvo la entrada) o uno nuevo al que se cae desde el actual.
+        '''
+        if self.open and self.current != 0 and self.start[self.current] == len(self.nodes):
+            return self.current
+        previous, falls = self.current, self.open
+        block = self.new_block()
+        if falls:
+            self.edge(previous, block)
+        return block
+
+    # Instrucciones ----------------------------------------------------
+    def visit(self, n: StmtList):
+        for stmt in n.stmtlist:
+            self.visit(stmt)
+
+    def visit(self, n: Skip):
+        pass
+
+    def visit(self, n: Node):
+        # Assign, Read, Write, Print y llamadas usadas como instrucción
+        self.append(n)
+
+    def visit(self, n: Return):
+        self.append(n)
+        self.returns.append(self.current)
+        self.open = False
+
+    def visit(self, n: Break):
+        if self.open:
+            if self.loops:
+                self.loops[-1].append(self.current)
+            else:
+                # Break fuera de un while (lo reporta el checker)
+                self.returns.append(self.current)
+        self.open = False
+
+    def visit(self, n: IfStmt):
+        self.append(n.relation)
+        cond = self.current
+        self.edge(cond, self.new_block())
+        self.visit(n.thenstmt)
+        ends = [self.current] if self.open else []
+        if n.elsestmt:
+            self.edge(cond, self.new_block())
+            self.visit(n.elsestmt)
+            if self.open:
+                ends.append(self.current)
+        else:
+            ends.append(cond)
+        join = self.new_block()
+        for b in ends:
+            self.edge(b, join)
+
+    def visit(self, n: While):
+        header = self.label()
+        self.append(n.relation)
+        self.edge(header, self.new_block())
+        self.loops.append([])
+        self.visit(n.stmt)
+        if self.open:
+            self.edge(self.current, header)
+        breaks = self.loops.pop()
+        exit = self.new_block()
+        self.edge(header, exit)
+        for b in breaks:
+            self.edge(b, exit)
+
+
+def functions(node):
+    '''
+    Todas las FunDefinition de node, incluidas las anidadas, en el
+    orden en que aparecen.
+    '''
+    funcs = []
+    stack = list(reversed(node.funclist)) if isinstance(node, Program) else [node]
+    while stack:
+        func = stack.pop()
+        funcs.append(func)
+        if func.varlist:
+            stack.extend(reversed([var for var in func.varlist.varlist if isinstance(var, FunDefinition)]))
+    return funcs
+
+
+def own_nodes(func):
+    '''
+    Nodos del cuerpo de func y de los tamaños de sus arrays locales,
+    sin entrar en las funciones anidadas.
+    '''
+    stack = [func.stmtlist]
+    for var in func.varlist.varlist if func.varlist else []:
+        if isinstance(var, VarDefinition) and isinstance(var.datatype, ArrayType):
+            stack.append(var.datatype.dim)
+    while stack:
+        n = stack.pop()
+        if isinstance(n, list):
+            stack.extend(n)
+        elif isinstance(n, Node) and not isinstance(n, (FunDefinition, DataType)):
+            yield n
+            stack.extend(children(n))
+
+
+def build(node):
+    '''
+    Lista con el CFG de cada función de node (un Program o una
+    FunDefinition).
+    '''
+    return [Builder.build(func) for func in functions(node)]
+
+
+def main(argv):
+    from context import Context
+
+    if len(argv) != 2:
+        raise SystemExit('usage: python cfg.py file.pl0')
+    context = Context()
+    with open(argv[1], encoding='utf-8') as f:
+        context.parse(f.read())
+    if context.have_errors:
+        sys.exit(1)
+
+    def describe(node):
+        return ' '.join(context.find_source(node).split())
+    for graph in build(context.ast):
+        print(graph.dump(describe))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -178,7 +178,11 @@ No siempre está claro cómo organizar mejor todo eso. Por lo tanto, espere an
 from model import *
 from plex import Lexer
 from pparser import Parser
-from rich import print
+from errors import Reporter
+from resolve import Resolver
+from cfg import functions, own_nodes
+from typeinfo import datatype, return_types
+from typesys import bool_type, int_type, lookup_type, opcodes, check_binary_code, check_unary_code
 # ---------------------------------------------------------------------
 #  Tabla de Simbolos
 # ---------------------------------------------------------------------
@@ -235,18 +239,13 @@ class Symtab:
         simbol, recorriendo hacia arriba a traves de las tablas
         de simbol principales si no se encuentra en la actual.
         '''
-        if name in self.entries:
-            return self.entries[name]
-        elif self.parent:
-            return self.parent.get(name)
+        env = self
+        while env:
+            if name in env.entries:
+                return env.entries[name]
+            env = env.parent
         return None
-    
-    def current_func(self):
-        if self.parent:
-            return list(self.parent.entries.keys())[0]
-        else:
-            return None
-    
+
 @dataclass
 class Integer(Literal):
     value : int
@@ -263,34 +262,61 @@ class SimpleLocation(Location):
     name: str
     dtype : DataType = field(init=False)
 
-class Checker(Visitor):
-    loop_stack=[]
+class Checker(Visitor, Reporter):
+
+    def __init__(self, quiet=False, line=None):
+        # Los errores quedan en self.diagnostics (y se imprimen si no es quiet)
+        # y en self.errors como (mensaje, nodo). line(nodo) da la línea
+        # del nodo en el fuente, o None si no se conoce
+        self.stage = 'checker'
+        self.quiet = quiet
+        self.line = line or (lambda node: None)
+        self.diagnostics = []
+        self.errors = []
+        # Propia de cada checker: un chequeo que falla a mitad de un
+        # while no deja la pila sucia para el siguiente
+        self.loop_stack = []
+
+    def error(self, message, node):
+        self.errors.append((message, node))
+        self.report(message, self.line(node) or 0)
+
     def visit(self, n: Literal, env: Symtab):
         # Devolver datatype
-        return n.dtype.name
+        return n.dtype
     def visit(self, n: Location, env: Symtab):
-        # Buscar en Symtab y extraer datatype (No se encuentra?)
-        # Devuelvo el datatype
-        if env.get(n.name):
-            return env.get(n.name).datatype.name
+        # La declaración ya está enlazada (resolve.Resolver)
+        # Devuelvo el datatype (el ArrayType si es un array sin índice)
+        if n.binding:
+            return datatype(n.binding.decl)
         else:
-            print("Error location")
+            self.error("Error location", n)
+
+    def visit(self, n: ArrayLocation, env: Symtab):
+        # El índice tiene que ser int
+        # Devuelvo el datatype de los elementos
+        if self.visit(n.index,env) is not int_type:
+            self.error("Error index", n)
+        if n.binding:
+            return lookup_type(n.binding.decl.datatype.name)
+        else:
+            self.error("Error location", n)
     
     def visit(self, n: TypeCast, env: Symtab):
         # Visitar la expresion asociada
         # Devolver datatype asociado al nodo
         self.visit(n.expr,env)
-        return n.name
+        return lookup_type(n.name)
     def visit(self, n: Assign, env: Symtab):
         # Visitar el hijo izquierdo (devuelve datatype)
         # Visitar el hijo derecho (devuelve datatype)
         # Comparar ambos tipo de datatype
         Left=self.visit(n.location,env)
         Right=self.visit(n.expr,env)
-        if Left == Right:
+        if Left is Right:
             return Left
         else:
-            print("Error assign")
+            self.error("Error assign", n)
             return None
     
     def visit(self, n: FuncCall, env: Symtab):
@@ -299,15 +325,20 @@ class Checker(Visitor):
         # Comparar el numero de argumentos con parametros
         # Comparar cada uno de los tipos de los argumentos con los parametros
         # Retornar el datatype de la funcion   
-        datatype=env.get(n.name).dtype
-        if env.get(n.name):
-            pass
-        self.visit(n.arglist,env)
-        if len(n.arglist.arglist) == len(env.get(n.name).parmlist.parmlist):
+        if not n.binding:
+            self.error("error funcall", n)
+            return None
+        func = n.binding.decl
+        # Una llamada sin argumentos no tiene ArgList
+        args = n.arglist.arglist if n.arglist else []
+        if n.arglist:
+            self.visit(n.arglist,env)
+        parms = func.parmlist.parmlist if func.parmlist else []
+        if len(args) == len(parms):
             pass
         else:
-            print("error funcall")
-        return datatype
+            self.error("error funcall", n)
+        return func.dtype
 
     def visit(self, n: Binary, env: Symtab):
         # Visitar el hijo izquierdo (devuelve datatype)
@@ -315,10 +346,11 @@ class Checker(Visitor):
         # Comparar ambos tipo de datatype
         TLeft=self.visit(n.left,env)
         TRight=self.visit(n.right,env)
-        if TLeft == TRight:
-            return TLeft
+        datatype = check_binary_code(opcodes[n.op], TLeft, TRight)
+        if datatype:
+            return datatype
         else:
-            print("Error Binary")
+            self.error("Error Binary", n)
             
     def visit(self, n: Logical, env: Symtab):
         # Visitar el hijo izquierdo (devuelve datatype)
@@ -326,15 +358,18 @@ class Checker(Visitor):
         # Comparar ambos tipo de datatype
         TLeft=self.visit(n.left,env)
         TRight=self.visit(n.right,env)
-        if TLeft == TRight:
-            return bool
+        datatype = check_binary_code(opcodes[n.op], TLeft, TRight)
+        if datatype:
+            return datatype
         else:
-            print("error logical",n.left,TRight)
+            self.error(f"error logical {n.op} {getattr(TLeft, 'name', None)} {getattr(TRight, 'name', None)}", n)
 
     def visit(self, n: Unary, env: Symtab):
         # Visitar la expression asociada (devuelve datatype)
         # Comparar datatype
-        datatype= self.visit(n.fact, env)
+        datatype = check_unary_code(opcodes[n.op], self.visit(n.fact, env))
+        if not datatype:
+            self.error("Error unary", n)
         return datatype
         
     def visit(self, n: FunDefinition, env: Symtab):
@@ -342,8 +377,8 @@ class Checker(Visitor):
         # Crear un nuevo contexto (Symtab)
         # Visitar ParamList, VarList, StmtList
         # Determinar el datatype de la funcion (revisando instrucciones return)
-        env.add(n.name,FunDefinition(name=n.name,parmlist=n.parmlist,varlist=n.varlist,stmtlist=n.stmtlist))
-        env.get(n.name).dtype: DataType = field(init=False)
+        env.add(n.name,n)
+        self.seed_returns(n)
         TFunc=Symtab(env)
         if n.parmlist:
             for parm in n.parmlist.parmlist:
@@ -351,42 +386,56 @@ class Checker(Visitor):
         if n.varlist:
             for var in n.varlist.varlist:
                 self.visit(var,TFunc)
+        # Cada Return se compara con n.dtype
         for stmt in n.stmtlist.stmtlist:
             self.visit(stmt,TFunc)
-            if isinstance(stmt,Return):
-                env.get(n.name).dtype = self.visit(stmt,TFunc)
-        
+
+    def seed_returns(self, n):
+        # Tipo de retorno de n y de sus funciones anidadas antes de
+        # recorrer los cuerpos, para que una llamada recursiva ya lo
+        # vea. Las demás funciones llamadas tienen el que ya se les dio.
+        funcs = functions(n)
+        inside = {id(func) for func in funcs}
+        known = {}
+        for func in funcs:
+            for node in own_nodes(func):
+                if isinstance(node, FuncCall) and node.binding:
+                    callee = node.binding.decl
+                    if id(callee) not in inside and callee.dtype is not None:
+                        known[id(callee)] = callee.dtype
+        returns = return_types(funcs, known, default=None)
+        for func in funcs:
+            func.dtype = returns.get(id(func))
+
     def visit(self, n: VarDefinition, env: Symtab):
         # Agregar el nombre de la variable a Symtab
-        env.add(n.name,VarDefinition(name=n.name,datatype=n.datatype))
+        env.add(n.name,n)
 
     def visit(self, n: Parameter, env: Symtab):
         # Agregar el nombre del parametro a Symtab
-        env.add(n.name,Parameter(name=n.name,datatype=n.datatype))
+        env.add(n.name,n)
      
         
     def visit(self, n: Print, env: Symtab):
         ...		
 
     def visit(self, n: Write, env: Symtab):
-        # Buscar la Variable en Symtab
-        if env.get(n.expr.name):
-            pass
-        else: 
-            print("error en write")  
+        # Visitar la expresion asociada
+        self.visit(n.expr,env)
         
     def visit(self, n: Read, env: Symtab):
-        # Buscar la Variable en Symtab
-        if env.get(n.location.name):
+        # La variable ya está enlazada (resolve.Resolver)
+        if n.location.binding:
             ...
         else:
-            print("Error en read")
+            self.error("Error en read", n)
    
         
     def visit(self, n: While, env: Symtab):
         # Visitar la condicion del While (Comprobar tipo bool)
         # Visitar las Stmts
-        self.visit(n.relation,env)
+        if self.visit(n.relation,env) is not bool_type:
+            self.error("Error no bool", n)
         self.loop_stack.append("while")
         self.visit(n.stmt,env)
         self.loop_stack.pop()
@@ -396,42 +445,44 @@ class Checker(Visitor):
         if "while" in self.loop_stack:
             pass
         else:
-            print("Error: Break fuera de un bucle while.")
+            self.error("Error: Break fuera de un bucle while.", n)
      
     def visit(self, n: IfStmt, env: Symtab):
         # Visitar la condicion del IfStmt (Comprobar tipo bool)
         # Visitar las Stmts del then y else
-        if self.visit(n.relation,env) == bool:
-            return bool
-        else:
-            print("Error no bool")
+        if self.visit(n.relation,env) is not bool_type:
+            self.error("Error no bool", n)
         self.visit(n.thenstmt,env)
         if n.elsestmt:
             self.visit(n.elsestmt,env)
     
     def visit(self, n: Return, env: Symtab):
         # Visitar la expresion asociada
-        # Actualizar el datatype de la funcion
-        # Obtener el tipo de la expresión asociada
-        datatype = self.visit(n.value, env)
-        # Actualizar el datatype de la función
-        name = env.current_func()
-        env.get(name).dtype = datatype
-        return datatype  # Agregamos el retorno del tipo
+        # Comparar con el datatype de la funcion (seed_returns)
+        dtype = self.visit(n.value, env)
+        if n.func.dtype is None:
+            n.func.dtype = dtype
+        elif dtype is not None and dtype is not n.func.dtype:
+            self.error("Error return", n)
+        return dtype
         
     def visit(self, n: Skip, env: Symtab):
         ...
 
     def visit(self, n: Program, env: Symtab):
+        # Los nombres ya están enlazados (Resolver.resolve antes del checker)
         # Crear un nuevo contexto (Symtab global)
-        # Visitar cada una de las declaraciones asociadas        
+        # Visitar cada una de las declaraciones asociadas
+        # Sin los tipos de retorno de un chequeo anterior del mismo AST
+        for func in functions(n):
+            func.dtype = None
         EnvProgram=Symtab()
         for func in n.funclist:
             self.visit(func,EnvProgram)
         if 'main' in list(EnvProgram.entries.keys()):
             pass
         else:
-            print("No tiene main")
+            self.report("No tiene main")
             
     def visit(self, n: StmtList, env: Symtab):
         # Visitar cada una de las instruciones asociadas
@@ -459,6 +510,8 @@ def main(argv):
     txt = open('test3/errors/' + argv[1]).read()
     parser = Parser()
     Nodo = parser.parse(lex.tokenize(txt))
+    for message, node in Resolver.resolve(Nodo):
+        print(message)
     semantico=Checker()
     Tabla= Symtab()
     semantico.visit(Nodo,Tabla)
@@ -4,31 +4,232 @@ Clase de alto nivel que contiene todo sobre el análisis/ejecución de un prog
 
 Sirve como repositorio de información sobre el programa, incluido el código fuente, informe de errores, etc.
 '''
-#from interp  import Interpreter
+import time
+
+from checker  import Checker, Symtab
+from asmcode  import AsmGenerator, assemble
+from cache    import ast_positions
+from errors   import Diagnostic, print_diagnostic
+from interp   import Interpreter, PL0RuntimeError
+from ircode   import IRGenerator, VM
 from model    import Node
-from plex     import Lexer
+from optimize import ConstantFolder, DeadCodeEliminator
+from plex     import scanners
 from pparser  import Parser
+from resolve  import Resolver
+from ssa      import Machine, PassManager, build as build_ssa
 
 
 class Context:
-
-  def __init__(self):
-    self.lexer  = Lexer()
-    self.parser = Parser()
-    #self.interp = Interpreter(self)
+  '''
+  Con quiet=True ninguna etapa imprime errores: todos quedan en
+  self.diagnostics (objetos errors.Diagnostic) en el orden en que
+  ocurrieron. scanner elige el analizador léxico: 'sly' (plex.Lexer)
+  o 'fast' (plex.Scanner, mismos tokens). cache es un cache.ASTCache
+  opcional que usa analyze().
+  '''
+  def __init__(self, quiet=False, scanner='sly', cache=None):
+    self.quiet  = quiet
+    self.cache  = cache
+    self.diagnostics = []
+    self.lexer  = scanners[scanner](quiet)
+    self.parser = Parser(quiet)
+    self.lexer.diagnostics = self.parser.diagnostics = self.diagnostics
+    self.interp = Interpreter(self)
+    self.bounds = None
+    self.cached = False
+    self.parse_time = self.check_time = 0.0
     self.source = ''
     self.ast    = None
     self.have_errors = False
 
   def parse(self, source):
+    # Los tokens pasan del lexer al parser a medida que se generan
     self.have_errors = False
     self.source = source
-    print(source)
+    self.diagnostics.clear()
+    self.parser.errors = 0
+    # Posiciones de los nodos (SLY no las borra entre un parse y otro)
+    self.parser._line_positions = {}
+    self.parser._index_positions = {}
     self.ast = self.parser.parse(self.lexer.tokenize(self.source))
+    if self.diagnostics or self.ast is None:
+      self.have_errors = True
+
+  def analyze(self, source, check=False):
+    '''
+    parse() y, si check es True, check(). Con cache, un fuente que ya
+    se analizó se recupera de disco sin pasar por el parser ni el
+    checker, y self.cached queda en True. self.parse_time y
+    self.check_time son los segundos de cada etapa (al recuperar del
+    cache todo cuenta como parse_time).
+    '''
+    self.cached = False
+    self.check_time = 0.0
+    t = time.perf_counter()
+    key = None
+    if self.cache is not None:
+      key = self.cache.key(source, 'check' if check else 'parse')
+      record = self.cache.load(key)
+      if record:
+        self.restore(source, record)
+        self.cached = True
+        self.parse_time = time.perf_counter() - t
+        return
+
+    self.parse(source)
+    self.parse_time = time.perf_counter() - t
+    if check:
+      t = time.perf_counter()
+      self.check()
+      self.check_time = time.perf_counter() - t
+    if key is not None:
+      self.cache.store(key, self.record())
+
+  def record(self):
+    '''
+    Resultado del último análisis, tal como lo guarda el cache.
+    '''
+    return {
+      'ast': self.ast,
+      'diagnostics': list(self.diagnostics),
+      'positions': ast_positions(self.ast, self.parser),
+    }
+
+  def restore(self, source, record):
+    self.source = source
+    self.ast = record['ast']
+    self.diagnostics[:] = record['diagnostics']
+    self.have_errors = bool(self.diagnostics) or self.ast is None
+    lines = self.parser._line_positions = {}
+    indices = self.parser._index_positions = {}
+    for node, lineno, index in record['positions']:
+      lines[id(node)] = lineno
+      indices[id(node)] = index
+    if not self.quiet:
+      for diagnostic in self.diagnostics:
+        print_diagnostic(diagnostic)
+
+  def check(self):
+    '''
+    Resolución de nombres y chequeo semántico. Los errores quedan en
+    self.diagnostics (etapas 'resolve' y 'checker').
+    '''
+    if self.have_errors:
+      return
+    for message, node in Resolver.resolve(self.ast):
+      self.error(message, node, stage='resolve')
+    checker = Checker(self.quiet, self.line)
+    checker.diagnostics = self.diagnostics
+    try:
+      checker.visit(self.ast, Symtab())
+    except Exception as e:
+      # El checker no se recupera de algunos programas inválidos
+      checker.error(f'{type(e).__name__}: {e}', None)
+    if self.diagnostics:
+      self.have_errors = True
+
+  def optimize(self):
+    '''
+    Plegado de constantes y simplificaciones (optimize.ConstantFolder)
+    y eliminación de código muerto (optimize.DeadCodeEliminator) sobre
+    el AST. Devuelve (FoldStats, EliminationStats), o None si hay
+    errores. No necesita el checker: llamado antes de check(), el
+    checker recorre solo el código que queda. Un programa con nombres
+    sin resolver queda como está, para que sus errores sean los mismos.
+    '''
+    if self.have_errors:
+      return None
+    # Los tipos de las variables salen de sus enlaces
+    if Resolver.resolve(self.ast):
+      return None
+    folded = ConstantFolder.fold(self.ast)
+    eliminated = DeadCodeEliminator.eliminate(self.ast)
+    # Los slots cambian si se quitaron variables
+    Resolver.resolve(self.ast)
+    return folded, eliminated
+
+  def ircode(self):
+    if not self.have_errors:
+      try:
+        return IRGenerator.gencode(self.ast)
+      except PL0RuntimeError as e:
+        self.error(str(e), e.node)
+
+  def ssacode(self):
+    '''
+    IR SSA del programa (ssa.build) después de las pasadas de
+    ssa.PIPELINE, o None si hay errores.
+    '''
+    if not self.have_errors:
+      try:
+        module = build_ssa(self.ast)
+      except PL0RuntimeError as e:
+        self.error(str(e), e.node)
+        return None
+      PassManager().run(module)
+      return module
 
-  '''def run(self):
+  def assembly(self, debug=False):
+    '''
+    Assembly x86-64 del programa (asmcode.AsmGenerator), o None si hay
+    errores. No necesita el checker: el generador rechaza por su cuenta
+    los programas que mezclan int y float. Con debug cada instrucción
+    va precedida por su línea y su fuente en un comentario. En
+    self.bounds queda cuántos chequeos de rango se eliminaron.
+    '''
+    if self.have_errors:
+      return None
+
+    def line(node):
+      if id(node) in self.parser._index_positions:
+        return self.parser.line_position(node)
+      return 0
+
+    def comment(node):
+      return f'{line(node)}: ' + ' '.join(self.find_source(node).split())
+    try:
+      gen = AsmGenerator.generate(self.ast, line, comment if debug else None)
+      self.bounds = gen.bounds
+      return gen.assembly()
+    except PL0RuntimeError as e:
+      self.error(str(e), e.node)
+
+  def executable(self, out, assembly=None):
+    '''
+    Enlaza el assembly (por defecto el de assembly()) con el runtime
+    en el ejecutable out. Devuelve True si se pudo.
+    '''
+    if assembly is None:
+      assembly = self.assembly()
+      if assembly is None:
+        return False
+    try:
+      assemble(assembly, out)
+      return True
+    except PL0RuntimeError as e:
+      self.error(str(e), None)
+      return False
+
+  def run(self, vm=False, ssa=False):
+    '''
+    Ejecuta el programa con el intérprete, con la VM de bytecode (vm)
+    o con ssa.Machine sobre el IR SSA optimizado (ssa), que es el
+    único que aprovecha la recursión de cola y las funciones copiadas
+    en la llamada.
+    '''
     if not self.have_errors:
-      return self.interp.interpret(self.ast)'''
+      if not vm and not ssa:
+        return self.interp.interpret(self.ast)
+      module = self.ssacode() if ssa else self.ircode()
+      if module:
+        try:
+          return (Machine(module) if ssa else VM(module)).run()
+        except PL0RuntimeError as e:
+          self.error(str(e), e.node)
+        except RecursionError:
+          # Como en Interpreter.interpret
+          self.error('Stack overflow', None)
 
   def find_source(self, node):
     indices = self.parser.index_position(node)
@@ -37,9 +238,25 @@ class Context:
     else:
       return f'{type(node).__name__} (fuente no disponible)'
 
-  def error(self, message, position):
+  def line(self, node):
+    '''
+    Línea de node en el fuente, o 0 si el parser no la registró.
+    '''
+    if id(node) in getattr(self.parser, '_index_positions', {}):
+      return self.parser.line_position(node)
+    return 0
+
+  def error(self, message, position, stage='runtime'):
+    lineno = position if isinstance(position, int) else 0
     if isinstance(position, Node):
-      lineno = self.parser.line_position(position)
+      lineno = self.line(position)
+
+    self.diagnostics.append(Diagnostic(stage, message, lineno))
+    self.have_errors = True
+    if self.quiet:
+      return
+
+    if lineno and isinstance(position, Node):
       (start, end) = (part_start, part_end) = self.parser.index_position(position)
       while start >= 0 and self.source[start] != '\n':
         start -=1
@@ -53,8 +270,11 @@ class Context:
       print("^"*(part_end - part_start))
       print(f'{lineno}: {message}')
 
-    else:
-      print(f'{position}: {message}')
+    elif isinstance(position, Node):
+      print(f'{type(position).__name__}: {message}')
 
-    self.have_errors = True
+    elif position is None:
+      print(message)
 
+    else:
+      print(f'{position}: {message}')
@@ -0,0 +1,253 @@
+# daemon.py
+'''
+Compilador residente
+====================
+Cada 'python pl0.py archivo.pl0' paga el arranque del intérprete, los
+imports (sly, el modelo, el checker, ...) y la carga de las tablas del
+parser antes de hacer nada. Este módulo mantiene un proceso servidor con todo eso ya
+cargado, escuchando en un socket Unix, y un cliente mínimo que solo
+importa la biblioteca estándar.
+
+El servidor guarda un incremental.Document por archivo: la primera
+petición lo analiza completo y después un hilo vigila la fecha de
+modificación de cada archivo y lo actualiza apenas cambia, así que
+una petición sobre un archivo recién editado ya lo encuentra
+chequeado.
+
+Protocolo: una línea JSON por petición y una por respuesta.
+
+    {"cmd": "check" | "run" | "ir" | "status" | "stop",
+     "file": ruta, "stdin": texto, "vm": bool}
+
+    {"output": texto, "diagnostics": [[etapa, mensaje, línea], ...],
+     "exit": código, "time": segundos en el servidor}
+
+'run' ejecuta el programa con la entrada que manda el cliente (lo que
+tenga en stdin si no es una terminal) y devuelve lo que escribió. Los
+programas corren fuera del lock del servidor, de a uno por conexión,
+así que uno que no termina no bloquea a los demás; 'stop' termina el
+servidor igual.
+
+El cliente arranca el servidor si no está corriendo. El socket es
+.pl0cache/daemon.sock (o PL0_DAEMON_SOCKET).
+
+usage: python daemon.py {serve,stop,status,check,run,ir} [file] [--vm] [--socket PATH]
+'''
+import json
+import os
+import socket
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOCKET = os.environ.get('PL0_DAEMON_SOCKET') or os.path.join(HERE, '.pl0cache', 'daemon.sock')
+
+
+# ---------------------------------------------------------------------
+#  Servidor
+# ---------------------------------------------------------------------
+def serve(path=SOCKET, interval=0.2, scanner='sly'):
+    import io
+    import socketserver
+    import threading
+
+    from errors import Diagnostic
+    from incremental import Document
+    from interp import Interpreter, PL0RuntimeError
+    from ircode import IRGenerator, VM
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    documents = {}              # ruta -> [Document, (mtime, tamaño)]
+    lock = threading.Lock()
+    stats = {'requests': 0, 'started': time.time()}
+
+    def document(fname):
+        # Document de fname al día con el archivo (llamar con el lock)
+        st = os.stat(fname)
+        entry = documents.get(fname)
+        if entry is None:
+            entry = documents[fname] = [Document(scanner=scanner), None]
+        if entry[1] != (st.st_mtime_ns, st.st_size):
+            with open(fname, encoding='utf-8') as file:
+                entry[0].update(file.read())
+            entry[1] = (st.st_mtime_ns, st.st_size)
+        return entry[0]
+
+    def watch():
+        while True:
+            time.sleep(interval)
+            with lock:
+                for fname in list(documents):
+                    try:
+                        document(fname)
+                    except (OSError, UnicodeDecodeError):
+                        del documents[fname]
+
+    def execute(request):
+        cmd = request.get('cmd')
+        if cmd == 'status':
+            return {'output': f'pid {os.getpid()}, up {time.time() - stats["started"]:.0f}s, '
+                              f'{stats["requests"]} requests, {len(documents)} files watched\n'}
+        if cmd == 'stop':
+            threading.Thread(target=server.shutdown).start()
+            return {'output': 'stopped\n'}
+        if cmd not in ('check', 'run', 'ir'):
+            return {'output': f'unknown command {cmd!r}\n', 'exit': 2}
+
+        fname = os.path.abspath(request['file'])
+        run = None
+        with lock:
+            try:
+                doc = document(fname)
+            except (OSError, UnicodeDecodeError) as e:
+                return {'diagnostics': [['input', str(e), 0]], 'exit': 1}
+            # Con errores del parser o del checker no se ejecuta ni se
+            # genera código: se devuelven los errores
+            diagnostics = doc.diagnostics()
+            program = doc.program()
+            if cmd == 'check' or diagnostics or program is None:
+                return {'diagnostics': [[d.stage, d.message, d.lineno] for d in diagnostics],
+                        'exit': 1 if diagnostics else 0}
+            # El programa se compila con el lock (enlaza el AST) y se
+            # ejecuta sin él
+            stdin, out = io.StringIO(request.get('stdin', '')), io.StringIO()
+            try:
+                if cmd == 'ir':
+                    return {'output': IRGenerator.gencode(program).dump() + '\n'}
+                if request.get('vm'):
+                    run = VM(IRGenerator.gencode(program), stdin, out).run
+                else:
+                    run = Interpreter(stdin=stdin, stdout=out).compile(program)
+            except PL0RuntimeError as e:
+                error = Diagnostic('runtime', str(e), doc.line_position(e.node) or 0)
+        if run:
+            error = None
+            try:
+                run()
+            except PL0RuntimeError as e:
+                with lock:
+                    error = Diagnostic('runtime', str(e), doc.line_position(e.node) or 0)
+            except RecursionError:
+                error = Diagnostic('runtime', 'Stack overflow')
+        response = {'output': out.getvalue() if run else ''}
+        if error:
+            response['diagnostics'] = [[error.stage, error.message, error.lineno]]
+            response['exit'] = 1
+        return response
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            t = time.perf_counter()
+            try:
+                request = json.loads(self.rfile.readline())
+                response = execute(request)
+            except Exception as e:
+                response = {'output': f'{type(e).__name__}: {e}\n', 'exit': 2}
+            stats['requests'] += 1
+            response.setdefault('output', '')
+            response.setdefault('diagnostics', [])
+            response.setdefault('exit', 0)
+            response['time'] = time.perf_counter() - t
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    # Un socket que quedó de un servidor anterior
+    if os.path.exists(path):
+        try:
+            request({'cmd': 'status'}, path)
+            print(f'already running on {path}', file=sys.stderr)
+            return 1
+        except OSError:
+            os.unlink(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Calentar el checker y el intérprete con un programa mínimo
+    warm = Document('fun main()\nbegin\n  write(1)\nend\n', scanner)
+    Interpreter(stdout=io.StringIO()).compile(warm.program())()
+
+    server = Server(path, Handler)
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return 0
+
+
+# ---------------------------------------------------------------------
+#  Cliente
+# ---------------------------------------------------------------------
+def request(message, path=SOCKET):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with s.makefile('rb') as f:
+            return json.loads(f.readline())
+
+
+def start(path=SOCKET, timeout=10.0):
+    '''
+    Arranca el servidor en segundo plano y espera a que atienda.
+    '''
+    import subprocess
+    subprocess.Popen([sys.executable, os.path.join(HERE, 'daemon.py'), 'serve', '--socket', path],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return request({'cmd': 'status'}, path)
+        except OSError:
+            time.sleep(0.02)
+    raise OSError(f'pl0 daemon did not start on {path}')
+
+
+def call(message, path=SOCKET):
+    '''
+    Manda la petición, arrancando el servidor si hace falta.
+    '''
+    try:
+        return request(message, path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if message['cmd'] in ('stop', 'status'):
+            return {'output': 'not running\n', 'diagnostics': [], 'exit': 1}
+        start(path)
+        return request(message, path)
+
+
+def main(argv):
+    import argparse
+    cli = argparse.ArgumentParser(prog='daemon.py', description='Resident PL0 compiler and its client')
+    cli.add_argument('cmd', choices=['serve', 'stop', 'status', 'check', 'run', 'ir'])
+    cli.add_argument('file', nargs='?')
+    cli.add_argument('--vm', action='store_true', help='run with the bytecode VM')
+    cli.add_argument('--socket', default=SOCKET)
+    cli.add_argument('--scanner', choices=['fast', 'sly'], default='sly', help='scanner used by serve')
+    args = cli.parse_intermixed_args(argv[1:])
+
+    if args.cmd == 'serve':
+        sys.exit(serve(args.socket, scanner=args.scanner))
+    message = {'cmd': args.cmd}
+    if args.cmd in ('check', 'run', 'ir'):
+        if not args.file:
+            cli.error(f'{args.cmd} needs a file')
+        message['file'] = os.path.abspath(args.file)
+        message['vm'] = args.vm
+        if args.cmd == 'run' and not sys.stdin.isatty():
+            message['stdin'] = sys.stdin.read()
+
+    response = call(message, args.socket)
+    sys.stdout.write(response['output'])
+    for stage, msg, lineno in response['diagnostics']:
+        print(f'{args.file}:{lineno}: [{stage}] {msg}')
+    sys.exit(response['exit'])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,405 @@
+# dataflow.py
+'''
+Análisis de flujo de datos
+==========================
+Análisis sobre los grafos de cfg.py, con conjuntos representados como
+enteros de Python usados como vectores de bits: las uniones,
+intersecciones y diferencias son una operación sobre el entero entero
+en lugar de recorrer un set.
+
+solve() resuelve cualquier problema de la forma
+
+    salida = gen | (entrada & ~kill)
+
+hacia adelante o hacia atrás, con unión (may) o intersección (must)
+como operador de confluencia, con una lista de trabajo ordenada por
+postorden inverso (postorden para los problemas hacia atrás) que
+solo vuelve a visitar los bloques cuya entrada cambió.
+
+Sobre él están:
+
+* liveness(): variables vivas al principio y al final de cada bloque.
+* reaching_definitions(): qué asignaciones pueden llegar a cada
+  bloque (los parámetros cuentan como definiciones en la entrada).
+* definite_assignment(): variables asignadas en todo camino desde la
+  entrada.
+
+y dos usos de ellos que el checker no puede hacer, en warnings():
+variables que pueden leerse antes de asignarse (valen 0, pero casi
+siempre es un error) y funciones con return que pueden terminar sin
+devolver nada.
+
+Las variables son los parámetros y las variables locales de la
+función, y el bit de cada una es su slot (resolve.Resolver). Los
+arreglos se consideran asignados desde la entrada y asignar un
+elemento cuenta como un uso del arreglo, no como una definición. Las
+variables que nombra una función anidada se consideran usadas en
+cada llamada a una función anidada y nunca sin asignar.
+
+usage: python dataflow.py [-v] file.pl0
+'''
+import sys
+from dataclasses import dataclass
+from heapq import heappop, heappush
+from typing import List
+
+import cfg
+from model import *
+
+
+@dataclass(slots=True)
+class Solution:
+    before: List[int]           # valor al principio de cada bloque
+    after: List[int]            # valor al final de cada bloque
+    visits: int = 0             # bloques sacados de la lista de trabajo
+
+
+def bits(mask):
+    '''
+    Posiciones de los bits en 1 de mask, de menor a mayor.
+    '''
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def solve(graph, gen, kill, forward=True, must=False, boundary=0, universe=0):
+    '''
+    Punto fijo de salida = gen | (entrada & ~kill) sobre graph. La
+    entrada del bloque de entrada (o la salida del de salida, hacia
+    atrás) es boundary; con must=True la confluencia es la
+    intersección y los demás bloques empiezan en universe.
+    '''
+    n = graph.nblocks
+    initial = universe if must else 0
+    before = [initial] * n
+    after = [initial] * n
+    if forward:
+        meet_index, meet_edges = graph.pred_index, graph.pred
+        next_index, next_edges = graph.succ_index, graph.succ
+        first, inputs, outputs = graph.entry, before, after
+        order = graph.postorder()[::-1]
+    else:
+        meet_index, meet_edges = graph.succ_index, graph.succ
+        next_index, next_edges = graph.pred_index, graph.pred
+        first, inputs, outputs = graph.exit, after, before
+        order = graph.postorder()
+
+    # La lista de trabajo es un heap ordenado por la posición de cada
+    # bloque en el orden de recorrido: un bloque que vuelve a entrar (la
+    # cabecera de un while) se procesa antes que los que siguen, en
+    # lugar de repetir todo el resto de la función después de él
+    rank = list(range(n, 2 * n))     # bloques inalcanzables, al final
+    for i, b in enumerate(order):
+        rank[b] = i
+    work = sorted(rank[b] for b in order)
+    block = [0] * (2 * n)
+    for b in range(n):
+        block[rank[b]] = b
+    queued = bytearray(n)
+    for b in order:
+        queued[b] = 1
+    visits = 0
+    while work:
+        b = block[heappop(work)]
+        queued[b] = 0
+        visits += 1
+        lo, hi = meet_index[b], meet_index[b + 1]
+        if b == first:
+            value = boundary
+        elif lo == hi:
+            value = initial
+        elif must:
+            value = universe
+            for i in range(lo, hi):
+                value &= outputs[meet_edges[i]]
+        else:
+            value = 0
+            for i in range(lo, hi):
+                value |= outputs[meet_edges[i]]
+        inputs[b] = value
+        value = gen[b] | (value & ~kill[b])
+        if value != outputs[b]:
+            outputs[b] = value
+            for i in range(next_index[b], next_index[b + 1]):
+                s = next_edges[i]
+                if not queued[s]:
+                    queued[s] = 1
+                    heappush(work, rank[s])
+    return Solution(before, after, visits)
+
+
+# ---------------------------------------------------------------------
+#  Usos y definiciones de cada nodo
+# ---------------------------------------------------------------------
+class Facts:
+    '''
+    Variables de la función de graph y, por cada nodo de graph.nodes,
+    las que lee (uses) y las que asigna (defs), como máscaras de bits.
+    '''
+    def __init__(self, graph):
+        func = graph.func
+        self.graph = graph
+        self.decls = [None] * (func.nslots or 0)
+        self.params = 0
+        self.arrays = 0
+        for parm in func.parmlist.parmlist if func.parmlist else []:
+            self.decls[parm.slot] = parm
+            self.params |= 1 << parm.slot
+        for var in func.varlist.varlist if func.varlist else []:
+            if isinstance(var, VarDefinition):
+                self.decls[var.slot] = var
+                if isinstance(var.datatype, ArrayType):
+                    self.arrays |= 1 << var.slot
+        self.universe = (1 << len(self.decls)) - 1
+        self.escaped = self.nested_uses(func)
+
+        self.uses = []
+        self.defs = []
+        for node in graph.nodes:
+            uses, defs = self.node(node)
+            self.uses.append(uses)
+            self.defs.append(defs)
+
+    def local(self, loc):
+        # Bit de la variable si es de esta función
+        if loc.binding and loc.binding.depth == 0 and loc.binding.slot is not None:
+            return 1 << loc.binding.slot
+        return 0
+
+    def reads(self, expr):
+        mask = 0
+        stack = [expr]
+        while stack:
+            n = stack.pop()
+            if isinstance(n, list):
+                stack.extend(n)
+            elif isinstance(n, Node) and not isinstance(n, SimpleType):
+                if isinstance(n, (SimpleLocation, ArrayLocation)):
+                    mask |= self.local(n)
+                elif isinstance(n, FuncCall) and n.binding and n.binding.decl.parent is self.graph.func:
+                    mask |= self.escaped
+                stack.extend(children(n))
+        return mask
+
+    def node(self, n):
+        if isinstance(n, (Assign, Read)):
+            loc = n.location
+            uses = self.reads(n.expr) if isinstance(n, Assign) else 0
+            if isinstance(loc, ArrayLocation):
+                return uses | self.reads(loc), 0
+            return uses, self.local(loc)
+        return self.reads(n), 0
+
+    def nested_uses(self, func):
+        # Variables de func que nombran sus funciones anidadas
+        mask = 0
+        mine = {id(decl) for decl in self.decls if decl is not None}
+        for nested in cfg.functions(func)[1:]:
+            stack = [nested.stmtlist]
+            while stack:
+                n = stack.pop()
+                if isinstance(n, list):
+                    stack.extend(n)
+                elif isinstance(n, Node) and not isinstance(n, SimpleType):
+                    if (isinstance(n, (SimpleLocation, ArrayLocation)) and n.binding
+                            and id(n.binding.decl) in mine):
+                        mask |= 1 << n.binding.decl.slot
+                    stack.extend(children(n))
+        return mask
+
+    def blocks(self):
+        # (primer, último + 1) índice de nodo de cada bloque
+        start = self.graph.start
+        return [(start[b], start[b + 1]) for b in range(self.graph.nblocks)]
+
+
+# ---------------------------------------------------------------------
+#  Análisis
+# ---------------------------------------------------------------------
+def liveness(facts):
+    '''
+    Variables que pueden leerse antes de volver a asignarse: before[b]
+    son las vivas al principio del bloque b y after[b] al final.
+    '''
+    gen, kill = [], []
+    for lo, hi in facts.blocks():
+        used = defined = 0
+        for i in range(lo, hi):
+            used |= facts.uses[i] & ~defined
+            defined |= facts.defs[i]
+        gen.append(used)
+        kill.append(defined)
+    return solve(facts.graph, gen, kill, forward=False)
+
+
+def definite_assignment(facts):
+    '''
+    Variables asignadas en todos los caminos desde la entrada hasta el
+    principio (before) y el final (after) de cada bloque.
+    '''
+    gen = []
+    for lo, hi in facts.blocks():
+        defined = 0
+        for i in range(lo, hi):
+            defined |= facts.defs[i]
+        gen.append(defined)
+    kill = [0] * len(gen)
+    assigned = facts.params | facts.arrays | facts.escaped
+    return solve(facts.graph, gen, kill, must=True, boundary=assigned, universe=facts.universe)
+
+
+def reaching_definitions(facts):
+    '''
+    Devuelve (definiciones, Solution). definiciones es una lista de
+    (nodo, slot), donde nodo es el Assign o Read, o el Parameter para
+    el valor con que empieza; el bit i de los conjuntos de la solución
+    es definiciones[i].
+    '''
+    definitions = []
+    by_var = [0] * len(facts.decls)
+    entry = 0
+    for slot in bits(facts.params):
+        by_var[slot] |= 1 << len(definitions)
+        entry |= 1 << len(definitions)
+        definitions.append((facts.decls[slot], slot))
+    node_def = []
+    for i, node in enumerate(facts.graph.nodes):
+        if facts.defs[i]:
+            slot = facts.defs[i].bit_length() - 1
+            by_var[slot] |= 1 << len(definitions)
+            node_def.append(len(definitions))
+            definitions.append((node, slot))
+        else:
+            node_def.append(-1)
+
+    gen, kill = [], []
+    for lo, hi in facts.blocks():
+        generated = killed = 0
+        for i in range(lo, hi):
+            d = node_def[i]
+            if d >= 0:
+                same = by_var[definitions[d][1]]
+                generated = (generated & ~same) | (1 << d)
+                killed |= same
+        gen.append(generated)
+        kill.append(killed)
+    return definitions, solve(facts.graph, gen, kill, boundary=entry)
+
+
+# ---------------------------------------------------------------------
+#  Advertencias
+# ---------------------------------------------------------------------
+def unassigned_uses(facts, assigned):
+    '''
+    (nodo, declaración) de cada lectura de una variable que no está
+    asignada en todos los caminos que llegan a ella.
+    '''
+    found = []
+    reachable = set(facts.graph.postorder())
+    for b, (lo, hi) in enumerate(facts.blocks()):
+        if b not in reachable:
+            continue
+        current = assigned.before[b]
+        for i in range(lo, hi):
+            if facts.uses[i] & ~current:
+                missing = facts.uses[i] & ~current
+                for loc in locations(facts.graph.nodes[i]):
+                    bit = facts.local(loc)
+                    if bit & missing:
+                        found.append((loc, facts.decls[bit.bit_length() - 1]))
+                        missing &= ~bit
+            current |= facts.defs[i]
+    return found
+
+
+def locations(node):
+    # Lecturas de variables de un nodo, en orden de aparición
+    if isinstance(node, (Assign, Read)):
+        targets = [node.expr] if isinstance(node, Assign) else []
+        if isinstance(node.location, ArrayLocation):
+            targets.insert(0, node.location.index)
+    else:
+        targets = [node]
+    found = []
+    stack = list(reversed(targets))
+    while stack:
+        n = stack.pop()
+        if isinstance(n, list):
+            stack.extend(reversed(n))
+        elif isinstance(n, Node) and not isinstance(n, SimpleType):
+            if isinstance(n, SimpleLocation):
+                found.append(n)
+            stack.extend(reversed(children(n)))
+    return found
+
+
+def falls_off(graph):
+    '''
+    True si la ejecución puede llegar al final del cuerpo sin pasar
+    por un Return.
+    '''
+    reachable = set(graph.postorder())
+    for p in graph.predecessors(graph.exit):
+        block = graph.block(p)
+        if p in reachable and not (block and isinstance(block[-1], Return)):
+            return True
+    return False
+
+
+def warnings(program):
+    '''
+    Lista de (mensaje, nodo) para todo el programa, que tiene que
+    estar enlazado por el Resolver sin errores.
+    '''
+    found = []
+    for graph in cfg.build(program):
+        facts = Facts(graph)
+        for loc, decl in unassigned_uses(facts, definite_assignment(facts)):
+            found.append((f'{decl.name} may be used before it is assigned', loc))
+        returns = any(isinstance(node, Return) for node in graph.nodes)
+        if returns and falls_off(graph):
+            found.append((f'{graph.func.name} may end without returning a value', graph.func))
+    return found
+
+
+def main(argv):
+    import argparse
+    from context import Context
+    from resolve import Resolver
+
+    cli = argparse.ArgumentParser(prog='dataflow.py', description='Dataflow warnings for a PL0 program')
+    cli.add_argument('file')
+    cli.add_argument('-v', '--verbose', action='store_true', help='print live variables per block')
+    args = cli.parse_args(argv[1:])
+
+    context = Context()
+    with open(args.file, encoding='utf-8') as f:
+        context.parse(f.read())
+    if context.have_errors:
+        sys.exit(1)
+    for message, node in Resolver.resolve(context.ast):
+        context.error(message, node, stage='resolve')
+    if context.have_errors:
+        sys.exit(1)
+
+    if args.verbose:
+        for graph in cfg.build(context.ast):
+            facts = Facts(graph)
+            live = liveness(facts)
+
+            def names(mask):
+                return ' '.join(facts.decls[slot].name for slot in bits(mask)) or '-'
+            print(f'fun {graph.func.name}: {graph.nblocks} blocks, {live.visits} visits')
+            for b in range(graph.nblocks):
+                print(f'  B{b}  live in {names(live.before[b])}  live out {names(live.after[b])}')
+
+    found = warnings(context.ast)
+    for message, node in found:
+        print(f'{args.file}:{context.parser.line_position(node) or 0}: [dataflow] {message}')
+    sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
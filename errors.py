@@ -0,0 +1,42 @@
+# errors.py
+'''
+Diagnósticos del compilador.
+
+Cada etapa (lexer, parser, checker, intérprete) registra sus errores
+como objetos Diagnostic en una lista en lugar de escribirlos
+directamente en la salida estándar. Quien usa la etapa decide si los
+imprime (modo normal) o solo los consulta (modo silencioso).
+'''
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class Diagnostic:
+    stage: str          # 'lexer', 'parser', ...
+    message: str
+    lineno: int = 0
+    code: int = 0       # tipo de error (ver README para el lexer)
+
+    def __str__(self):
+        return f'{self.lineno}: {self.message}'
+
+
+class Reporter:
+    '''
+    Mezcla para las etapas que reportan diagnósticos. Si quiet es
+    False los diagnósticos además se imprimen en rojo.
+    '''
+    quiet = False
+    stage = ''
+
+    def report(self, message, lineno=0, code=0):
+        if not hasattr(self, 'diagnostics'):
+            self.diagnostics = []
+        diagnostic = Diagnostic(self.stage, message, lineno, code)
+        self.diagnostics.append(diagnostic)
+        if not self.quiet:
+            print_diagnostic(diagnostic)
+
+
+def print_diagnostic(diagnostic):
+    print(f'\033[91mERROR: {diagnostic.message}\033[0m')
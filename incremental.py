@@ -0,0 +1,410 @@
+# incremental.py
+'''
+Chequeo incremental
+===================
+Para un editor o para el modo --watch: mantiene un programa analizado
+y, cuando cambia el fuente, vuelve a analizar solo las funciones
+globales que tocó el cambio.
+
+El fuente se divide en unidades, una por cada FunDefinition de
+funclist, que van del 'fun' al 'end'. Ante una edición:
+
+* Se vuelve a pasar el lexer y el parser solo por el texto de las
+  unidades que toca la edición (o por el hueco entre dos unidades si
+  la edición cae ahí). El lexer arranca en la posición y la línea de
+  la región dentro del fuente completo, así que las posiciones que
+  registra el parser ya son las definitivas.
+* Las unidades anteriores no cambian y las posteriores solo se
+  desplazan: sus posiciones se guardan relativas al comienzo de la
+  unidad, así que moverlas no recorre sus nodos.
+* Se enlazan de nuevo (resolve.Resolver) y se chequean las unidades
+  nuevas y las que usan alguno de los nombres globales que cambiaron
+  (las que llaman a una función editada, agregada o borrada). Si el
+  tipo de retorno de una función chequeada cambia, también se
+  chequean las funciones posteriores que la llaman.
+
+Las demás unidades conservan su AST, sus enlaces y los errores del
+último chequeo, de modo que el tiempo de cada actualización depende
+del tamaño de la edición y no del archivo. La excepción son los
+errores de sintaxis: si la región no compila se analiza el archivo
+completo (un comentario sin cerrar, por ejemplo, cambia todo lo que
+sigue), y mientras haya errores cada edición lo vuelve a analizar.
+
+Los diagnósticos son los mismos que da Context.analyze(check=True)
+sobre el fuente completo, en el mismo orden. La única diferencia es
+que el checker corre por separado en cada unidad, así que si aborta
+en una función (o por un nombre global repetido) las siguientes se
+chequean igual.
+
+usage: python incremental.py [--scanner {sly,fast}] [--interval SECONDS] file
+'''
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from heapq import heapify, heappop, heappush
+from itertools import chain
+
+from cache import ast_positions
+from checker import Checker, Symtab
+from errors import Diagnostic
+from model import FunDefinition, Program, SimpleType
+from plex import scanners
+from pparser import Parser
+from resolve import Resolver
+
+
+@dataclass(slots=True, eq=False)
+class Unit:
+    start: int                  # posición del 'fun' en el fuente
+    end: int                    # posición siguiente al 'end'
+    line: int                   # línea de start
+    endline: int                # línea de end
+    func: FunDefinition = None  # None si el texto no compila
+    funcs: list = field(default_factory=list)       # func y sus funciones anidadas
+    nodes: list = field(default_factory=list)       # ids de los nodos con posición
+    refs: set = field(default_factory=set)          # nombres globales que usa
+    errors: list = field(default_factory=list)      # (mensaje, nodo) del Resolver
+    checks: list = field(default_factory=list)      # (mensaje, nodo) del Checker
+    # Errores léxicos y sintácticos: (etapa, mensaje, línea relativa o None, código)
+    syntax: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Update:
+    reparsed: int = 0           # unidades nuevas
+    chars: int = 0              # caracteres que pasaron por el lexer
+    rechecked: int = 0          # unidades enlazadas y chequeadas
+    time: float = 0.0           # segundos
+
+
+class UnitResolver(Resolver):
+    '''
+    Resolver que enlaza una función global por vez, con el alcance
+    global ya abierto, y anota qué nombres resolvió en ese alcance
+    (o no pudo resolver).
+    '''
+    def __init__(self):
+        super().__init__()
+        self.used = set()
+        self.open_scope()
+
+    def bind(self, n, kind):
+        stack = self.names.get(n.name)
+        if not stack or stack[-1][0] == 0:
+            self.used.add(n.name)
+        return super().bind(n, kind)
+
+
+def common_affixes(old, new, block=4096):
+    '''
+    Largo del prefijo y del sufijo comunes de old y new, sin que se
+    solapen. Compara por bloques para no recorrer caracter a caracter.
+    '''
+    n = min(len(old), len(new))
+    a = 0
+    while a + block <= n and old[a:a + block] == new[a:a + block]:
+        a += block
+    while a < n and old[a] == new[a]:
+        a += 1
+    b = 0
+    m = n - a
+    while b + block <= m and old[len(old) - b - block:len(old) - b] == new[len(new) - b - block:len(new) - b]:
+        b += block
+    while b < m and old[len(old) - b - 1] == new[len(new) - b - 1]:
+        b += 1
+    return a, b
+
+
+class Document:
+    '''
+    Programa PL0 que se actualiza con update(fuente) o con
+    edit(inicio, fin, texto). diagnostics() da los errores del estado
+    actual y program() el AST (si no hay errores de sintaxis).
+    '''
+    def __init__(self, source='', scanner='sly'):
+        self.lexer = scanners[scanner](True)
+        self.parser = Parser(True)
+        self.lexer.diagnostics = self.parser.diagnostics = []
+        self.source = ''
+        self.units = []
+        self.where = {}         # id(nodo) -> (unidad, línea, inicio, fin) relativos
+        self.byname = {}        # nombre -> unidades que lo definen, en orden
+        self.users = {}         # nombre -> unidades que lo usan
+        self.dirty = set()      # unidades por enlazar y chequear
+        self.resolver = UnitResolver()
+        self.edit(0, 0, source)
+
+    # Posiciones -------------------------------------------------------
+    def line_position(self, node):
+        w = self.where.get(id(node))
+        return w[0].line + w[1] if w else None
+
+    def index_position(self, node):
+        w = self.where.get(id(node))
+        return (w[0].start + w[2], w[0].start + w[3]) if w else None
+
+    # Ediciones --------------------------------------------------------
+    def update(self, source):
+        a, b = common_affixes(self.source, source)
+        return self.edit(a, len(self.source) - b, source[a:len(source) - b])
+
+    def edit(self, start, end, text):
+        '''
+        Reemplaza self.source[start:end] por text.
+        '''
+        t = time.perf_counter()
+        old = self.source
+        source = self.source = old[:start] + text + old[end:]
+        delta = len(text) - (end - start)
+        dlines = text.count('\n') - old.count('\n', start, end)
+
+        # Unidades que toca la edición: los intervalos son cerrados
+        # para que escribir pegado a un 'fun' o a un 'end' las incluya
+        units = self.units
+        i = bisect_left(units, start, key=lambda u: u.end)
+        j = bisect_right(units, end, key=lambda u: u.start)
+        # Las unidades con errores de sintaxis se vuelven a analizar
+        # junto con la edición, por si esta las completa
+        broken = [k for k, u in enumerate(units) if u.func is None]
+        if broken:
+            i, j = min(i, broken[0]), max(j, broken[-1] + 1)
+
+        if i < j and units[i].start <= start:
+            lo, line = units[i].start, units[i].line
+        elif i:
+            lo, line = units[i - 1].end, units[i - 1].endline
+        else:
+            lo, line = 0, 1
+        if i < j and end <= units[j - 1].end:
+            hi = units[j - 1].end
+        elif j < len(units):
+            hi = units[j].start
+        else:
+            hi = len(old)
+
+        new = self.parse(source, lo, hi + delta, line, i == 0 and j == len(units))
+        if any(u.func is None for u in new) and (i, j) != (0, len(units)):
+            # Un comentario sin cerrar o un error de sintaxis pueden
+            # depender del texto que sigue a la región: los errores
+            # salen de analizar el archivo completo
+            i, j, lo, hi, line = 0, len(units), 0, len(old), 1
+            new = self.parse(source, lo, hi + delta, line, True)
+
+        changed = set()
+        for u in units[i:j]:
+            for key in u.nodes:
+                del self.where[key]
+            for name in u.refs:
+                self.users[name].discard(u)
+            if u.func:
+                changed.add(u.func.name)
+            self.dirty.discard(u)
+        for u in units[j:]:
+            u.start += delta
+            u.end += delta
+            u.line += dlines
+            u.endline += dlines
+        units[i:j] = new
+
+        for u in new:
+            if u.func:
+                changed.add(u.func.name)
+                self.dirty.add(u)
+        for name in changed:
+            self.declare(name)
+            self.dirty.update(self.users.get(name, ()))
+
+        result = Update(reparsed=len(new), chars=hi + delta - lo)
+        if not any(u.func is None for u in units):
+            result.rechecked = self.check()
+        result.time = time.perf_counter() - t
+        return result
+
+    def parse(self, source, lo, hi, line, whole):
+        '''
+        Unidades del texto source[lo:hi], que empieza en la línea dada.
+        whole indica que no quedan unidades fuera de la región.
+        '''
+        parser = self.parser
+        diagnostics = parser.diagnostics
+        diagnostics.clear()
+        parser.errors = 0
+        parser._line_positions = {}
+        parser._index_positions = {}
+
+        tokens = self.lexer.tokenize(source[:hi], line, lo)
+        first = next(tokens, None)
+        if first is None and not diagnostics and not whole:
+            # Solo espacios y comentarios
+            return []
+        ast = parser.parse(chain((first,), tokens) if first else iter(()))
+
+        if diagnostics or ast is None:
+            u = Unit(lo, hi, line, line + source.count('\n', lo, hi))
+            u.syntax = [(d.stage, d.message, d.lineno - line if d.lineno else None, d.code)
+                        for d in diagnostics]
+            return [u]
+
+        units = []
+        for func in ast.funclist:
+            start, end = parser.index_position(func)
+            fline = parser.line_position(func)
+            u = Unit(start, end, fline, fline + source.count('\n', start, end), func)
+            for node, lineno, (s, e) in ast_positions(func, parser):
+                if isinstance(node, SimpleType):
+                    # Tipos canónicos, compartidos por todo el programa
+                    continue
+                self.where[id(node)] = (u, lineno - fline, s - start, e - start)
+                u.nodes.append(id(node))
+                if isinstance(node, FunDefinition):
+                    u.funcs.append(node)
+            units.append(u)
+        return units
+
+    # Enlace y chequeo -------------------------------------------------
+    def declare(self, name):
+        # Alcance global del Resolver: la primera función con ese nombre
+        defs = [u for u in self.units if u.func and u.func.name == name]
+        resolver = self.resolver
+        if defs:
+            self.byname[name] = defs
+            resolver.names[name] = [(0, defs[0].func)]
+            resolver.scopes[0].add(name)
+        else:
+            self.byname.pop(name, None)
+            resolver.names.pop(name, None)
+            resolver.scopes[0].discard(name)
+
+    def resolve(self, u):
+        resolver = self.resolver
+        resolver.errors = []
+        resolver.used = set()
+        resolver.func = None
+        resolver.visit(u.func)
+        for name in u.refs:
+            self.users[name].discard(u)
+        u.refs = resolver.used
+        for name in u.refs:
+            self.users.setdefault(name, set()).add(u)
+        u.errors = resolver.errors
+
+    def check(self):
+        '''
+        Enlaza y chequea las unidades pendientes en el orden del fuente.
+        Devuelve cuántas chequeó.
+        '''
+        order = {id(u): k for k, u in enumerate(self.units)}
+        for u in self.dirty:
+            self.resolve(u)
+        heap = [(order[id(u)], id(u), u) for u in self.dirty]
+        heapify(heap)
+        checked = set()
+        while heap:
+            k, key, u = heappop(heap)
+            if key in checked:
+                continue
+            checked.add(key)
+            dtype = u.func.dtype
+            self.check_unit(u, k, order)
+            if u.func.dtype is not dtype and self.byname[u.func.name][0] is u:
+                # Las funciones posteriores que la llaman ven otro tipo
+                for v in self.users.get(u.func.name, ()):
+                    if order[id(v)] > k and id(v) not in checked:
+                        heappush(heap, (order[id(v)], id(v), v))
+        self.dirty.clear()
+        return len(checked)
+
+    def check_unit(self, u, k, order):
+        # En un chequeo completo las funciones globales que aparecen
+        # después de u todavía no tienen tipo cuando se chequea u
+        later = []
+        for name in u.refs:
+            defs = self.byname.get(name)
+            if defs and order[id(defs[0])] > k:
+                later.append((defs[0].func, defs[0].func.dtype))
+                defs[0].func.dtype = None
+        for func in u.funcs:
+            func.dtype = None
+
+        checker = Checker(True)
+        try:
+            checker.visit(u.func, Symtab())
+        except Exception as e:
+            checker.error(f'{type(e).__name__}: {e}', None)
+        u.checks = checker.errors
+
+        for func, dtype in later:
+            func.dtype = dtype
+
+    # Resultado --------------------------------------------------------
+    def program(self):
+        if any(u.func is None for u in self.units):
+            return None
+        return Program([u.func for u in self.units])
+
+    def diagnostics(self):
+        broken = [u for u in self.units if u.func is None]
+        if broken:
+            return [Diagnostic(stage, message, u.line + dline if dline is not None else 0, code)
+                    for u in broken for stage, message, dline, code in u.syntax]
+
+        diagnostics = []
+        for u in self.units:
+            if self.byname[u.func.name][0] is not u:
+                diagnostics.append(Diagnostic('resolve', f'{u.func.name} is already defined', u.line))
+        for u in self.units:
+            for message, node in u.errors:
+                diagnostics.append(Diagnostic('resolve', message, self.line_position(node) or 0))
+        for u in self.units:
+            for message, node in u.checks:
+                diagnostics.append(Diagnostic('checker', message, self.line_position(node) or 0))
+        if 'main' not in self.byname:
+            diagnostics.append(Diagnostic('checker', 'No tiene main'))
+        return diagnostics
+
+
+def watch(fname, scanner='sly', interval=0.2, out=sys.stdout):
+    '''
+    Vuelve a chequear fname cada vez que cambia, hasta Ctrl-C.
+    '''
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    document = Document(scanner=scanner)
+    mtime = None
+    try:
+        while True:
+            try:
+                current = os.stat(fname).st_mtime_ns
+            except OSError:
+                current = None
+            if current is not None and current != mtime:
+                mtime = current
+                with open(fname, encoding='utf-8') as file:
+                    source = file.read()
+                r = document.update(source)
+                diagnostics = document.diagnostics()
+                status = f'{len(diagnostics)} errors' if diagnostics else 'ok'
+                print(f'{fname}: {len(document.units)} functions, reparsed {r.reparsed} '
+                      f'({r.chars} chars), rechecked {r.rechecked}, '
+                      f'{r.time * 1000:.2f}ms  {status}', file=out)
+                for d in diagnostics:
+                    print(f'    {fname}:{d.lineno}: [{d.stage}] {d.message}', file=out)
+                out.flush()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv):
+    import argparse
+    cli = argparse.ArgumentParser(prog='incremental.py', description='Re-check a PL0 file incrementally as it changes')
+    cli.add_argument('file')
+    cli.add_argument('--scanner', choices=['fast', 'sly'], default='sly')
+    cli.add_argument('--interval', type=float, default=0.2, help='seconds between checks')
+    args = cli.parse_args(argv[1:])
+    watch(args.file, args.scanner, args.interval)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
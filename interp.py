@@ -0,0 +1,600 @@
+# interp.py
+'''
+Intérprete de PL0
+=================
+En lugar de recorrer el AST cada vez que se ejecuta una instrucción, el
+intérprete lo "compila" una sola vez a funciones de Python anidadas
+(closures). Cada closure recibe el registro de activación (frame) de
+la función en ejecución y devuelve el valor de la expresión, o el
+estado de la instrucción.
+
+Todo lo que depende de nombres se resuelve antes de ejecutar, con los
+enlaces que deja resolve.Resolver en el AST:
+
+* Las variables se convierten en un par (saltos, slot): cuántos
+  enlaces estáticos hay que seguir y la posición dentro del frame.
+* Las llamadas apuntan directamente a la función destino (Function).
+
+Así, durante la ejecución no hay despacho con multimethod ni búsquedas
+en diccionarios.
+
+Un frame es una lista de Python:
+
+    frame[0]   enlace estático (frame de la función que la contiene)
+    frame[1]   valor de retorno
+    frame[2:]  parámetros y luego variables locales
+
+Las instrucciones devuelven None para continuar, BREAK para salir del
+while más cercano o RETURN para salir de la función.
+
+Los arrays son buffers contiguos del módulo array: 'q' (enteros de 64
+bits) para int[n] y 'd' para float[n], del tamaño que da dim al
+entrar a la función. Con bounds_check (por omisión) un índice negativo
+es un error; sin él se indexa directo, y un índice negativo cuenta
+desde el final como en Python (el buffer igual rechaza los que se
+pasan del final). Los accesos que bounds.py demuestra dentro del rango
+no se controlan.
+
+Con memo > 0 las llamadas a funciones puras (ver purity.py) pasan por
+un cache LRU de a lo sumo memo resultados por función; los caches
+quedan en self.caches para ver los aciertos y fallos después de
+ejecutar.
+'''
+import sys
+from array import array
+
+from model import *
+from resolve import Resolver
+
+LINK = 0
+RETVAL = 1
+FIRST_SLOT = 2
+
+BREAK = 'break'
+RETURN = 'return'
+
+
+class PL0RuntimeError(Exception):
+    '''
+    Error durante la compilación a closures o la ejecución.
+    Guarda el nodo que lo originó para reportar la posición.
+    '''
+    def __init__(self, message, node=None):
+        super().__init__(message)
+        self.node = node
+
+
+# ---------------------------------------------------------------------
+#  Funciones compiladas
+# ---------------------------------------------------------------------
+class Function:
+    '''
+    Función compilada. body, init y arrays se completan al compilar su
+    definición; las llamadas la referencian antes para permitir
+    llamadas recursivas y llamadas a funciones declaradas más adelante.
+    '''
+    def __init__(self, name, node, level):
+        self.name = name
+        self.node = node
+        self.level = level      # nivel del alcance donde se declara
+        self.nparms = len(node.parmlist.parmlist) if node.parmlist else 0
+        self.init = []          # valores iniciales de las variables locales
+        self.arrays = []        # (slot, dim, cero) de los arrays locales
+        self.body = None
+        self.cache = None       # purity.MemoCache si se memoiza
+
+
+def zero_value(datatype):
+    return 0.0 if datatype.name == 'float' else 0
+
+
+def new_array(zero, length):
+    # Buffer en cero: repetir un elemento no arma una lista intermedia
+    return array('d' if type(zero) is float else 'q', (zero,)) * length
+
+
+def decode_string(literal):
+    # Quita las comillas y traduce los caracteres de escape
+    s = literal[1:-1]
+    return s.replace('\\\\', '\0').replace('\\n', '\n').replace('\\"', '"').replace('\0', '\\')
+
+
+def idiv(a, b):
+    # División entera truncando hacia cero (como en C)
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return q
+
+
+# ---------------------------------------------------------------------
+#  Acceso a variables
+# ---------------------------------------------------------------------
+def frame_getter(hops):
+    '''
+    Closure que devuelve el frame que está 'hops' niveles arriba.
+    '''
+    if hops == 0:
+        return lambda f: f
+    if hops == 1:
+        return lambda f: f[LINK]
+    if hops == 2:
+        return lambda f: f[LINK][LINK]
+
+    def get(f):
+        for _ in range(hops):
+            f = f[LINK]
+        return f
+    return get
+
+
+def load(hops, slot):
+    if hops == 0:
+        return lambda f: f[slot]
+    if hops == 1:
+        return lambda f: f[LINK][slot]
+    frame = frame_getter(hops)
+    return lambda f: frame(f)[slot]
+
+
+def store(hops, slot, value):
+    if hops == 0:
+        def assign(f):
+            f[slot] = value(f)
+    elif hops == 1:
+        def assign(f):
+            f[LINK][slot] = value(f)
+    else:
+        frame = frame_getter(hops)
+
+        def assign(f):
+            frame(f)[slot] = value(f)
+    return assign
+
+
+# ---------------------------------------------------------------------
+#  Operadores
+# ---------------------------------------------------------------------
+def binary_op(op, left, right, node):
+    if op == '+':
+        return lambda f: left(f) + right(f)
+    if op == '-':
+        return lambda f: left(f) - right(f)
+    if op == '*':
+        return lambda f: left(f) * right(f)
+    if op == '/':
+        def div(f):
+            a = left(f)
+            b = right(f)
+            try:
+                if type(a) is int:
+                    return idiv(a, b)
+                return a / b
+            except ZeroDivisionError:
+                raise PL0RuntimeError('Division by zero', node) from None
+        return div
+    raise PL0RuntimeError(f'Unknown operator {op}', node)
+
+
+def logical_op(op, left, right, node):
+    if op == '<':
+        return lambda f: left(f) < right(f)
+    if op == '<=':
+        return lambda f: left(f) <= right(f)
+    if op == '>':
+        return lambda f: left(f) > right(f)
+    if op == '>=':
+        return lambda f: left(f) >= right(f)
+    if op == '==':
+        return lambda f: left(f) == right(f)
+    if op == '!=':
+        return lambda f: left(f) != right(f)
+    if op == 'and':
+        return lambda f: left(f) and right(f)
+    if op == 'or':
+        return lambda f: left(f) or right(f)
+    raise PL0RuntimeError(f'Unknown operator {op}', node)
+
+
+def unary_op(op, fact, node):
+    if op == '-':
+        return lambda f: -fact(f)
+    if op == '+':
+        return fact
+    if op == 'not':
+        return lambda f: not fact(f)
+    raise PL0RuntimeError(f'Unknown operator {op}', node)
+
+
+# ---------------------------------------------------------------------
+#  Compilación a closures
+# ---------------------------------------------------------------------
+class Interpreter(Visitor):
+    '''
+    Compila un Program a closures y lo ejecuta empezando por main().
+
+    Si count es True cada closure incrementa self.ops al ejecutarse
+    (útil para medir operaciones por segundo; es más lento). Si memo
+    es mayor que cero se memoizan las funciones puras. bounds_check en
+    False no controla que los índices de los arrays no sean negativos;
+    con True self.bounds (bounds.BoundsAnalysis) dice qué accesos no
+    lo necesitan.
+    '''
+    def __init__(self, ctxt=None, count=False, stdin=None, stdout=None, memo=0, bounds_check=True):
+        self.ctxt = ctxt
+        self.bounds_check = bounds_check
+        self.count = count
+        self.ops = 0
+        self.memo = memo
+        self.caches = []
+        self.bounds = None
+        self.stdin = stdin
+        self.stdout = stdout
+
+    def interpret(self, node):
+        try:
+            main = self.compile(node)
+            return main()
+        except PL0RuntimeError as e:
+            if self.ctxt:
+                self.ctxt.error(str(e), e.node)
+            else:
+                raise
+        except RecursionError:
+            if self.ctxt:
+                self.ctxt.error('Stack overflow', None)
+            else:
+                raise
+
+    def compile(self, node):
+        '''
+        Compila el programa y devuelve una función sin argumentos que
+        lo ejecuta.
+        '''
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        self.out = self.stdout or sys.stdout
+        self.inp = self.stdin or sys.stdin
+        errors = Resolver.resolve(node)
+        if errors:
+            raise PL0RuntimeError(*errors[0])
+        self.functions = {}
+        self.caches = []
+        self.pure = set()
+        if self.memo:
+            from purity import pure_functions
+            self.pure = pure_functions(node)
+        self.bounds = None
+        if self.bounds_check:
+            from bounds import BoundsAnalysis
+            self.bounds = BoundsAnalysis(node)
+        self.visit(node)
+        main = next((self.function(func) for func in node.funclist if func.name == 'main'), None)
+        if main is None:
+            raise PL0RuntimeError('Program has no main function')
+        body = main.body
+        # Los parámetros de main, si tiene, empiezan en cero
+        parms = main.node.parmlist.parmlist if main.node.parmlist else []
+        init = [zero_value(parm.datatype) for parm in parms] + main.init
+        arrays = main.arrays
+
+        def run():
+            frame = [None, None] + init
+            for slot, dim, zero in arrays:
+                frame[slot] = new_array(zero, dim(frame))
+            body(frame)
+            return frame[RETVAL]
+        return run
+
+    def code(self, n):
+        '''
+        Compila un nodo hijo. En modo conteo envuelve el closure.
+        '''
+        c = self.visit(n)
+        if not self.count or c is None:
+            return c
+
+        def counted(f):
+            self.ops += 1
+            return c(f)
+        return counted
+
+    def statement(self, n):
+        '''
+        Compila una instrucción. Una llamada usada como instrucción
+        descarta su valor para que no se confunda con BREAK o RETURN.
+        '''
+        c = self.code(n)
+        if isinstance(n, FuncCall):
+            def call(f):
+                c(f)
+            return call
+        return c
+
+    def function(self, n):
+        '''
+        Function de la definición n (se crea la primera vez que se pide).
+        '''
+        fn = self.functions.get(id(n))
+        if fn is None:
+            fn = self.functions[id(n)] = Function(n.name, n, n.level)
+        return fn
+
+    # Declaraciones ----------------------------------------------------
+    def visit(self, n: Program):
+        for func in n.funclist:
+            self.visit(func)
+
+    def visit(self, n: FunDefinition):
+        fn = self.function(n)
+        for var in n.varlist.varlist if n.varlist else []:
+            if isinstance(var, FunDefinition):
+                self.visit(var)
+            else:
+                fn.init.append(zero_value(var.datatype))
+                if isinstance(var.datatype, ArrayType):
+                    dim = self.code(var.datatype.dim)
+                    fn.arrays.append((FIRST_SLOT + var.slot, dim, zero_value(var.datatype)))
+
+        fn.body = self.statement(n.stmtlist)
+
+    # Instrucciones ----------------------------------------------------
+    def visit(self, n: StmtList):
+        stmts = tuple(self.statement(stmt) for stmt in n.stmtlist)
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def block(f):
+            for stmt in stmts:
+                status = stmt(f)
+                if status is not None:
+                    return status
+        return block
+
+    def visit(self, n: Assign):
+        value = self.code(n.expr)
+        loc = n.location
+        if isinstance(loc, ArrayLocation):
+            setitem = self.setitem(loc)
+            return lambda f: setitem(f, value(f))
+        hops, slot = self.slot(loc)
+        return store(hops, slot, value)
+
+    def visit(self, n: While):
+        relation = self.code(n.relation)
+        stmt = self.statement(n.stmt)
+
+        def loop(f):
+            while relation(f):
+                status = stmt(f)
+                if status is not None:
+                    if status is BREAK:
+                        break
+                    return status
+        return loop
+
+    def visit(self, n: IfStmt):
+        relation = self.code(n.relation)
+        thenstmt = self.statement(n.thenstmt)
+        if n.elsestmt:
+            elsestmt = self.statement(n.elsestmt)
+
+            def ifelse(f):
+                if relation(f):
+                    return thenstmt(f)
+                return elsestmt(f)
+            return ifelse
+
+        def ifthen(f):
+            if relation(f):
+                return thenstmt(f)
+        return ifthen
+
+    def visit(self, n: Return):
+        value = self.code(n.value)
+
+        def ret(f):
+            f[RETVAL] = value(f)
+            return RETURN
+        return ret
+
+    def visit(self, n: Break):
+        return lambda f: BREAK
+
+    def visit(self, n: Skip):
+        return lambda f: None
+
+    def visit(self, n: Print):
+        text = decode_string(n.value)
+        out = self.out
+
+        def write(f):
+            out.write(text)
+        return write
+
+    def visit(self, n: Write):
+        value = self.code(n.expr)
+        out = self.out
+
+        def write(f):
+            out.write(str(value(f)))
+        return write
+
+    def visit(self, n: Read):
+        loc = n.location
+        hops, slot = self.slot(loc)
+        frame = frame_getter(hops)
+        if isinstance(loc, ArrayLocation):
+            setitem = self.setitem(loc)
+        convert = float if loc.binding.decl.datatype.name == 'float' else int
+        stdin = self.inp
+
+        def read(f):
+            line = stdin.readline()
+            try:
+                value = convert(line.strip())
+            except ValueError:
+                raise PL0RuntimeError(f'Invalid input {line.strip()!r} for {loc.name}', n) from None
+            if isinstance(loc, ArrayLocation):
+                setitem(f, value)
+            else:
+                frame(f)[slot] = value
+        return read
+
+    # Expresiones ------------------------------------------------------
+    def visit(self, n: Integer):
+        value = int(n.value)
+        return lambda f: value
+
+    def visit(self, n: Float):
+        value = float(n.value)
+        return lambda f: value
+
+    def visit(self, n: SimpleLocation):
+        return load(*self.slot(n))
+
+    def visit(self, n: ArrayLocation):
+        array = self.variable(n)
+        index = self.code(n.index)
+        if self.bounds and id(n) in self.bounds.safe:
+            # bounds.py ya demostró que 0 <= índice < len(array)
+            return lambda f: array(f)[index(f)]
+        if not self.bounds_check:
+            def item(f):
+                try:
+                    return array(f)[index(f)]
+                except IndexError:
+                    raise PL0RuntimeError(f'Index out of range in {n.name}', n) from None
+            return item
+
+        def checked(f):
+            a, i = array(f), index(f)
+            try:
+                if i >= 0:
+                    return a[i]
+            except IndexError:
+                pass
+            raise PL0RuntimeError(f'Index out of range in {n.name}', n)
+        return checked
+
+    def visit(self, n: TypeCast):
+        expr = self.code(n.expr)
+        if n.name == 'int':
+            return lambda f: int(expr(f))
+        return lambda f: float(expr(f))
+
+    def visit(self, n: Binary):
+        return binary_op(n.op, self.code(n.left), self.code(n.right), n)
+
+    def visit(self, n: Logical):
+        return logical_op(n.op, self.code(n.left), self.code(n.right), n)
+
+    def visit(self, n: Unary):
+        return unary_op(n.op, self.code(n.fact), n)
+
+    def visit(self, n: FuncCall):
+        fn = self.function(n.binding.decl)
+        args = tuple(self.code(arg) for arg in n.arglist.arglist) if n.arglist else ()
+        if len(args) != fn.nparms:
+            raise PL0RuntimeError(f'{n.name} expects {fn.nparms} arguments, got {len(args)}', n)
+
+        # El enlace estático del frame nuevo es el frame de la función
+        # donde se declaró fn (nivel 0: funciones globales, sin enlace)
+        link = frame_getter(n.binding.depth) if fn.level else (lambda f: None)
+
+        def call(f):
+            frame = [link(f), None]
+            for arg in args:
+                frame.append(arg(f))
+            frame += fn.init
+            for slot, dim, zero in fn.arrays:
+                frame[slot] = new_array(zero, dim(frame))
+            fn.body(frame)
+            return frame[RETVAL]
+
+        if id(n.binding.decl) not in self.pure:
+            return call
+        return self.memoized(fn, link, args)
+
+    def memoized(self, fn, link, args):
+        '''
+        Llamada a una función pura que primero busca los argumentos en
+        el cache de la función. Los float van por repr() en la clave:
+        0.0 y -0.0 son iguales pero 1.0 / x no da lo mismo.
+        '''
+        if fn.cache is None:
+            from purity import MemoCache
+            fn.cache = MemoCache(fn.name, self.memo)
+            self.caches.append(fn.cache)
+        cache = fn.cache
+        missing = cache.MISSING
+        parms = fn.node.parmlist.parmlist if fn.node.parmlist else []
+        floats = tuple(parm.datatype.name == 'float' for parm in parms)
+        real = any(floats)
+
+        def call(f):
+            values = [arg(f) for arg in args]
+            if real:
+                key = tuple(repr(v) if r else v for v, r in zip(values, floats))
+            else:
+                key = tuple(values)
+            result = cache.get(key)
+            if result is missing:
+                frame = [link(f), None] + values + fn.init
+                for slot, dim, zero in fn.arrays:
+                    frame[slot] = new_array(zero, dim(frame))
+                fn.body(frame)
+                result = frame[RETVAL]
+                cache.put(key, result)
+            return result
+        return call
+
+    # Utilidades -------------------------------------------------------
+    def slot(self, n):
+        # (saltos, slot en el frame) de una variable ya enlazada
+        return n.binding.depth, FIRST_SLOT + n.binding.slot
+
+    def variable(self, n):
+        return load(*self.slot(n))
+
+    def setitem(self, loc):
+        '''
+        Closure (frame, valor) que guarda en loc[índice]: como una
+        asignación de Python, primero el valor, después el array y el
+        índice.
+        '''
+        array = self.variable(loc)
+        index = self.code(loc.index)
+        check = self.bounds_check and id(loc) not in self.bounds.safe
+
+        def setitem(f, value):
+            a, i = array(f), index(f)
+            try:
+                if not check or i >= 0:
+                    a[i] = value
+                    return
+            except IndexError:
+                pass
+            except OverflowError:
+                raise PL0RuntimeError(f'Integer overflow in {loc.name}', loc) from None
+            except TypeError:
+                # Un float en un array int (sin pasar por el checker)
+                raise PL0RuntimeError(f'Type mismatch in {loc.name}', loc) from None
+            raise PL0RuntimeError(f'Index out of range in {loc.name}', loc)
+        return setitem
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from context import Context
+    context = Context()
+    with open(argv[1], encoding='utf-8') as file:
+        context.parse(file.read())
+    context.run()
+
+
+if __name__ == '__main__':
+    from sys import argv
+    main(argv)
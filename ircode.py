@@ -0,0 +1,535 @@
+# ircode.py
+'''
+Código intermedio (IR) de PL0
+=============================
+Traduce el AST de model.py a un bytecode plano para una máquina de pila.
+
+Cada función se compila a un array('i') donde cada instrucción ocupa
+dos enteros: el código de operación y su argumento (0 si no usa). Los
+valores que no caben en un entero (flotantes, strings, destinos de
+llamadas) van en una tabla de constantes compartida por todo el módulo.
+
+    CONST k        push consts[k]
+    LOAD s         push frame[s]
+    STORE s        frame[s] = pop
+    LOADN h<<16|s  push (frame h niveles arriba)[s]
+    STOREN h<<16|s (frame h niveles arriba)[s] = pop
+    ALOAD          i = pop; a = pop; push a[i]
+    ASTORE         v = pop; i = pop; a = pop; a[i] = v
+    NEWARRAY s     zero = pop; n = pop; frame[s] = interp.new_array(zero, n)
+    ADD SUB MUL DIV NEG ITOF FTOI
+    LT LE GT GE EQ NE NOT
+    JUMP t         pc = t
+    JUMPF t        if not pop: pc = t
+    JUMPF_OR_POP t if not top: pc = t   else: pop   (and)
+    JUMPT_OR_POP t if top: pc = t       else: pop   (or)
+    CALL k         llama consts[k] = (funcion, saltos del enlace estático)
+    RET            devuelve pop
+    POP            descarta el tope
+    PRINT k        escribe consts[k]
+    WRITE          escribe pop
+    READ t         lee un int (t=0) o float (t=1) y lo apila
+
+Los frames tienen el mismo formato que en interp.py, sin valor de
+retorno: frame[0] es el enlace estático y frame[1:] los parámetros y
+las variables locales.
+
+La máquina virtual (VM) ejecuta el bytecode con un único ciclo de
+despacho por función.
+'''
+import sys
+from array import array
+
+from model import *
+from interp import PL0RuntimeError, decode_string, idiv, new_array, zero_value
+from resolve import Resolver
+
+# Códigos de operación -----------------------------------------------
+opnames = [
+    'LOAD', 'CONST', 'STORE', 'ALOAD', 'ADD', 'SUB', 'MUL', 'DIV',
+    'LT', 'LE', 'GT', 'GE', 'EQ', 'NE', 'JUMPF', 'JUMP', 'ASTORE',
+    'CALL', 'RET', 'LOADN', 'STOREN', 'NEG', 'NOT', 'ITOF', 'FTOI',
+    'JUMPF_OR_POP', 'JUMPT_OR_POP', 'NEWARRAY', 'POP', 'PRINT',
+    'WRITE', 'READ',
+]
+opcodes = {name: code for code, name in enumerate(opnames)}
+globals().update(opcodes)
+
+_binary_codes = {'+': ADD, '-': SUB, '*': MUL, '/': DIV}
+_relation_codes = {'<': LT, '<=': LE, '>': GT, '>=': GE, '==': EQ, '!=': NE}
+
+FIRST_SLOT = 1
+
+
+class IRFunction:
+    '''
+    Función en bytecode.
+    '''
+    def __init__(self, name, node, level):
+        self.name = name
+        self.node = node
+        self.level = level
+        self.nparms = len(node.parmlist.parmlist) if node.parmlist else 0
+        self.init = []          # valores iniciales de las variables locales
+        self.names = {}         # slot -> nombre (para el volcado)
+        self.nodes = {}         # pc -> nodo de las instrucciones que pueden fallar
+        self.code = array('i')
+
+    def emit(self, op, arg=0, node=None):
+        if node is not None:
+            self.nodes[len(self.code)] = node
+        self.code.append(op)
+        self.code.append(arg)
+        return len(self.code) - 2
+
+    def label(self):
+        return len(self.code)
+
+    def patch(self, pc, target):
+        self.code[pc + 1] = target
+
+
+class IRModule:
+    '''
+    Resultado de la traducción: funciones y tabla de constantes.
+    '''
+    def __init__(self):
+        self.functions = []
+        self.consts = []
+        self._const_index = {}
+
+    def const(self, value):
+        # repr distingue 0.0 de -0.0 (iguales para ==), que puede
+        # aparecer como literal después de optimize.ConstantFolder
+        key = (type(value), repr(value) if isinstance(value, float) else value)
+        if key not in self._const_index:
+            self._const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self._const_index[key]
+
+    def dump(self):
+        lines = []
+        for k, value in enumerate(self.consts):
+            if isinstance(value, tuple):
+                lines.append(f'const {k:<4} {value[0].name} (link {value[1]})')
+            else:
+                lines.append(f'const {k:<4} {value!r}')
+        for fn in self.functions:
+            lines.append('')
+            lines.append(f'fun {fn.name} (level {fn.level}, {fn.nparms} parms, '
+                         f'{len(fn.init)} locals)')
+            code = fn.code
+            for pc in range(0, len(code), 2):
+                op, arg = code[pc], code[pc + 1]
+                lines.append(f'  {pc:5}  {opnames[op]:<13}{self.describe(fn, op, arg)}')
+        return '\n'.join(lines)
+
+    def describe(self, fn, op, arg):
+        if op in (LOAD, STORE, NEWARRAY):
+            return f'{arg:<6} ; {fn.names.get(arg, "?")}'
+        if op in (LOADN, STOREN):
+            return f'{arg >> 16}, {arg & 0xffff}'
+        if op in (CONST, PRINT):
+            return f'{arg:<6} ; {self.consts[arg]!r}'
+        if op == CALL:
+            return f'{arg:<6} ; {self.consts[arg][0].name}'
+        if op in (JUMP, JUMPF, JUMPF_OR_POP, JUMPT_OR_POP, READ):
+            return str(arg)
+        return ''
+
+
+class IRGenerator(Visitor):
+    '''
+    Genera el bytecode de un Program.
+    '''
+    def __init__(self):
+        self.module = IRModule()
+        self.functions = {}     # id(FunDefinition) -> IRFunction
+        self.func = None
+        self.loops = []         # saltos de break pendientes por ciclo
+
+    @classmethod
+    def gencode(cls, node):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        errors = Resolver.resolve(node)
+        if errors:
+            raise PL0RuntimeError(*errors[0])
+        gen = cls()
+        gen.visit(node)
+        return gen.module
+
+    # Declaraciones ----------------------------------------------------
+    def visit(self, n: Program):
+        for func in n.funclist:
+            self.declare(func)
+        for func in n.funclist:
+            self.visit(func)
+
+    def declare(self, n):
+        fn = self.functions[id(n)] = IRFunction(n.name, n, n.level)
+        self.module.functions.append(fn)
+
+    def visit(self, n: FunDefinition):
+        fn = self.functions[id(n)]
+        outer, self.func = self.func, fn
+
+        parms = n.parmlist.parmlist if n.parmlist else []
+        locals_ = n.varlist.varlist if n.varlist else []
+        for var in parms + locals_:
+            if isinstance(var, FunDefinition):
+                self.declare(var)
+            else:
+                fn.names[FIRST_SLOT + var.slot] = var.name
+
+        # Prólogo: arrays locales
+        for var in locals_:
+            if isinstance(var, VarDefinition):
+                fn.init.append(zero_value(var.datatype))
+                if isinstance(var.datatype, ArrayType):
+                    self.visit(var.datatype.dim)
+                    fn.emit(CONST, self.module.const(zero_value(var.datatype)))
+                    fn.emit(NEWARRAY, FIRST_SLOT + var.slot)
+
+        self.statement(n.stmtlist)
+        fn.emit(CONST, self.module.const(0))
+        fn.emit(RET)
+
+        self.func = outer
+        for var in locals_:
+            if isinstance(var, FunDefinition):
+                self.visit(var)
+
+    # Instrucciones ----------------------------------------------------
+    def statement(self, n):
+        self.visit(n)
+        if isinstance(n, FuncCall):
+            self.func.emit(POP)
+
+    def visit(self, n: StmtList):
+        for stmt in n.stmtlist:
+            self.statement(stmt)
+
+    def visit(self, n: Assign):
+        loc = n.location
+        if isinstance(loc, ArrayLocation):
+            self.array(loc)
+            self.visit(loc.index)
+            self.visit(n.expr)
+            self.func.emit(ASTORE, node=loc)
+        else:
+            self.visit(n.expr)
+            self.store(loc)
+
+    def visit(self, n: While):
+        fn = self.func
+        top = fn.label()
+        self.visit(n.relation)
+        exit_ = fn.emit(JUMPF)
+        self.loops.append([])
+        self.statement(n.stmt)
+        fn.emit(JUMP, top)
+        end = fn.label()
+        fn.patch(exit_, end)
+        for pc in self.loops.pop():
+            fn.patch(pc, end)
+
+    def visit(self, n: IfStmt):
+        fn = self.func
+        self.visit(n.relation)
+        skip = fn.emit(JUMPF)
+        self.statement(n.thenstmt)
+        if n.elsestmt:
+            done = fn.emit(JUMP)
+            fn.patch(skip, fn.label())
+            self.statement(n.elsestmt)
+            fn.patch(done, fn.label())
+        else:
+            fn.patch(skip, fn.label())
+
+    def visit(self, n: Return):
+        self.visit(n.value)
+        self.func.emit(RET)
+
+    def visit(self, n: Break):
+        if not self.loops:
+            raise PL0RuntimeError('break outside of a while loop', n)
+        self.loops[-1].append(self.func.emit(JUMP))
+
+    def visit(self, n: Skip):
+        pass
+
+    def visit(self, n: Print):
+        self.func.emit(PRINT, self.module.const(decode_string(n.value)))
+
+    def visit(self, n: Write):
+        self.visit(n.expr)
+        self.func.emit(WRITE)
+
+    def visit(self, n: Read):
+        loc = n.location
+        kind = 1 if loc.binding.decl.datatype.name == 'float' else 0
+        if isinstance(loc, ArrayLocation):
+            self.array(loc)
+            self.visit(loc.index)
+            self.func.emit(READ, kind, n)
+            self.func.emit(ASTORE, node=loc)
+        else:
+            self.func.emit(READ, kind, n)
+            self.store(loc)
+
+    # Expresiones ------------------------------------------------------
+    def visit(self, n: Integer):
+        self.func.emit(CONST, self.module.const(int(n.value)))
+
+    def visit(self, n: Float):
+        self.func.emit(CONST, self.module.const(float(n.value)))
+
+    def visit(self, n: SimpleLocation):
+        self.load(*self.slot(n))
+
+    def visit(self, n: ArrayLocation):
+        self.array(n)
+        self.visit(n.index)
+        self.func.emit(ALOAD, node=n)
+
+    def visit(self, n: TypeCast):
+        self.visit(n.expr)
+        self.func.emit(FTOI if n.name == 'int' else ITOF)
+
+    def visit(self, n: Binary):
+        self.visit(n.left)
+        self.visit(n.right)
+        self.func.emit(_binary_codes[n.op], node=n if n.op == '/' else None)
+
+    def visit(self, n: Logical):
+        fn = self.func
+        if n.op in ('and', 'or'):
+            self.visit(n.left)
+            jump = fn.emit(JUMPF_OR_POP if n.op == 'and' else JUMPT_OR_POP)
+            self.visit(n.right)
+            fn.patch(jump, fn.label())
+        else:
+            self.visit(n.left)
+            self.visit(n.right)
+            fn.emit(_relation_codes[n.op])
+
+    def visit(self, n: Unary):
+        self.visit(n.fact)
+        if n.op == '-':
+            self.func.emit(NEG)
+        elif n.op == 'not':
+            self.func.emit(NOT)
+
+    def visit(self, n: FuncCall):
+        fn = self.functions[id(n.binding.decl)]
+        args = n.arglist.arglist if n.arglist else []
+        if len(args) != fn.nparms:
+            raise PL0RuntimeError(f'{n.name} expects {fn.nparms} arguments, got {len(args)}', n)
+        for arg in args:
+            self.visit(arg)
+        link = n.binding.depth if fn.level else -1
+        self.func.emit(CALL, self.module.const((fn, link)))
+
+    # Utilidades -------------------------------------------------------
+    def slot(self, n):
+        # (saltos, slot en el frame) de una variable ya enlazada
+        return n.binding.depth, FIRST_SLOT + n.binding.slot
+
+    def load(self, hops, slot):
+        if hops:
+            self.func.emit(LOADN, hops << 16 | slot)
+        else:
+            self.func.emit(LOAD, slot)
+
+    def store(self, loc):
+        hops, slot = self.slot(loc)
+        if hops:
+            self.func.emit(STOREN, hops << 16 | slot)
+        else:
+            self.func.emit(STORE, slot)
+
+    def array(self, n):
+        self.load(*self.slot(n))
+
+
+# ---------------------------------------------------------------------
+#  Máquina virtual
+# ---------------------------------------------------------------------
+class VM:
+    '''
+    Ejecuta un IRModule empezando por main().
+    '''
+    def __init__(self, module, stdin=None, stdout=None):
+        self.module = module
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+
+    def run(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        for fn in self.module.functions:
+            if fn.name == 'main' and fn.level == 0:
+                # Los parámetros de main, si tiene, empiezan en cero
+                parms = fn.node.parmlist.parmlist if fn.node.parmlist else []
+                return self.execute(fn, [None] + [zero_value(p.datatype) for p in parms] + fn.init)
+        raise PL0RuntimeError('Program has no main function')
+
+    def execute(self, fn, frame):
+        code = fn.code
+        consts = self.module.consts
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+            if op == LOAD:
+                push(frame[arg])
+            elif op == CONST:
+                push(consts[arg])
+            elif op == STORE:
+                frame[arg] = pop()
+            elif op == ALOAD:
+                i = pop()
+                try:
+                    if i < 0:
+                        raise IndexError
+                    stack[-1] = stack[-1][i]
+                except IndexError:
+                    node = fn.nodes[pc - 2]
+                    raise PL0RuntimeError(f'Index out of range in {node.name}', node) from None
+            elif op == ADD:
+                b = pop()
+                stack[-1] += b
+            elif op == SUB:
+                b = pop()
+                stack[-1] -= b
+            elif op == MUL:
+                b = pop()
+                stack[-1] *= b
+            elif op == DIV:
+                b = pop()
+                a = stack[-1]
+                try:
+                    stack[-1] = idiv(a, b) if type(a) is int else a / b
+                except ZeroDivisionError:
+                    raise PL0RuntimeError('Division by zero', fn.nodes[pc - 2]) from None
+            elif op <= NE:
+                b = pop()
+                a = stack[-1]
+                if op == LT:
+                    stack[-1] = a < b
+                elif op == LE:
+                    stack[-1] = a <= b
+                elif op == GT:
+                    stack[-1] = a > b
+                elif op == GE:
+                    stack[-1] = a >= b
+                elif op == EQ:
+                    stack[-1] = a == b
+                else:
+                    stack[-1] = a != b
+            elif op == JUMPF:
+                if not pop():
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == ASTORE:
+                v = pop()
+                i = pop()
+                try:
+                    if i < 0:
+                        raise IndexError
+                    pop()[i] = v
+                except IndexError:
+                    problem = 'Index out of range'
+                except OverflowError:
+                    problem = 'Integer overflow'
+                except TypeError:
+                    problem = 'Type mismatch'
+                else:
+                    continue
+                node = fn.nodes[pc - 2]
+                raise PL0RuntimeError(f'{problem} in {node.name}', node)
+            elif op == CALL:
+                callee, hops = consts[arg]
+                if hops < 0:
+                    link = None
+                else:
+                    link = frame
+                    for _ in range(hops):
+                        link = link[0]
+                nparms = callee.nparms
+                if nparms:
+                    args = stack[-nparms:]
+                    del stack[-nparms:]
+                else:
+                    args = []
+                push(self.execute(callee, [link] + args + callee.init))
+            elif op == RET:
+                return pop()
+            elif op == LOADN:
+                f = frame
+                for _ in range(arg >> 16):
+                    f = f[0]
+                push(f[arg & 0xffff])
+            elif op == STOREN:
+                f = frame
+                for _ in range(arg >> 16):
+                    f = f[0]
+                f[arg & 0xffff] = pop()
+            elif op == NEG:
+                stack[-1] = -stack[-1]
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+            elif op == ITOF:
+                stack[-1] = float(stack[-1])
+            elif op == FTOI:
+                stack[-1] = int(stack[-1])
+            elif op == JUMPF_OR_POP:
+                if not stack[-1]:
+                    pc = arg
+                else:
+                    pop()
+            elif op == JUMPT_OR_POP:
+                if stack[-1]:
+                    pc = arg
+                else:
+                    pop()
+            elif op == NEWARRAY:
+                zero = pop()
+                frame[arg] = new_array(zero, pop())
+            elif op == POP:
+                pop()
+            elif op == PRINT:
+                self.stdout.write(consts[arg])
+            elif op == WRITE:
+                self.stdout.write(str(pop()))
+            elif op == READ:
+                line = self.stdin.readline().strip()
+                try:
+                    push(float(line) if arg else int(line))
+                except ValueError:
+                    node = fn.nodes[pc - 2]
+                    raise PL0RuntimeError(f'Invalid input {line!r} for {node.location.name}', node) from None
+            else:
+                raise PL0RuntimeError(f'Bad opcode {op}')
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from context import Context
+    context = Context()
+    with open(argv[1], encoding='utf-8') as file:
+        context.parse(file.read())
+    if not context.have_errors:
+        print(IRGenerator.gencode(context.ast).dump())
+
+
+if __name__ == '__main__':
+    from sys import argv
+    main(argv)
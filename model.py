@@ -1,122 +1,209 @@
-from dataclasses import dataclass, field
-from multimethod import multimeta
+import os
+from dataclasses import dataclass, field, fields
 from typing import List
-from rich.tree import Tree
-from rich.console import Console
 
-class Visitor(metaclass=multimeta):
+class VisitorNamespace(dict):
+    '''
+    Cuerpo de una clase Visitor. Guarda cada definición de 'visit'
+    en lugar de quedarse solo con la última.
+    '''
+    def __init__(self):
+        super().__init__()
+        self.visitors = []
+
+    def __setitem__(self, key, value):
+        if key == 'visit' and callable(value):
+            self.visitors.append(value)
+        super().__setitem__(key, value)
+
+class VisitorMeta(type):
+    '''
+    Metaclase de Visitor. Con los métodos
+
+        def visit(self, n: Binary, ...)
+        def visit(self, n: Unary, ...)
+
+    construye una tabla tipo(nodo) -> función, una sola vez por
+    clase, y 'visit' despacha con una búsqueda en un diccionario.
+    Los tipos que no están en la tabla (subclases) se resuelven con
+    el MRO del nodo la primera vez y se agregan a la tabla.
+    '''
+    @classmethod
+    def __prepare__(meta, name, bases):
+        return VisitorNamespace()
+
+    def __new__(meta, name, bases, namespace):
+        visitors = getattr(namespace, 'visitors', [])
+        cls = super().__new__(meta, name, bases, dict(namespace))
+        table = {}
+        for base in reversed(cls.__mro__[1:]):
+            table.update(vars(base).get('_visitors', {}))
+        cls._visitors = {meta.node_type(func): func for func in visitors}
+        table.update(cls._visitors)
+        cls._visit_table = table
+        if visitors:
+            cls.visit = meta.dispatch
+        return cls
+
+    @staticmethod
+    def node_type(func):
+        # Tipo anotado del primer argumento después de self
+        name = func.__code__.co_varnames[1]
+        return func.__annotations__[name]
+
+    @staticmethod
+    def dispatch(self, n, *args, **kwargs):
+        try:
+            func = self._visit_table[type(n)]
+        except KeyError:
+            # Por la metaclase: un Visitor puede definir su propio 'resolve'
+            func = VisitorMeta.resolve(type(self), type(n))
+        return func(self, n, *args, **kwargs)
+
+    def resolve(cls, nodetype):
+        for base in nodetype.__mro__:
+            if base in cls._visit_table:
+                func = cls._visit_table[nodetype] = cls._visit_table[base]
+                return func
+        raise TypeError(f'{cls.__name__} has no visit method for {nodetype.__name__}')
+
+class Visitor(metaclass=VisitorMeta):
     ...
 
+# Los nodos usan __slots__ (sin __dict__ por instancia) para ahorrar
+# memoria en programas grandes. PL0_AST_SLOTS=0 vuelve a los
+# dataclass normales, por ejemplo para comparar.
+SLOTS = os.environ.get('PL0_AST_SLOTS', '1') != '0'
+
 # Clases abstractas
-@dataclass
+@dataclass(slots=SLOTS)
 class Node:
     def accept(self, v: Visitor, *args, **kwargs):
         return v.visit(self, *args, **kwargs)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class DataType(Node):
     ...
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Stmt(Node):
     ...
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Expr(Node):
     ...
 
+def children(node):
+    # Campos del constructor: los que agregan el Resolver y el checker
+    # (parent, func, binding, ...) apuntan hacia arriba en el árbol
+    return [getattr(node, f.name) for f in fields(node) if f.init]
+
 # DataType ------------------------------------------
-@dataclass
+@dataclass(slots=SLOTS)
 class SimpleType(DataType):
     name: str
+    # Código entero de los tipos canónicos de typesys (None en otro caso)
+    code: int = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class ArrayType(DataType):
     name: str
     dim: Expr
 
 # Expressions ---------------------------------------
-@dataclass
+@dataclass(slots=SLOTS)
 class Literal(Expr):
     ...
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Integer(Literal):
     value: int
     dtype: DataType=field(default_factory = SimpleType('int'))
-@dataclass
+@dataclass(slots=SLOTS)
 class Float(Literal):
     value: float
     dtype: DataType=field(default_factory = SimpleType('float'))
     
-@dataclass
+@dataclass(slots=SLOTS)
 class Location(Expr):
     ...
 
-@dataclass
+@dataclass(slots=SLOTS)
 class SimpleLocation(Location):
     name: str
-    
+    # Declaración enlazada por resolve.Resolver (Binding o None)
+    binding: object = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class ArrayLocation(Location):
     name: str
     index: Expr
+    binding: object = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class TypeCast(Expr):
     name: str
     expr: Expr
 
-@dataclass
+@dataclass(slots=SLOTS)
 class FuncCall(Expr):
     name: str
     arglist: Expr
+    binding: object = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if isinstance(self.arglist, list):
             self.arglist = ArgList(self.arglist)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Binary(Expr):
     op: str
     left: Expr
     right: Expr
  
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Logical(Expr):
     op: str
     left: Expr
     right: Expr
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Unary(Expr):
     op: str
     fact: Expr
 
 # Statements ----------------------------------
-@dataclass
+@dataclass(slots=SLOTS)
 class Declaration(Stmt):
-    ...
+    # Tipo asignado durante el chequeo (no forma parte del constructor)
+    dtype: DataType = field(default=None, init=False, repr=False, compare=False)
+    # Posición en el frame de la función, asignada por resolve.Resolver
+    # (None para funciones)
+    slot: int = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class VarDefinition(Declaration):
     name: str
     datatype: DataType
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Parameter(Declaration):
     name: str
     datatype: DataType
 
-@dataclass
+@dataclass(slots=SLOTS)
 class FunDefinition(Declaration):
     name: str
     parmlist: Declaration
     varlist: Declaration
     stmtlist: Stmt
-    
+    # Asignados por resolve.Resolver: nivel del alcance donde se declara
+    # (0 = global), cantidad de slots del frame y función que la contiene
+    level: int = field(default=None, init=False, repr=False, compare=False)
+    nslots: int = field(default=None, init=False, repr=False, compare=False)
+    parent: 'FunDefinition' = field(default=None, init=False, repr=False, compare=False)
+
     def __post_init__(self):
         if isinstance(self.parmlist, list):
             self.parmlist = ParmList(self.parmlist)
@@ -125,85 +212,95 @@ class FunDefinition(Declaration):
         if isinstance(self.stmtlist, list):
             self.stmtlist = StmtList(self.stmtlist)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Print(Stmt):
     value: str
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Write(Stmt):
     expr: Expr
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Read(Stmt):
     location: Expr
 
-@dataclass
+@dataclass(slots=SLOTS)
 class While(Stmt):
     relation: Expr
     stmt: Stmt
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Break(Stmt):
     ...
 
-@dataclass
+@dataclass(slots=SLOTS)
 class IfStmt(Stmt):
     relation: Expr
     thenstmt: Stmt
     elsestmt: Stmt
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Skip(Stmt):
     ...
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Return(Stmt):
     value: Expr
+    # Función a la que pertenece (resolve.Resolver)
+    func: FunDefinition = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class Assign(Stmt):
     location: Location
     expr: Expr
 
 # Contenedores ----------------------------------
-@dataclass
+@dataclass(slots=SLOTS)
 class Program(Stmt):
     funclist: List[FunDefinition] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class StmtList(Stmt):
     stmtlist: List[Stmt] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class VarList(Stmt):
     varlist: List[Declaration] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class ParmList(Stmt):
     parmlist: List[Declaration] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=SLOTS)
 class ArgList(Stmt):
     arglist: List[Expr] = field(default_factory=list)
 
 
 class AST(Visitor):
+    '''
+    Dibuja el AST con rich (que se importa solo al usar esta clase).
+    '''
+    def __init__(self):
+        from rich.tree import Tree
+        self.Tree = Tree
+
     @classmethod
     def printer(cls, n: Node):
+        from rich.console import Console
         vis = cls()
         tree = n.accept(vis)
         console = Console()
         console.print(tree)
 
     def visit(self, n: Program):
-        tree = Tree("Program")
+        tree = self.Tree("Program")
         hijo = tree.add("funclist")
         for func in n.funclist:
             hijo.add(func.accept(self))
         return tree
 
     def visit(self, n: FunDefinition):
-        tree = Tree("func" + "(" + n.name + ")")
+        tree = self.Tree("func" + "(" + n.name + ")")
         hijo1 = tree.add("parmlist")
         hijo2 = tree.add("locallist")
         hijo3 = tree.add("stmtlist")
@@ -220,23 +317,23 @@ class AST(Visitor):
         return tree
 
     def visit(self, n: Parameter):
-        tree = Tree("Parameter" + "(" + n.name + ")")
+        tree = self.Tree("Parameter" + "(" + n.name + ")")
         tree.add(n.datatype.accept(self))
         return tree
 
     def visit(self, n: VarDefinition):
-        tree = Tree("VarDefinition" + "(" + n.name + ")")
+        tree = self.Tree("VarDefinition" + "(" + n.name + ")")
         tree.add(n.datatype.accept(self))
         return tree
 
     # Nodos DATATYPE
     def visit(self, n: SimpleType):
-        tree = Tree(str(n.name))
+        tree = self.Tree(str(n.name))
         return tree
 
     # Nodos de EXPRESSION
     def visit(self, n: Logical):
-        tree = Tree("Logical (" + str(n.op) + ")")
+        tree = self.Tree("Logical (" + str(n.op) + ")")
         hijo1 = tree.add("expr_left")
         hijo1.add(n.left.accept(self))
         hijo2 = tree.add("expr_right")
@@ -244,7 +341,7 @@ class AST(Visitor):
         return tree
 
     def visit(self, n: Binary):
-        tree = Tree("Binary (" + str(n.op) + ")")
+        tree = self.Tree("Binary (" + str(n.op) + ")")
         hijo1 = tree.add("expr_left")
         hijo1.add(n.left.accept(self))
         hijo2 = tree.add("expr_right")
@@ -252,17 +349,17 @@ class AST(Visitor):
         return tree
 
     def visit(self, n: Unary):
-        tree = Tree("Unary " + str(n.op))
+        tree = self.Tree("Unary " + str(n.op))
         tree.add(n.fact.accept(self))
         return tree
 
     def visit(self, n: TypeCast):
-        tree = Tree("TypeCast")
+        tree = self.Tree("TypeCast")
         tree.add(n.expr.accept(self))
         return tree
 
     def visit(self, n: FuncCall):
-        tree = Tree("Call " + n.name)
+        tree = self.Tree("Call " + n.name)
         hijo1 = tree.add("Exprlist")
         if isinstance(n.arglist, list):
             for expr in n.arglist:
@@ -270,37 +367,37 @@ class AST(Visitor):
         return tree
 
     def visit(self, n: SimpleLocation):
-        tree = Tree("Simpleloc (" + n.name + ")")
+        tree = self.Tree("Simpleloc (" + n.name + ")")
         return tree
 
     def visit(self, n: ArrayLocation):
-        tree = Tree("ArrayLoc (" + n.name + ")" )
+        tree = self.Tree("ArrayLoc (" + n.name + ")" )
         tree.add(n.index.accept(self))
         return tree
 
     # Node STMTS
     def visit(self, n: Assign):
-        tree = Tree("assign ")
+        tree = self.Tree("assign ")
         hijo1 = tree.add("Name (" + n.location.name + ")")
         hijo2 = tree.add("Expr")
         hijo2.add(n.expr.accept(self))
         return tree
 
     def visit(self, n: Float):
-        tree = Tree('Float: ' + str(n.value))
+        tree = self.Tree('Float: ' + str(n.value))
         return tree
 
     def visit(self, n: Integer):
-        tree = Tree('Int: ' + str(n.value))
+        tree = self.Tree('Int: ' + str(n.value))
         return tree
 
     def visit(self, n: Return):
-        tree = Tree("Return")
+        tree = self.Tree("Return")
         tree.add(n.value.accept(self))
         return tree
 
     def visit(self, n: IfStmt):
-        tree = Tree("IfStmt")
+        tree = self.Tree("IfStmt")
         hijo1 = tree.add("relation")
         hijo2 = tree.add("then")
         hijo3 = tree.add("else")
@@ -320,15 +417,15 @@ class AST(Visitor):
         return tree
 
     def visit(self, n: Break):
-        tree = Tree("Break")
+        tree = self.Tree("Break")
         return tree
 
     def visit(self, n: Skip):
-        tree = Tree("Skip")
+        tree = self.Tree("Skip")
         return tree
 
     def visit(self, n: While):
-        tree = Tree("While")
+        tree = self.Tree("While")
         hijo1 = tree.add("Relation")
         hijo2 = tree.add("Stmt")
         hijo1.add(n.relation.accept(self))
@@ -340,21 +437,21 @@ class AST(Visitor):
         return tree
 
     def visit(self, n: Read):
-        tree = Tree("Read")
+        tree = self.Tree("Read")
         tree.add(n.location.accept(self))
         return tree
 
     def visit(self, n: Write):
-        tree = Tree("Write")
+        tree = self.Tree("Write")
         tree.add(n.expr.accept(self))
         return tree
 
     def visit(self, n: Print):
-        tree = Tree("Print " + n.value)
+        tree = self.Tree("Print " + n.value)
         return tree
 
     def visit(self, n: ArrayType):
-        tree = Tree("ArrayType (" + n.name + ")")
+        tree = self.Tree("ArrayType (" + n.name + ")")
         hijo1 = tree.add("Dim")
         hijo1.add(n.dim.accept(self))
         return tree
\ No newline at end of file
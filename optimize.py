@@ -0,0 +1,473 @@
+# optimize.py
+'''
+Optimización del AST
+====================
+Plegado de constantes y simplificaciones algebraicas sobre las
+expresiones de model.py, antes de pasar el programa al intérprete o
+al generador de IR.
+
+* Binary, Unary y TypeCast con operandos literales se reemplazan por
+  un Integer o un Float con el valor que daría la ejecución (división
+  entera truncando hacia cero, como interp.idiv).
+* Identidades que no cambian el resultado:
+
+      x * 1,  1 * x,  x / 1,  x - 0    ->  x       (int y float)
+      x + 0,  0 + x                     ->  x       (solo int: -0.0 + 0.0 es 0.0)
+      +x,  -(-x),  not not r            ->  x, x, r
+      int(x) con x int, float(x) con x float  ->  x
+
+Solo se pliega lo que typesys acepta: el tipo de cada operando sale
+de los literales, de los enlaces del Resolver y de los tipos que dejó
+el checker en las funciones, y una operación con tipos inválidos o
+desconocidos queda como está para que la reporten el checker o la
+ejecución. Tampoco se pliegan las divisiones por cero, las conversiones que
+fallarían (int de un float infinito) ni los enteros que no entran en
+64 bits.
+
+ConstantFolder.fold(ast) modifica el árbol en su lugar y devuelve un
+FoldStats.
+
+Eliminación de código muerto
+----------------------------
+DeadCodeEliminator.eliminate(ast) quita lo que nunca se ejecuta o no
+sirve:
+
+* las instrucciones que siguen a un Return, a un Break, a un if cuyas
+  dos ramas terminan así o a un while con condición siempre verdadera
+  y sin break;
+* los if con condición constante (queda la rama que se toma) y los
+  while con condición siempre falsa;
+* las variables locales que ya no se nombran en ninguna parte, salvo
+  los arrays cuyo tamaño puede hacer algo más que dar un valor
+  (a: int[f(1)] llama a f, int[n / m] puede dividir por cero).
+
+Una condición es constante si se decide con literales: comparaciones
+entre literales (después del plegado), not, y and/or cuyo lado
+izquierdo ya decide el resultado (se evalúan en cortocircuito, así que
+el lado derecho no tiene efectos que conservar). Las variables
+eliminadas dejan huecos en los slots: hay que volver a pasar el
+Resolver antes de ejecutar (Context.optimize lo hace).
+'''
+import operator
+from dataclasses import dataclass
+
+from model import *
+from typesys import int_type, float_type, lookup_type, opcodes, check_binary_code, check_unary_code
+from interp import idiv
+
+
+@dataclass(slots=True)
+class FoldStats:
+    nodes_before: int = 0
+    nodes_after: int = 0
+    folded: int = 0             # operaciones con literales reemplazadas
+    simplified: int = 0         # identidades aplicadas
+
+    def __str__(self):
+        removed = self.nodes_before - self.nodes_after
+        percent = removed / self.nodes_before * 100 if self.nodes_before else 0
+        return (f'{self.nodes_before} -> {self.nodes_after} nodes ({percent:.1f}% fewer), '
+                f'{self.folded} folded, {self.simplified} simplified')
+
+
+def count_nodes(ast):
+    '''
+    Cantidad de nodos del árbol (sin contar los tipos canónicos, que
+    se comparten).
+    '''
+    count = 0
+    stack = [ast]
+    while stack:
+        n = stack.pop()
+        if isinstance(n, list):
+            stack.extend(n)
+        elif isinstance(n, Node) and not isinstance(n, SimpleType):
+            count += 1
+            stack.extend(children(n))
+    return count
+
+
+def literal(value, dtype):
+    return Integer(value, int_type) if dtype is int_type else Float(value, float_type)
+
+
+def fits(value, dtype):
+    # Un entero fuera de 64 bits no se pliega: asmcode no puede cargarlo
+    # como constante
+    return dtype is not int_type or -2**63 <= value < 2**63
+
+
+def value_of(n):
+    return int(n.value) if isinstance(n, Integer) else float(n.value)
+
+
+def is_value(n, value):
+    return isinstance(n, (Integer, Float)) and value_of(n) == value
+
+
+class ConstantFolder(Visitor):
+    '''
+    visit() de una expresión devuelve (nodo que la reemplaza, tipo);
+    el tipo es None si no se conoce o si la expresión es inválida.
+    '''
+    def __init__(self):
+        self.stats = FoldStats()
+
+    @classmethod
+    def fold(cls, node):
+        folder = cls()
+        folder.stats.nodes_before = count_nodes(node)
+        folder.visit(node)
+        folder.stats.nodes_after = count_nodes(node)
+        return folder.stats
+
+    def expr(self, n):
+        return self.visit(n)[0]
+
+    # Declaraciones ----------------------------------------------------
+    def visit(self, n: Program):
+        for func in n.funclist:
+            self.visit(func)
+
+    def visit(self, n: FunDefinition):
+        for parm in n.parmlist.parmlist if n.parmlist else []:
+            self.visit(parm)
+        for var in n.varlist.varlist if n.varlist else []:
+            self.visit(var)
+        self.visit(n.stmtlist)
+
+    def visit(self, n: Parameter):
+        pass
+
+    def visit(self, n: VarDefinition):
+        if isinstance(n.datatype, ArrayType):
+            n.datatype.dim = self.expr(n.datatype.dim)
+
+    # Instrucciones ----------------------------------------------------
+    def visit(self, n: StmtList):
+        for stmt in n.stmtlist:
+            self.visit(stmt)
+
+    def visit(self, n: Assign):
+        self.visit(n.location)
+        n.expr = self.expr(n.expr)
+
+    def visit(self, n: While):
+        n.relation = self.expr(n.relation)
+        self.visit(n.stmt)
+
+    def visit(self, n: IfStmt):
+        n.relation = self.expr(n.relation)
+        self.visit(n.thenstmt)
+        if n.elsestmt:
+            self.visit(n.elsestmt)
+
+    def visit(self, n: Return):
+        n.value = self.expr(n.value)
+
+    def visit(self, n: Write):
+        n.expr = self.expr(n.expr)
+
+    def visit(self, n: Read):
+        self.visit(n.location)
+
+    def visit(self, n: Break):
+        pass
+
+    def visit(self, n: Skip):
+        pass
+
+    def visit(self, n: Print):
+        pass
+
+    # Expresiones ------------------------------------------------------
+    def visit(self, n: Integer):
+        return n, int_type
+
+    def visit(self, n: Float):
+        return n, float_type
+
+    def visit(self, n: SimpleLocation):
+        if n.binding and isinstance(n.binding.decl.datatype, SimpleType):
+            return n, lookup_type(n.binding.decl.datatype.name)
+        return n, None
+
+    def visit(self, n: ArrayLocation):
+        n.index = self.expr(n.index)
+        if n.binding and isinstance(n.binding.decl.datatype, ArrayType):
+            return n, lookup_type(n.binding.decl.datatype.name)
+        return n, None
+
+    def visit(self, n: FuncCall):
+        if n.arglist:
+            n.arglist.arglist = [self.expr(arg) for arg in n.arglist.arglist]
+        return n, n.binding.decl.dtype if n.binding else None
+
+    def visit(self, n: TypeCast):
+        expr, etype = self.visit(n.expr)
+        n.expr = expr
+        dtype = lookup_type(n.name)
+        if isinstance(expr, (Integer, Float)):
+            try:
+                value = int(value_of(expr)) if dtype is int_type else float(value_of(expr))
+            except (OverflowError, ValueError):
+                # int(inf), float de un entero enorme: falla al ejecutar
+                value = None
+            if value is not None and fits(value, dtype):
+                self.stats.folded += 1
+                return literal(value, dtype), dtype
+        if etype is dtype:
+            self.stats.simplified += 1
+            return expr, dtype
+        return n, dtype
+
+    def visit(self, n: Binary):
+        left, ltype = self.visit(n.left)
+        right, rtype = self.visit(n.right)
+        n.left, n.right = left, right
+        dtype = check_binary_code(opcodes[n.op], ltype, rtype)
+        if dtype is None:
+            return n, None
+
+        if isinstance(left, (Integer, Float)) and isinstance(right, (Integer, Float)):
+            a, b = value_of(left), value_of(right)
+            if n.op == '+':
+                value = a + b
+            elif n.op == '-':
+                value = a - b
+            elif n.op == '*':
+                value = a * b
+            elif b == 0:
+                # La división por cero se reporta al ejecutar
+                return n, dtype
+            else:
+                value = idiv(a, b) if dtype is int_type else a / b
+            if not fits(value, dtype):
+                return n, dtype
+            self.stats.folded += 1
+            return literal(value, dtype), dtype
+
+        if ((n.op in ('*', '/') and is_value(right, 1)) or (n.op == '-' and is_value(right, 0))
+                or (n.op == '+' and dtype is int_type and is_value(right, 0))):
+            self.stats.simplified += 1
+            return left, dtype
+        if ((n.op == '*' and is_value(left, 1))
+                or (n.op == '+' and dtype is int_type and is_value(left, 0))):
+            self.stats.simplified += 1
+            return right, dtype
+        return n, dtype
+
+    def visit(self, n: Logical):
+        left, ltype = self.visit(n.left)
+        right, rtype = self.visit(n.right)
+        n.left, n.right = left, right
+        return n, check_binary_code(opcodes[n.op], ltype, rtype)
+
+    def visit(self, n: Unary):
+        fact, ftype = self.visit(n.fact)
+        n.fact = fact
+        dtype = check_unary_code(opcodes[n.op], ftype)
+        if dtype is None:
+            return n, None
+        if n.op == '+':
+            self.stats.simplified += 1
+            return fact, dtype
+        if n.op == '-' and isinstance(fact, (Integer, Float)) and fits(-value_of(fact), dtype):
+            self.stats.folded += 1
+            return literal(-value_of(fact), dtype), dtype
+        if isinstance(fact, Unary) and fact.op == n.op:
+            # -(-x) y not not r
+            self.stats.simplified += 1
+            return fact.fact, dtype
+        return n, dtype
+
+
+# ---------------------------------------------------------------------
+#  Código muerto
+# ---------------------------------------------------------------------
+@dataclass(slots=True)
+class EliminationStats:
+    nodes_before: int = 0
+    nodes_after: int = 0
+    unreachable: int = 0        # instrucciones después de return/break
+    branches: int = 0           # if con condición constante
+    loops: int = 0              # while que nunca se ejecutan
+    variables: int = 0          # variables locales sin usar
+
+    def __str__(self):
+        removed = self.nodes_before - self.nodes_after
+        percent = removed / self.nodes_before * 100 if self.nodes_before else 0
+        return (f'{self.nodes_before} -> {self.nodes_after} nodes ({percent:.1f}% fewer), '
+                f'{self.unreachable} unreachable, {self.branches} branches, '
+                f'{self.loops} loops, {self.variables} variables')
+
+
+comparisons = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+}
+
+
+def truth(n):
+    '''
+    Valor de la condición n si se conoce sin ejecutarla, o None.
+    '''
+    if isinstance(n, Logical):
+        if n.op in comparisons:
+            if (isinstance(n.left, (Integer, Float)) and type(n.left) is type(n.right)):
+                return comparisons[n.op](value_of(n.left), value_of(n.right))
+            return None
+        left = truth(n.left)
+        if left is None:
+            return None
+        if (n.op == 'and' and not left) or (n.op == 'or' and left):
+            return left
+        return truth(n.right)
+    if isinstance(n, Unary) and n.op == 'not':
+        fact = truth(n.fact)
+        return None if fact is None else not fact
+    return None
+
+
+def harmless(n):
+    '''
+    True si evaluar la expresión n solo da un valor: literales,
+    variables, +, - y *. Una llamada puede escribir, leer o no
+    terminar, y una división o un elemento de array pueden fallar.
+    '''
+    if isinstance(n, (Integer, Float, SimpleLocation)):
+        return True
+    if isinstance(n, Unary) and n.op in ('+', '-'):
+        return harmless(n.fact)
+    if isinstance(n, Binary) and n.op in ('+', '-', '*'):
+        return harmless(n.left) and harmless(n.right)
+    return False
+
+
+class DeadCodeEliminator(Visitor):
+    '''
+    visit() de una instrucción devuelve (instrucción que la reemplaza o
+    None para quitarla, si la ejecución puede seguir después de ella).
+    '''
+    def __init__(self):
+        self.stats = EliminationStats()
+        self.loops = []         # por cada while abierto: si tiene un break alcanzable
+        self.used = set()       # id de las declaraciones nombradas
+        self.unbound = set()    # nombres que el Resolver no pudo enlazar
+
+    @classmethod
+    def eliminate(cls, node):
+        eliminator = cls()
+        eliminator.stats.nodes_before = count_nodes(node)
+        eliminator.visit(node)
+        # Las referencias se cuentan sobre lo que quedó
+        eliminator.references(node)
+        eliminator.remove_variables(node)
+        eliminator.stats.nodes_after = count_nodes(node)
+        return eliminator.stats
+
+    def statement(self, n):
+        # Instrucción que no puede quedar vacía (cuerpo de un while, rama de un if)
+        stmt, falls = self.visit(n)
+        return (stmt if stmt is not None else Skip()), falls
+
+    def visit(self, n: Program):
+        for func in n.funclist:
+            self.visit(func)
+
+    def visit(self, n: FunDefinition):
+        for var in n.varlist.varlist if n.varlist else []:
+            if isinstance(var, FunDefinition):
+                self.visit(var)
+        loops, self.loops = self.loops, []
+        n.stmtlist, _ = self.statement(n.stmtlist)
+        self.loops = loops
+
+    def visit(self, n: StmtList):
+        stmts = []
+        falls = True
+        for i, stmt in enumerate(n.stmtlist):
+            new, falls = self.visit(stmt)
+            if isinstance(new, StmtList) and new is not stmt:
+                stmts.extend(new.stmtlist)
+            elif new is not None:
+                stmts.append(new)
+            if not falls:
+                self.stats.unreachable += len(n.stmtlist) - i - 1
+                break
+        n.stmtlist = stmts
+        return n, falls
+
+    def visit(self, n: IfStmt):
+        value = truth(n.relation)
+        if value is not None:
+            self.stats.branches += 1
+            if value:
+                return self.visit(n.thenstmt)
+            if n.elsestmt:
+                return self.visit(n.elsestmt)
+            return None, True
+        n.thenstmt, then_falls = self.statement(n.thenstmt)
+        if n.elsestmt:
+            n.elsestmt, else_falls = self.statement(n.elsestmt)
+            return n, then_falls or else_falls
+        return n, True
+
+    def visit(self, n: While):
+        value = truth(n.relation)
+        if value is False:
+            self.stats.loops += 1
+            return None, True
+        self.loops.append(False)
+        n.stmt, _ = self.statement(n.stmt)
+        breaks = self.loops.pop()
+        # while con condición siempre verdadera: solo sale con break
+        return n, breaks or value is None
+
+    def visit(self, n: Break):
+        if self.loops:
+            self.loops[-1] = True
+        return n, False
+
+    def visit(self, n: Return):
+        return n, False
+
+    def visit(self, n: Node):
+        # Assign, Read, Write, Print, Skip y llamadas usadas como instrucción
+        return n, True
+
+    # Variables sin usar -----------------------------------------------
+    def references(self, ast):
+        stack = [ast]
+        while stack:
+            n = stack.pop()
+            if isinstance(n, list):
+                stack.extend(n)
+            elif isinstance(n, Node) and not isinstance(n, SimpleType):
+                if isinstance(n, (SimpleLocation, ArrayLocation, FuncCall)):
+                    if n.binding:
+                        self.used.add(id(n.binding.decl))
+                    else:
+                        self.unbound.add(n.name)
+                stack.extend(children(n))
+
+    def remove_variables(self, ast):
+        funcs = list(ast.funclist) if isinstance(ast, Program) else [ast]
+        while funcs:
+            func = funcs.pop()
+            if not func.varlist:
+                continue
+            varlist = []
+            for var in func.varlist.varlist:
+                if isinstance(var, FunDefinition):
+                    funcs.append(var)
+                # Un nombre sin enlazar puede ser un uso inválido de la
+                # variable (n[i] con n entera): se conserva para que el
+                # error siga siendo el mismo
+                if (isinstance(var, VarDefinition) and id(var) not in self.used
+                        and var.name not in self.unbound
+                        and not (isinstance(var.datatype, ArrayType) and not harmless(var.datatype.dim))):
+                    self.stats.variables += 1
+                else:
+                    varlist.append(var)
+            func.varlist.varlist = varlist
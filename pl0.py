@@ -1,11 +1,11 @@
 # pl0.py
 '''
-usage: pl0.py [-h] [-d] [-o OUT] [-l] [-D] [-p] [-I] [--sym] [-S] [-R] input
+usage: pl0.py [-h] [-d] [-o OUT] [-l] [-D] [-p] [-I] [--sym] [-S] [-R] [-B] [-W] [-j JOBS] [--vm | --ssa] [-M] [--memo-size MEMO_SIZE] [--no-bounds-check] [-O] [--scanner {sly,fast}] [--no-cache] [--clear-cache] [--cache-stats] input [input ...]
 
 Compiler for PL0
 
 positional arguments:
-  input              PL0 program file to compile
+  input              PL0 program file to compile (with -B: files, directories or globs)
 
 optional arguments:
   -h, --help         show this help message and exit
@@ -18,14 +18,31 @@ optional arguments:
   --sym              Dump the symbol table
   -S, --asm          Store the generated assembly file
   -R, --exec         Execute the generated program
+  -B, --batch        Check many files in parallel, with per-file and total timing
+  -W, --watch        Re-check the file incrementally every time it changes
+  -j JOBS, --jobs JOBS
+                     Worker processes for -B (default: all cores)
+  --vm               Execute with the bytecode VM instead of the interpreter (with -R)
+  --ssa              Execute the SSA IR after its optimization passes (with -R; tail calls and
+                     inlining only apply here)
+  -M, --memo         Memoize pure functions and print cache hits and misses (with -R)
+  --memo-size MEMO_SIZE
+                     Results kept per memoized function (LRU, default 1024)
+  --no-bounds-check  Do not reject negative array indices (with -R, faster)
+  -O, --optimize     Fold constants and remove dead code before -R, -I, -S or -o
+  --scanner {sly,fast}
+                     Lexical analyzer: SLY regex lexer or hand-written scanner
+  --no-cache         Do not read or write the on-disk AST cache
+  --clear-cache      Remove every entry of the AST cache
+  --cache-stats      Print cache hits, misses and size when done
 '''
 from contextlib import redirect_stdout
-from rich       import print
-from plex       import print_lexer
-from pparser    import Parser
+from plex       import print_lexer, scanners
 from context    import Context
+from cache      import ASTCache
 
 import argparse
+import sys
 
 
 def parse_args():
@@ -43,8 +60,8 @@ def parse_args():
   fgroup.add_argument(
     'input',
     type=str,
-    nargs='?',
-    help='PL0 program file to compile')
+    nargs='*',
+    help='PL0 program file to compile (with -B: files, directories or globs)')
 
   mutex = fgroup.add_mutually_exclusive_group()
 
@@ -65,20 +82,127 @@ def parse_args():
     action='store_true',
     help='Generate AST graph as png format')
 
+  mutex.add_argument(
+    '-I', '--ir',
+    action='store_true',
+    help='Dump the generated Intermediate representation')
+
   mutex.add_argument(
     '--sym',
     action='store_true',
     help='Dump the symbol table')
 
+  mutex.add_argument(
+    '-S', '--asm',
+    action='store_true',
+    help='Store the generated assembly file')
+
+  mutex.add_argument(
+    '-R', '--exec',
+    action='store_true',
+    help='Execute the generated program')
+
+  mutex.add_argument(
+    '-B', '--batch',
+    action='store_true',
+    help='Check many files in parallel, with per-file and total timing')
+
+  mutex.add_argument(
+    '-W', '--watch',
+    action='store_true',
+    help='Re-check the file incrementally every time it changes')
+
+  fgroup.add_argument(
+    '-o', '--out',
+    type=str,
+    default=None,
+    help='File name to store generated executable')
+
+  fgroup.add_argument(
+    '-D', '--debug',
+    action='store_true',
+    help='Generate assembly with extra information (for debugging purposes)')
+
+  fgroup.add_argument(
+    '-j', '--jobs',
+    type=int,
+    default=None,
+    help='Worker processes for -B (default: all cores)')
+
+  engine = fgroup.add_mutually_exclusive_group()
+
+  engine.add_argument(
+    '--vm',
+    action='store_true',
+    help='Execute with the bytecode VM instead of the interpreter (with -R)')
+
+  engine.add_argument(
+    '--ssa',
+    action='store_true',
+    help='Execute the SSA IR after its optimization passes (with -R; tail calls and inlining only apply here)')
+
+  fgroup.add_argument(
+    '-M', '--memo',
+    action='store_true',
+    help='Memoize pure functions and print cache hits and misses (with -R)')
+
+  fgroup.add_argument(
+    '--memo-size',
+    type=int,
+    default=1024,
+    help='Results kept per memoized function (LRU, default 1024)')
+
+  fgroup.add_argument(
+    '--no-bounds-check',
+    action='store_true',
+    help='Do not reject negative array indices (with -R, faster)')
+
+  fgroup.add_argument(
+    '-O', '--optimize',
+    action='store_true',
+    help='Fold constants and remove dead code before -R, -I, -S or -o')
+
+  fgroup.add_argument(
+    '--scanner',
+    choices=sorted(scanners),
+    default='sly',
+    help='Lexical analyzer: SLY regex lexer or hand-written scanner')
+
+  fgroup.add_argument(
+    '--no-cache',
+    action='store_true',
+    help='Do not read or write the on-disk AST cache')
+
+  fgroup.add_argument(
+    '--clear-cache',
+    action='store_true',
+    help='Remove every entry of the AST cache')
+
+  fgroup.add_argument(
+    '--cache-stats',
+    action='store_true',
+    help='Print cache hits, misses and size when done')
+
   return cli.parse_args()
 
 
 if __name__ == '__main__':
 
   args = parse_args()
-  context = Context()
 
-  if args.input: fname = args.input
+  if args.clear_cache:
+    ASTCache().clear()
+    if not args.input:
+      sys.exit(0)
+
+  if args.batch:
+    from batch import run_batch
+    sys.exit(1 if run_batch(args.input, args.jobs, args.scanner, cache=not args.no_cache) else 0)
+
+  cache = None if args.no_cache else ASTCache()
+  context = Context(scanner=args.scanner, cache=cache)
+
+  if args.input: fname = args.input[0]
 
   with open(fname, encoding='utf-8') as file:
     source = file.read()
@@ -92,6 +216,9 @@ if __name__ == '__main__':
         print_lexer(source)
 
   elif args.dot or args.png:
+    # rich solo se carga para las salidas que lo usan
+    from rich    import print
+    from pparser import Parser
     ast, dot = Parser(source)
     base = fname.split('.')[0]
 
@@ -106,9 +233,52 @@ if __name__ == '__main__':
       ...
 
     else:
-      context.parse(source)
+      context.analyze(source, check=True)
       context.run()
 
+  elif args.ir:
+    context.analyze(source, check=True)
+    if args.optimize:
+      context.optimize()
+    module = context.ircode()
+    if module:
+      fir = fname.split('.')[0] + '.ir'
+      print(f'print ir: {fir}')
+      with open(fir, 'w', encoding='utf-8') as f:
+        f.write(module.dump() + '\n')
+
+  elif args.asm or args.out:
+    context.analyze(source, check=True)
+    if args.optimize:
+      context.optimize()
+    assembly = context.assembly(args.debug)
+    if assembly is None:
+      sys.exit(1)
+    print(context.bounds)
+    if args.asm:
+      fasm = fname.split('.')[0] + '.s'
+      print(f'print asm: {fasm}')
+      with open(fasm, 'w', encoding='utf-8') as f:
+        f.write(assembly)
+    if args.out:
+      print(f'print executable: {args.out}')
+      if not context.executable(args.out, assembly):
+        sys.exit(1)
+
+  elif args.watch:
+    from incremental import watch
+    watch(fname, args.scanner)
+
+  elif args.exec:
+    context.analyze(source, check=True)
+    if args.optimize:
+      context.optimize()
+    context.interp.memo = args.memo_size if args.memo else 0
+    context.interp.bounds_check = not args.no_bounds_check
+    context.run(vm=args.vm, ssa=args.ssa)
+    for memo in context.interp.caches:
+      print(f'memo {memo}', file=sys.stderr)
+
   else:
 
     try:
@@ -124,3 +294,10 @@ if __name__ == '__main__':
     except EOFError:
       pass
 
+
+  if args.cache_stats and cache is not None:
+    print(cache.stats())
+
+  # -S y -o ya terminaron con 1 si hubo errores
+  if (args.exec or args.ir) and context.have_errors:
+    sys.exit(1)
@@ -0,0 +1,232 @@
+/* pl0rt.c
+
+   Runtime de los ejecutables que genera asmcode.py: entrada/salida,
+   arrays y errores. Se compila y se enlaza junto con el assembly
+   generado (ver asmcode.assemble).
+
+   La salida imita a interp.py: write escribe los flotantes como
+   repr() de Python y read acepta lo mismo que int()/float() sobre la
+   línea sin espacios. Los errores se escriben en stderr como
+   "línea: mensaje" y terminan el programa con código 1.
+*/
+#include <ctype.h>
+#include <errno.h>
+#include <math.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+extern void pl0_main(void);
+
+void pl0_error(const char *message, long line)
+{
+    fflush(stdout);
+    if (line)
+        fprintf(stderr, "%ld: %s\n", line, message);
+    else
+        fprintf(stderr, "%s\n", message);
+    exit(1);
+}
+
+/* Salida --------------------------------------------------------------- */
+void pl0_print(const char *s)
+{
+    fputs(s, stdout);
+}
+
+void pl0_write_int(long value)
+{
+    printf("%ld", value);
+}
+
+void pl0_write_bool(long value)
+{
+    fputs(value ? "True" : "False", stdout);
+}
+
+/* El repr() de Python: los menos dígitos que vuelven a dar el mismo
+   double, en notación fija si el exponente está en [-4, 16) */
+static void format_float(double value, char *out)
+{
+    char buf[40], digits[20];
+    int precision, ndigits = 0, exp, i;
+    const char *s;
+
+    if (isnan(value)) {
+        strcpy(out, "nan");
+        return;
+    }
+    if (isinf(value)) {
+        strcpy(out, value < 0 ? "-inf" : "inf");
+        return;
+    }
+    for (precision = 1; precision < 17; precision++) {
+        snprintf(buf, sizeof buf, "%.*e", precision - 1, value);
+        if (strtod(buf, NULL) == value)
+            break;
+    }
+    if (precision == 17)
+        snprintf(buf, sizeof buf, "%.16e", value);
+
+    s = buf;
+    if (*s == '-')
+        *out++ = *s++;
+    for (; *s != 'e'; s++)
+        if (isdigit((unsigned char) *s))
+            digits[ndigits++] = *s;
+    exp = atoi(s + 1);
+    while (ndigits > 1 && digits[ndigits - 1] == '0')
+        ndigits--;
+
+    if (exp >= 16 || exp < -4) {
+        *out++ = digits[0];
+        if (ndigits > 1) {
+            *out++ = '.';
+            for (i = 1; i < ndigits; i++)
+                *out++ = digits[i];
+        }
+        sprintf(out, "e%c%02d", exp < 0 ? '-' : '+', abs(exp));
+        return;
+    }
+    if (exp >= 0) {
+        for (i = 0; i <= exp; i++)
+            *out++ = i < ndigits ? digits[i] : '0';
+        *out++ = '.';
+        if (ndigits > exp + 1)
+            for (i = exp + 1; i < ndigits; i++)
+                *out++ = digits[i];
+        else
+            *out++ = '0';
+    } else {
+        *out++ = '0';
+        *out++ = '.';
+        for (i = 0; i < -exp - 1; i++)
+            *out++ = '0';
+        for (i = 0; i < ndigits; i++)
+            *out++ = digits[i];
+    }
+    *out = '\0';
+}
+
+void pl0_write_float(double value)
+{
+    char buf[64];
+    format_float(value, buf);
+    fputs(buf, stdout);
+}
+
+/* Entrada -------------------------------------------------------------- */
+static char *read_line(void)
+{
+    static char *line = NULL;
+    static size_t size = 0;
+    char *start, *end;
+
+    if (getline(&line, &size, stdin) < 0) {
+        if (!line)
+            line = calloc(1, 1);
+        line[0] = '\0';
+    }
+    for (start = line; isspace((unsigned char) *start); start++)
+        ;
+    end = start + strlen(start);
+    while (end > start && isspace((unsigned char) end[-1]))
+        end--;
+    *end = '\0';
+    return start;
+}
+
+static void invalid_input(const char *text, const char *name, long line)
+{
+    /* Con las comillas que elegiría repr() */
+    char quote = strchr(text, '\'') && !strchr(text, '"') ? '"' : '\'';
+    size_t size = 4 * strlen(text) + strlen(name) + 32;
+    char *message = malloc(size), *out = message;
+
+    out += sprintf(out, "Invalid input %c", quote);
+    for (; *text; text++) {
+        if (*text == '\\' || *text == quote)
+            *out++ = '\\';
+        *out++ = *text;
+    }
+    sprintf(out, "%c for %s", quote, name);
+    pl0_error(message, line);
+}
+
+long pl0_read_int(const char *name, long line)
+{
+    char *text = read_line(), *end;
+    long value;
+
+    errno = 0;
+    value = strtol(text, &end, 10);
+    if (!*text || *end || errno)
+        invalid_input(text, name, line);
+    return value;
+}
+
+double pl0_read_float(const char *name, long line)
+{
+    char *text = read_line(), *end;
+    double value;
+
+    /* strtod acepta hexadecimales, float() no */
+    if (strpbrk(text, "xX"))
+        invalid_input(text, name, line);
+    value = strtod(text, &end);
+    if (!*text || *end)
+        invalid_input(text, name, line);
+    return value;
+}
+
+/* Arrays: la longitud va en la primera palabra y los elementos después */
+long *pl0_array_new(long length)
+{
+    long *array;
+
+    if (length < 0)
+        length = 0;
+    array = calloc(length + 1, sizeof(long));
+    if (!array)
+        pl0_error("Out of memory", 0);
+    array[0] = length;
+    return array;
+}
+
+void pl0_array_free(long *array)
+{
+    free(array);
+}
+
+/* La recursión sin fin termina en un SIGSEGV al pasarse de la pila: se
+   atiende en una pila aparte y se informa como el intérprete */
+static void stack_overflow(int sig)
+{
+    static const char message[] = "Stack overflow\n";
+    ssize_t written;
+
+    (void) sig;
+    fflush(stdout);
+    written = write(2, message, sizeof message - 1);
+    (void) written;
+    _exit(1);
+}
+
+int main(void)
+{
+    static char altstack[1 << 16];
+    stack_t stack = { .ss_sp = altstack, .ss_size = sizeof altstack };
+    struct sigaction action;
+
+    sigaltstack(&stack, NULL);
+    memset(&action, 0, sizeof action);
+    action.sa_handler = stack_overflow;
+    action.sa_flags = SA_ONSTACK;
+    sigaction(SIGSEGV, &action, NULL);
+
+    pl0_main();
+    fflush(stdout);
+    return 0;
+}
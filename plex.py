@@ -4,9 +4,10 @@ plex.py
 Analizador Lexico para el lenguaje PL0
 '''
 import sly
-from prettytable import PrettyTable
+from sly.lex import Token
+from errors import Reporter
 
-class Lexer(sly.Lexer):
+class Lexer(sly.Lexer, Reporter):
     tokens = {
         # Palabras Reservadas
         FUN, BEGIN, END, SKIP, BREAK, WHILE, DO,
@@ -39,7 +40,6 @@ class Lexer(sly.Lexer):
     # expresiones regulares
     @_(r'"([^"\n\\]*(\\.?[^"\n\\]*)*)"([ ]*("([^"\n\\]*(\\.?[^"\n\\]*)*)")*)*')
     def STRING(self, t):
-        print(t.value)
         t.value = t.value.replace('\\"', '&escquote&')
 
         if t.value[-1] != '"':
@@ -141,22 +141,288 @@ class Lexer(sly.Lexer):
         self.lineno += t.value.count('\n')
         self.error(t, error_type=2)
 
+
+    def __init__(self, quiet=False):
+        # quiet: no imprime los errores, solo los guarda en diagnostics
+        self.stage = 'lexer'
+        self.quiet = quiet
+        self.diagnostics = []
+
     def error(self, t, error_type=0, extra_info=None):
         if error_type == 0:
-            print(f'\033[91mERROR: Illegal character "{t.value[0]}" in line: {t.lineno}\033[0m')
+            message = f'Illegal character "{t.value[0]}" in line: {t.lineno}'
             self.index += 1
         elif error_type == 1:
-            print(f'\033[91mERROR: Leading zeros not supported in {extra_info} {t.value}, line: {t.lineno}\033[0m')
+            message = f'Leading zeros not supported in {extra_info} {t.value}, line: {t.lineno}'
         elif error_type == 2:
-            print(f'\033[91mERROR: Unclosed comment at line: {t.lineno}\033[0m')
+            message = f'Unclosed comment at line: {t.lineno}'
         elif error_type == 3:
-            print(f'\033[91mERROR: {t.value} is not a valid name, line {t.lineno}\033[0m')
+            message = f'{t.value} is not a valid name, line {t.lineno}'
         elif error_type == 4:
-            print(f'\033[91mERROR: Unclosed string at line {t.lineno}\033[0m')
+            message = f'Unclosed string at line {t.lineno}'
         elif error_type == 5:
-            print(f'\033[91mERROR: {extra_info} is not a valid escape character in line {t.lineno}\033[0m')
+            message = f'{extra_info} is not a valid escape character in line {t.lineno}'
         elif error_type == 6:
-            print(f'\033[91mERROR: {t.value} must have integer part in line {t.lineno}. Did you mean 0{t.value}?\033[0m')
+            message = f'{t.value} must have integer part in line {t.lineno}. Did you mean 0{t.value}?'
+        self.report(message, t.lineno, error_type)
+
+# ---------------------------------------------------------------------
+#  Scanner escrito a mano
+# ---------------------------------------------------------------------
+# Clases de caracteres (tabla indexada por ord(c) para ASCII)
+(C_OTHER, C_IGNORE, C_NEWLINE, C_QUOTE, C_DIGIT, C_DOT, C_ALPHA,
+ C_LT, C_GT, C_EQ, C_BANG, C_COLON, C_SLASH, C_LITERAL) = range(14)
+
+_charclass = [C_OTHER] * 128
+for _c in Lexer.literals:
+    _charclass[ord(_c)] = C_LITERAL
+for _c in Lexer.ignore:
+    _charclass[ord(_c)] = C_IGNORE
+for _c in '0123456789':
+    _charclass[ord(_c)] = C_DIGIT
+for _c in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_':
+    _charclass[ord(_c)] = C_ALPHA
+for _c, _k in [('\n', C_NEWLINE), ('"', C_QUOTE), ('.', C_DOT), ('<', C_LT), ('>', C_GT),
+               ('=', C_EQ), ('!', C_BANG), (':', C_COLON), ('/', C_SLASH)]:
+    _charclass[ord(_c)] = _k
+
+# Caracteres de \w en ASCII; fuera de ASCII se usa str.isalnum (igual que re)
+_word = frozenset(chr(_i) for _i in range(128) if chr(_i).isalnum() or chr(_i) == '_')
+
+
+def _isdigit(c):
+    # \d de re: cualquier dígito decimal Unicode
+    return c.isdecimal()
+
+
+def _scan_word(text, end, n):
+    # Fin de la secuencia de caracteres \w que empieza en end
+    word = _word
+    while end < n:
+        c = text[end]
+        if c in word or (c >= '\x80' and c.isalnum()):
+            end += 1
+        else:
+            break
+    return end
+
+
+class Scanner(Reporter):
+    '''
+    Alternativa a Lexer que recorre el texto una sola vez, decidiendo
+    por la clase del primer caracter de cada token, sin expresiones
+    regulares. Produce exactamente los mismos tokens (tipo, valor,
+    lineno, index, end) y los mismos errores 0-6 que Lexer; las
+    acciones de los tokens (STRING, FCONST, ID, ICONST) y error() son
+    las de Lexer.
+
+    Las reglas STRING y BAD_COMMENT de Lexer dependen del orden de
+    backtracking de re en algunos casos límite (strings sin cerrar con
+    \\", comentarios sin cerrar que terminan en '*'); el scanner
+    reproduce ese resultado directamente en tiempo lineal.
+    '''
+    tokens = Lexer.tokens
+    literals = Lexer.literals
+    keywords = Lexer.keywords
+
+    STRING = Lexer.STRING
+    FCONST = Lexer.FCONST
+    ID = Lexer.ID
+    ICONST = Lexer.ICONST
+    error = Lexer.error
+
+    def __init__(self, quiet=False):
+        self.stage = 'lexer'
+        self.quiet = quiet
+        self.diagnostics = []
+
+    @staticmethod
+    def string_body(text, i):
+        '''
+        Recorre el cuerpo de un string que empieza en i (después de la
+        comilla). Retorna (fin, cierre): fin es donde se detiene el
+        recorrido greedy y cierre la posición de la comilla que cierra
+        el string según la regla STRING (o None si no cierra).
+        '''
+        n = len(text)
+        escaped = None
+        while i < n:
+            c = text[i]
+            if c == '"':
+                return i, i
+            if c == '\n':
+                break
+            if c == '\\' and i + 1 < n and text[i + 1] != '\n':
+                if text[i + 1] == '"':
+                    escaped = i + 1
+                i += 2
+            else:
+                i += 1
+        # Sin comilla de cierre: re retrocede hasta la última \" y la
+        # toma como cierre
+        return i, escaped
+
+    def scan_string(self, text, i):
+        # Retorna (tipo, fin) del token que empieza con '"' en i
+        end, close = self.string_body(text, i + 1)
+        if close is None:
+            return 'UNCLOSED_STRING', end
+        i = close + 1
+        n = len(text)
+        # Cola: espacios y strings adyacentes ("a" "b" -> "ab")
+        while True:
+            start = i
+            while i < n and text[i] == ' ':
+                i += 1
+            while i < n and text[i] == '"':
+                _, close = self.string_body(text, i + 1)
+                if close is None:
+                    break
+                i = close + 1
+            if i == start:
+                return 'STRING', i
+
+    @staticmethod
+    def scan_number(text, i):
+        # Retorna (tipo, fin) para un token que empieza con un dígito o '.'
+        n = len(text)
+        j = i
+        while j < n and _isdigit(text[j]):
+            j += 1
+        if j + 1 < n and text[j] == '.' and _isdigit(text[j + 1]):
+            k = j + 1
+            while k < n and _isdigit(text[k]):
+                k += 1
+            return 'FCONST', Scanner.scan_exponent(text, k)
+        if j == i:
+            return None, i
+        if j < n and text[j] == 'e' and '0' <= text[i] <= '9':
+            k = Scanner.scan_exponent(text, j)
+            if k != j:
+                return 'FCONST', k
+        if j < n and text[j] < '\x80' and _charclass[ord(text[j])] == C_ALPHA:
+            return 'ID', _scan_word(text, j + 1, n)
+        return 'ICONST', j
+
+    @staticmethod
+    def scan_exponent(text, k):
+        # e(-|\+)?\d+ opcional a partir de k
+        n = len(text)
+        if k < n and text[k] == 'e':
+            m = k + 1
+            if m < n and text[m] in '+-':
+                m += 1
+            if m < n and _isdigit(text[m]):
+                while m < n and _isdigit(text[m]):
+                    m += 1
+                return m
+        return k
+
+    def tokenize(self, text, lineno=1, index=0):
+        actions = {'STRING': self.STRING, 'FCONST': self.FCONST,
+                   'ID': self.ID, 'ICONST': self.ICONST}
+        charclass = _charclass
+        keywords = self.keywords
+        n = len(text)
+        self.text = text
+        try:
+            while index < n:
+                c = text[index]
+                kind = charclass[ord(c)] if c < '\x80' else (C_DIGIT if c.isdecimal() else C_OTHER)
+
+                if kind == C_IGNORE:
+                    index += 1
+                    continue
+                if kind == C_NEWLINE:
+                    end = index + 1
+                    while end < n and text[end] == '\n':
+                        end += 1
+                    lineno += end - index
+                    index = end
+                    continue
+
+                if kind == C_ALPHA:
+                    # Camino rápido: identificadores y palabras reservadas
+                    # (la acción ID solo reporta los que empiezan con dígito)
+                    end = _scan_word(text, index + 1, n)
+                    tok = Token()
+                    tok.value = value = text[index:end]
+                    tok.type = value.upper() if value in keywords else 'ID'
+                    tok.lineno = lineno
+                    tok.index = index
+                    tok.end = index = end
+                    yield tok
+                    continue
+
+                toktype = None
+                end = index + 1
+                if kind == C_DIGIT or kind == C_DOT:
+                    toktype, end = self.scan_number(text, index)
+                elif kind == C_QUOTE:
+                    toktype, end = self.scan_string(text, index)
+                elif kind == C_LT or kind == C_GT:
+                    if end < n and text[end] == '=':
+                        toktype, end = ('LE' if kind == C_LT else 'GE'), end + 1
+                    else:
+                        toktype = 'LT' if kind == C_LT else 'GT'
+                elif kind == C_EQ or kind == C_BANG or kind == C_COLON:
+                    if end < n and text[end] == '=':
+                        toktype, end = ('ET', 'DF', 'ASSIGNOP')[kind - C_EQ], end + 1
+                elif kind == C_SLASH and end < n and text[end] == '*':
+                    close = text.find('*/', index + 2)
+                    if close >= 0:
+                        toktype, end = 'COMMENT', close + 2
+                    elif n == index + 2 or text[-1] != '*':
+                        # BAD_COMMENT solo coincide si llega hasta el final
+                        toktype, end = 'BAD_COMMENT', n
+
+                tok = Token()
+                tok.lineno = lineno
+                tok.index = index
+                if toktype is not None:
+                    tok.type = toktype
+                    tok.value = text[index:end]
+                    tok.end = index = end
+                    if toktype in actions:
+                        self.index = index
+                        self.lineno = lineno
+                        tok = actions[toktype](tok)
+                        index = self.index
+                        lineno = self.lineno
+                        if not tok:
+                            continue
+                        yield tok
+                    elif toktype == 'COMMENT' or toktype == 'BAD_COMMENT':
+                        lineno += tok.value.count('\n')
+                        if toktype == 'BAD_COMMENT':
+                            self.lineno = lineno
+                            self.error(tok, error_type=2)
+                    elif toktype == 'UNCLOSED_STRING':
+                        self.error(tok, error_type=4)
+                    else:
+                        yield tok
+
+                elif c in Lexer.literals:
+                    tok.type = tok.value = c
+                    tok.end = index = index + 1
+                    yield tok
+
+                else:
+                    self.index = index
+                    self.lineno = lineno
+                    tok.type = 'ERROR'
+                    tok.value = text[index:]
+                    self.error(tok)
+                    index = self.index
+                    lineno = self.lineno
+        finally:
+            self.index = index
+            self.lineno = lineno
+
+
+# Scanners disponibles (opción --scanner de pl0.py)
+scanners = {'sly': Lexer, 'fast': Scanner}
+
 
 def print_lexer(source):
     with open(source, encoding='utf-8') as file:
@@ -176,6 +442,7 @@ def main(argv):
         print(f"Usage: python {argv[0]} filename")
         exit(1)
 
+    from prettytable import PrettyTable
     lex = Lexer()
     txt = open('test1/' + argv[1]).read()
     tokens_table = PrettyTable()
@@ -2,18 +2,122 @@
 parser.py
 
 Analizador Sintáctico para el lenguaje PL0
+
+Las tablas LALR se guardan en disco (ver CachedParser) y solo se
+regeneran cuando cambian las reglas, la precedencia o los tokens.
+El volcado de depuración (pl0.txt) es opcional: se escribe solo si
+la variable de entorno PL0_DEBUGFILE indica un nombre de archivo.
 '''
+import hashlib
+import os
+import pickle
 import sly
-from rich import print
 from plex import Lexer
+from errors import Reporter
 from model import *
-
-class Parser(sly.Parser):
-    debugfile = 'pl0.txt'
+from typesys import int_type, float_type, lookup_type
+
+# Directorio donde se guardan las tablas del parser
+cachedir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pl0cache')
+
+
+class LRTables:
+    '''
+    Versión mínima de sly.yacc.LRTable con lo único que usa
+    Parser.parse(): acciones, gotos y estados por defecto.
+    '''
+    def __init__(self, lr_action, lr_goto, defaulted_states):
+        self.lr_action = lr_action
+        self.lr_goto = lr_goto
+        self.defaulted_states = defaulted_states
+
+
+class CachedParser(sly.Parser):
+    '''
+    Parser de SLY que carga las tablas LALR desde disco.
+
+    La gramática (producciones) se construye siempre porque es barata
+    y contiene las funciones de cada regla; lo costoso es el autómata
+    LALR, que se guarda en cachedir con una firma de la gramática.
+    '''
+    tablefile = 'parsetab.pickle'
+
+    @classmethod
+    def grammar_signature(cls, rules):
+        # Firma de todo lo que afecta las tablas: tokens, precedencia
+        # y reglas (en orden de definición), más la versión de SLY
+        h = hashlib.sha256()
+        h.update(sly.__version__.encode())
+        h.update(repr(sorted(cls.tokens)).encode())
+        h.update(repr(getattr(cls, 'precedence', ())).encode())
+        h.update(repr(getattr(cls, 'start', None)).encode())
+        for name, func in rules:
+            h.update(repr((name, func.rules)).encode())
+        return h.hexdigest()
+
+    @classmethod
+    def load_tables(cls, signature):
+        try:
+            with open(os.path.join(cachedir, cls.tablefile), 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if data.get('signature') != signature:
+            return None
+        return LRTables(data['action'], data['goto'], data['defaulted'])
+
+    @classmethod
+    def save_tables(cls, signature):
+        data = {
+            'signature': signature,
+            'action': cls._lrtable.lr_action,
+            'goto': cls._lrtable.lr_goto,
+            'defaulted': cls._lrtable.defaulted_states,
+        }
+        try:
+            os.makedirs(cachedir, exist_ok=True)
+            tmp = os.path.join(cachedir, f'{cls.tablefile}.{os.getpid()}')
+            with open(tmp, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, os.path.join(cachedir, cls.tablefile))
+        except OSError:
+            # Sin permisos de escritura: la próxima vez se reconstruye
+            pass
+
+    @classmethod
+    def _build(cls, definitions):
+        if vars(cls).get('_build', False):
+            return
+
+        if cls.debugfile:
+            # El volcado necesita el LRTable completo de SLY
+            return super()._build(definitions)
+
+        rules = cls._Parser__collect_rules(definitions)
+        if not cls._Parser__validate_specification():
+            raise sly.yacc.YaccError('Invalid parser specification')
+        cls._Parser__build_grammar(rules)
+
+        signature = cls.grammar_signature(rules)
+        cls._lrtable = cls.load_tables(signature)
+        if cls._lrtable is None:
+            if not cls._Parser__build_lrtables():
+                raise sly.yacc.YaccError('Can\'t build parsing tables')
+            cls.save_tables(signature)
+
+
+class Parser(CachedParser, Reporter):
+    debugfile = os.environ.get('PL0_DEBUGFILE')
 
     tokens = Lexer.tokens
 
     errors=0
+
+    def __init__(self, quiet=False):
+        # quiet: no imprime los errores, solo los guarda en diagnostics
+        self.stage = 'parser'
+        self.quiet = quiet
+        self.diagnostics = []
         
     precedence = (
         ('left', IF,THEN),
@@ -63,7 +167,7 @@ class Parser(sly.Parser):
     
     @_('INT', 'FLOAT')
     def datatype(self, p):
-        return SimpleType(p[0])
+        return lookup_type(p[0])
 
     @_('local ";"')
     def locallist(self, p):
@@ -177,11 +281,11 @@ class Parser(sly.Parser):
 
     @_('ICONST')
     def expr(self, p):
-        return Integer(p[0],SimpleType('int'))
+        return Integer(p[0], int_type)
     
     @_('FCONST')
     def expr(self,p):
-        return Float(p[0],SimpleType('float'))
+        return Float(p[0], float_type)
 
     @_('ID')
     def expr(self, p):
@@ -227,7 +331,10 @@ class Parser(sly.Parser):
         return [p.expr]
 
     def error(self, p):
-        print(p)
+        if p:
+            self.report(f'Syntax error at {p.type} {p.value!r}, line {p.lineno}', p.lineno)
+        else:
+            self.report('Syntax error at end of input')
         self.errors+=1
         
     
@@ -0,0 +1,156 @@
+# purity.py
+'''
+Funciones puras
+===============
+Una FunDefinition es pura si su resultado depende solo de sus
+argumentos y llamarla no cambia nada que se vea desde afuera, así que
+dos llamadas con los mismos argumentos se pueden reemplazar por una.
+Eso se cumple si:
+
+* no tiene Read, Write ni Print;
+* no asigna elementos de arrays;
+* no lee ni asigna variables de otras funciones (binding.depth > 0),
+  que podrían cambiar entre una llamada y otra;
+* todos sus parámetros son int o float (un array se pasa por
+  referencia y puede cambiar);
+* no devuelve un array: memoizada, todas las llamadas recibirían el
+  mismo array y lo que una le escribe lo verían las demás;
+* solo llama a funciones puras.
+
+Solo se mira el código propio de cada función (cuerpo y tamaños de
+los arrays locales), sin entrar en las funciones anidadas: esas cuentan
+recién cuando se las llama. La última regla se resuelve con un punto
+fijo que parte de suponer puras todas las que cumplen las demás, así
+que una función recursiva como fib() es pura.
+
+purity(ast) necesita los enlaces del Resolver y devuelve, para cada
+función, None si es pura o el motivo por el que no lo es.
+
+MemoCache es el cache LRU acotado con el que el intérprete memoiza las
+funciones puras (Interpreter(memo=tamaño)); cuenta aciertos y fallos.
+
+usage: python purity.py file.pl0
+'''
+import sys
+from collections import OrderedDict
+
+from cfg import functions, own_nodes
+from model import *
+from typeinfo import return_types
+
+
+def impurity(func):
+    '''
+    (motivo o None sin contar las llamadas, FunDefinition llamadas)
+    '''
+    for parm in func.parmlist.parmlist if func.parmlist else []:
+        if isinstance(parm.datatype, ArrayType):
+            return f'array parameter {parm.name}', []
+    callees = []
+    for n in own_nodes(func):
+        if isinstance(n, Read):
+            return 'reads input', []
+        if isinstance(n, (Write, Print)):
+            return 'writes output', []
+        if isinstance(n, Assign) and isinstance(n.location, ArrayLocation):
+            return f'writes array {n.location.name}', []
+        if isinstance(n, (SimpleLocation, ArrayLocation)) and n.binding and n.binding.depth:
+            return f'uses {n.name} of an outer function', []
+        if isinstance(n, FuncCall) and n.binding:
+            callees.append(n.binding.decl)
+    return None, callees
+
+
+def purity(ast):
+    '''
+    {id(FunDefinition): None si es pura, o el motivo si no}
+    '''
+    funcs = functions(ast)
+    returns = return_types(funcs)
+    reasons, calls = {}, {}
+    for func in funcs:
+        reasons[id(func)], calls[id(func)] = impurity(func)
+        if reasons[id(func)] is None and isinstance(returns[id(func)], ArrayType):
+            reasons[id(func)] = 'returns an array'
+    changed = True
+    while changed:
+        changed = False
+        for func in funcs:
+            if reasons[id(func)] is None:
+                for callee in calls[id(func)]:
+                    if reasons.get(id(callee)) is not None:
+                        reasons[id(func)] = f'calls {callee.name}'
+                        changed = True
+                        break
+    return reasons
+
+
+def pure_functions(ast):
+    '''
+    ids de las FunDefinition puras de ast.
+    '''
+    return {f for f, reason in purity(ast).items() if reason is None}
+
+
+class MemoCache:
+    '''
+    Resultados de una función pura por tupla de argumentos, con a lo
+    sumo maxsize entradas: al llenarse se descarta la usada hace más
+    tiempo.
+    '''
+    __slots__ = ('name', 'maxsize', 'data', 'hits', 'misses')
+
+    MISSING = object()
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.data.get(key, self.MISSING)
+        if value is self.MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def __str__(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f'{self.name}: {self.hits} hits, {self.misses} misses ({rate:.1%}), '
+                f'{len(self.data)}/{self.maxsize} entries')
+
+
+def main(argv):
+    from context import Context
+    from resolve import Resolver
+
+    if len(argv) != 2:
+        raise SystemExit('usage: python purity.py file.pl0')
+    context = Context()
+    with open(argv[1], encoding='utf-8') as f:
+        context.parse(f.read())
+    if context.have_errors:
+        sys.exit(1)
+    errors = Resolver.resolve(context.ast)
+    for message, node in errors:
+        context.error(message, node)
+    if errors:
+        sys.exit(1)
+    reasons = purity(context.ast)
+    for func in functions(context.ast):
+        reason = reasons[id(func)]
+        print(f'{func.name:<16} {"pure" if reason is None else "impure: " + reason}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,210 @@
+# resolve.py
+'''
+Resolución de nombres
+=====================
+Recorre el AST una sola vez y enlaza cada uso de un nombre con su
+declaración, para que las etapas siguientes (checker, intérprete,
+generador de IR) nunca busquen nombres recorriendo alcances.
+
+Cada SimpleLocation, ArrayLocation y FuncCall recibe en n.binding un
+Binding(depth, slot, decl):
+
+    depth   cuántos enlaces estáticos hay que seguir desde la función
+            donde aparece el nombre (0 = local)
+    slot    posición de la variable dentro del frame de la función que
+            la declara, empezando en 0 con los parámetros y siguiendo
+            con las variables locales (None para funciones)
+    decl    nodo de la declaración (Parameter, VarDefinition o
+            FunDefinition)
+
+Además:
+
+* Parameter y VarDefinition reciben su slot.
+* FunDefinition recibe level (nivel del alcance donde se declara, 0
+  para las funciones globales), nslots (slots de su frame) y parent
+  (la función que la contiene, o None).
+* Return recibe en func la función a la que pertenece.
+
+La tabla de nombres es plana: un diccionario nombre -> pila de
+declaraciones visibles. Al abrir un alcance se apilan sus nombres y
+al cerrarlo se desapilan, así que buscar un nombre no depende de la
+profundidad del anidamiento.
+
+Los errores no detienen el recorrido: quedan en Resolver.errors como
+(mensaje, nodo), en el orden en que aparecen, y la referencia queda
+con binding = None.
+'''
+from dataclasses import dataclass
+
+from model import *
+
+
+@dataclass(slots=True)
+class Binding:
+    depth: int
+    slot: int
+    decl: Declaration
+
+
+class Resolver(Visitor):
+    '''
+    Resolver.resolve(program) enlaza todo el programa y devuelve la
+    lista de errores.
+    '''
+    def __init__(self):
+        self.names = {}         # nombre -> pila de (nivel, declaración)
+        self.scopes = []        # nombres declarados en cada alcance abierto
+        self.func = None        # FunDefinition que se está recorriendo
+        self.errors = []
+
+    @classmethod
+    def resolve(cls, node):
+        resolver = cls()
+        resolver.visit(node)
+        return resolver.errors
+
+    def error(self, message, node):
+        self.errors.append((message, node))
+
+    # Alcances ---------------------------------------------------------
+    def open_scope(self):
+        self.scopes.append(set())
+
+    def close_scope(self):
+        for name in self.scopes.pop():
+            stack = self.names[name]
+            stack.pop()
+            if not stack:
+                del self.names[name]
+
+    def declare(self, n):
+        scope = self.scopes[-1]
+        if n.name in scope:
+            self.error(f'{n.name} is already defined', n)
+            return
+        scope.add(n.name)
+        self.names.setdefault(n.name, []).append((len(self.scopes) - 1, n))
+
+    def bind(self, n, kind):
+        n.binding = None
+        stack = self.names.get(n.name)
+        if not stack:
+            self.error(f'{n.name} is not defined', n)
+            return None
+        level, decl = stack[-1]
+        if not isinstance(decl, kind):
+            what = 'function' if kind is FunDefinition else 'variable'
+            self.error(f'{n.name} is not a {what}', n)
+            return None
+        n.binding = Binding(len(self.scopes) - 1 - level, decl.slot, decl)
+        return n.binding
+
+    # Declaraciones ----------------------------------------------------
+    def visit(self, n: Program):
+        self.open_scope()
+        for func in n.funclist:
+            self.declare(func)
+        for func in n.funclist:
+            self.visit(func)
+        self.close_scope()
+
+    def visit(self, n: FunDefinition):
+        n.level = len(self.scopes) - 1
+        n.parent = self.func
+        outer, self.func = self.func, n
+        self.open_scope()
+
+        # Primero todos los nombres (parámetros, variables y funciones
+        # anidadas) para permitir llamadas recursivas y hacia adelante
+        slot = 0
+        for parm in n.parmlist.parmlist if n.parmlist else []:
+            parm.slot = slot
+            slot += 1
+            self.declare(parm)
+        locals_ = n.varlist.varlist if n.varlist else []
+        for var in locals_:
+            if not isinstance(var, FunDefinition):
+                var.slot = slot
+                slot += 1
+            self.declare(var)
+        n.nslots = slot
+
+        for var in locals_:
+            if isinstance(var, FunDefinition):
+                self.visit(var)
+            elif isinstance(var.datatype, ArrayType):
+                self.visit(var.datatype.dim)
+        self.visit(n.stmtlist)
+
+        self.close_scope()
+        self.func = outer
+
+    # Instrucciones ----------------------------------------------------
+    def visit(self, n: StmtList):
+        for stmt in n.stmtlist:
+            self.visit(stmt)
+
+    def visit(self, n: Assign):
+        self.visit(n.expr)
+        self.visit(n.location)
+
+    def visit(self, n: While):
+        self.visit(n.relation)
+        self.visit(n.stmt)
+
+    def visit(self, n: IfStmt):
+        self.visit(n.relation)
+        self.visit(n.thenstmt)
+        if n.elsestmt:
+            self.visit(n.elsestmt)
+
+    def visit(self, n: Return):
+        n.func = self.func
+        self.visit(n.value)
+
+    def visit(self, n: Write):
+        self.visit(n.expr)
+
+    def visit(self, n: Read):
+        self.visit(n.location)
+
+    def visit(self, n: Break):
+        pass
+
+    def visit(self, n: Skip):
+        pass
+
+    def visit(self, n: Print):
+        pass
+
+    # Expresiones ------------------------------------------------------
+    def visit(self, n: Literal):
+        pass
+
+    def visit(self, n: SimpleLocation):
+        self.bind(n, (Parameter, VarDefinition))
+
+    def visit(self, n: ArrayLocation):
+        binding = self.bind(n, (Parameter, VarDefinition))
+        if binding and not isinstance(binding.decl.datatype, ArrayType):
+            self.error(f'{n.name} is not an array', n)
+        self.visit(n.index)
+
+    def visit(self, n: TypeCast):
+        self.visit(n.expr)
+
+    def visit(self, n: Binary):
+        self.visit(n.left)
+        self.visit(n.right)
+
+    def visit(self, n: Logical):
+        self.visit(n.left)
+        self.visit(n.right)
+
+    def visit(self, n: Unary):
+        self.visit(n.fact)
+
+    def visit(self, n: FuncCall):
+        self.bind(n, FunDefinition)
+        for arg in n.arglist.arglist if n.arglist else []:
+            self.visit(arg)
@@ -0,0 +1,1443 @@
+# ssa.py
+'''
+IR de tres direcciones en forma SSA
+===================================
+Representación intermedia para optimizar, más baja que el AST y más
+alta que el bytecode de ircode.py. Cada función es una lista de
+bloques básicos; cada bloque tiene sus phi, sus instrucciones y
+termina en un salto (jump, branch o ret). Todo valor (Value) se
+define una sola vez y los operandos son Value o constantes (Const):
+
+    %x.3 = add %x.2, 1              %t7 = lt %i.4, %len.1
+    %a.1 = newarray %t2 (0)         %t9 = aload %a.1, %i.4 (a)
+    astore %a.1, %i.4, %t8 (a)      %t5 = call mod(%x.5, %t4)
+    %q.2 = phi [%q.1, B1], [%q.4, B5]
+
+Las variables escalares y los arrays locales de la función que no usa
+ninguna función anidada pasan a SSA (Braun et al., "Simple and
+Efficient Construction of Static Single Assignment Form", 2013: sin
+dominancia ni fronteras, directamente desde el AST). Las demás
+(variables de funciones externas o usadas desde funciones anidadas)
+quedan en el frame como en interp.py y se acceden con load/store.
+
+Cada while tiene un bloque previo (preheader) que solo salta a la
+cabecera; la construcción anota los bloques de cada ciclo, que usan
+las pasadas de ciclos.
+
+Pasadas (PassManager corre PIPELINE e informa el tiempo y el tamaño
+del IR antes y después de cada una):
+
+    tailcall   convierte la recursión de cola en un ciclo (también
+               ret x + f(...) y ret x * f(...), con un acumulador)
+    inline     copia el cuerpo de las funciones chicas no recursivas
+               en el lugar de la llamada
+    copyprop   quita las copias y las phi triviales
+    cse        subexpresiones comunes sobre el árbol de dominadores;
+               load/aload dentro de cada bloque, con los store previos
+    licm       saca de los while los cálculos invariantes
+    strength   reduce i * c (i variable de inducción) a una suma
+    dce        quita los valores sin uso
+
+Los efectos de cada llamada (qué variables externas puede asignar y
+si escribe arrays) se calculan de antemano para todo el programa, así
+que una llamada a una función como mod() no invalida nada.
+
+Machine ejecuta el IR con la semántica de interp.py, para comparar
+resultados y contar instrucciones ejecutadas. Es lo que corre
+'pl0.py -R --ssa'.
+
+usage: python ssa.py [-O] [-r] file.pl0
+'''
+import operator
+import sys
+import time
+from collections import Counter
+
+from cfg import functions
+from interp import PL0RuntimeError, decode_string, idiv, new_array, zero_value
+from model import *
+from resolve import Resolver
+from typeinfo import expr_type, return_types
+from typesys import bool_type, int_type
+
+TERMINATORS = {'jump', 'branch', 'ret'}
+COMMUTATIVE = {'add', 'mul', 'eq', 'ne'}
+# Sin efectos y sin errores posibles: se pueden eliminar o mover
+PURE = {'add', 'sub', 'mul', 'neg', 'not', 'itof', 'lt', 'le', 'gt', 'ge', 'eq', 'ne', 'copy'}
+
+_binary_ops = {'+': 'add', '-': 'sub', '*': 'mul', '/': 'div'}
+_relation_ops = {'<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge', '==': 'eq', '!=': 'ne'}
+
+
+# ---------------------------------------------------------------------
+#  Representación
+# ---------------------------------------------------------------------
+class Value:
+    '''
+    Valor SSA. name es la variable de la que sale (o 't' para los
+    temporales), solo para leer el IR.
+    '''
+    __slots__ = ('n', 'name', 'type')
+
+    def __init__(self, n, name, type):
+        self.n = n
+        self.name = name
+        self.type = type
+
+    def __repr__(self):
+        return f'%{self.name}{self.n}' if self.name == 't' else f'%{self.name}.{self.n}'
+
+
+class Const:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+def key(operand):
+    # Identidad de un operando para comparar instrucciones
+    if isinstance(operand, Const):
+        return ('c', type(operand.value).__name__, repr(operand.value))
+    return ('v', id(operand))
+
+
+class Instr:
+    '''
+    dest = op args. attr lleva lo que no es un operando: los bloques
+    destino de un salto, la variable de un load/store, la función de
+    un call, el texto de un print...
+    '''
+    __slots__ = ('op', 'dest', 'args', 'attr')
+
+    def __init__(self, op, dest=None, args=(), attr=None):
+        self.op = op
+        self.dest = dest
+        self.args = list(args)
+        self.attr = attr
+
+    def __repr__(self):
+        args = ', '.join(map(repr, self.args))
+        if self.op == 'phi':
+            return f'{self.dest} = phi {args}'
+        if self.op == 'jump':
+            text = f'jump {self.attr[0]}'
+        elif self.op == 'branch':
+            text = f'branch {args}, {self.attr[0]}, {self.attr[1]}'
+        elif self.op == 'call':
+            text = f'call {self.attr[0].name}({args})'
+        elif self.op in ('load', 'store'):
+            depth, slot, name, _ = self.attr
+            where = f'{name}' if not depth else f'{name} ^{depth}'
+            text = f'{self.op} {args + ", " if args else ""}{where}'
+        elif self.op == 'print':
+            text = f'print {self.attr!r}'
+        elif self.op == 'read':
+            text = f'read {self.attr[0]} ({self.attr[1]})'
+        elif self.op == 'param':
+            text = f'param {self.attr}'
+        elif self.attr is not None:
+            text = f'{self.op} {args + " " if args else ""}({self.attr})'
+        else:
+            text = f'{self.op} {args}'
+        return f'{self.dest} = {text}' if self.dest else text
+
+
+class Block:
+    __slots__ = ('n', 'phis', 'instrs', 'preds')
+
+    def __init__(self):
+        self.n = None
+        self.phis = []
+        self.instrs = []
+        self.preds = []
+
+    def __repr__(self):
+        return f'B{self.n}'
+
+    @property
+    def terminator(self):
+        if self.instrs and self.instrs[-1].op in TERMINATORS:
+            return self.instrs[-1]
+        return None
+
+    @property
+    def succs(self):
+        term = self.terminator
+        if term is None or term.op == 'ret':
+            return []
+        return list(term.attr)
+
+
+class Loop:
+    '''
+    Un while: cabecera, bloque previo, bloques del ciclo (cabecera
+    incluida) y el bloque que vuelve a la cabecera (None si el cuerpo
+    siempre sale con break o return).
+    '''
+    __slots__ = ('header', 'preheader', 'blocks', 'latch')
+
+    def __init__(self, header, preheader, blocks, latch):
+        self.header = header
+        self.preheader = preheader
+        self.blocks = blocks
+        self.latch = latch
+
+
+class Function:
+    def __init__(self, decl):
+        self.decl = decl
+        self.name = decl.name
+        self.blocks = []
+        self.loops = []         # los internos antes que los externos
+        self.nvalues = 0
+
+    def new_value(self, name, type):
+        self.nvalues += 1
+        return Value(self.nvalues, name, type)
+
+    def size(self):
+        return sum(len(b.phis) + len(b.instrs) for b in self.blocks)
+
+    def instructions(self):
+        for b in self.blocks:
+            yield from b.phis
+            yield from b.instrs
+
+    def uses(self):
+        count = Counter()
+        for ins in self.instructions():
+            for arg in ins.args:
+                if isinstance(arg, Value):
+                    count[arg] += 1
+        return count
+
+    def dump(self):
+        parms = self.decl.parmlist.parmlist if self.decl.parmlist else []
+        lines = [f'fun {self.name}({", ".join(p.name for p in parms)})']
+        for b in self.blocks:
+            preds = ' '.join(map(repr, b.preds))
+            lines.append(f'{b}:' + (f'  ; preds {preds}' if preds else ''))
+            for phi in b.phis:
+                args = ', '.join(f'[{arg!r}, {pred}]' for arg, pred in zip(phi.args, b.preds))
+                lines.append(f'    {phi.dest} = phi {args}')
+            for ins in b.instrs:
+                lines.append(f'    {ins}')
+        return '\n'.join(lines)
+
+
+class Module:
+    def __init__(self, program):
+        self.program = program
+        self.functions = []
+        self.by_decl = {}       # id(FunDefinition) -> Function
+        self.effects = {}       # id(FunDefinition) -> (variables, arrays)
+
+    def size(self):
+        return sum(fn.size() for fn in self.functions)
+
+    def dump(self):
+        return '\n\n'.join(fn.dump() for fn in self.functions)
+
+
+# ---------------------------------------------------------------------
+#  Construcción
+# ---------------------------------------------------------------------
+def walk(roots):
+    '''
+    Nodos alcanzables desde roots sin entrar en funciones anidadas.
+    '''
+    stack = list(roots)
+    while stack:
+        n = stack.pop()
+        if isinstance(n, list):
+            stack.extend(n)
+        elif isinstance(n, Node) and not isinstance(n, (FunDefinition, DataType)):
+            yield n
+            stack.extend(children(n))
+
+
+def own_nodes(func):
+    locals_ = func.varlist.varlist if func.varlist else []
+    dims = [var.datatype.dim for var in locals_
+            if isinstance(var, VarDefinition) and isinstance(var.datatype, ArrayType)]
+    return walk([func.stmtlist] + dims)
+
+
+def effects(funcs):
+    '''
+    Por función: ids de las variables de otras funciones que puede
+    asignar (ella o las que llama) y si puede escribir en un array.
+    '''
+    variables, arrays, calls = {}, {}, {}
+    for func in funcs:
+        writes, array, callees = set(), False, set()
+        for n in own_nodes(func):
+            if isinstance(n, (Assign, Read)):
+                loc = n.location
+                if isinstance(loc, ArrayLocation):
+                    array = True
+                elif loc.binding and loc.binding.depth:
+                    writes.add(id(loc.binding.decl))
+            elif isinstance(n, FuncCall) and n.binding:
+                callees.add(id(n.binding.decl))
+        variables[id(func)], arrays[id(func)], calls[id(func)] = writes, array, callees
+    changed = True
+    while changed:
+        changed = False
+        for func in funcs:
+            f = id(func)
+            for g in calls[f]:
+                if not variables[g] <= variables[f] or arrays[g] > arrays[f]:
+                    variables[f] |= variables[g]
+                    arrays[f] = arrays[f] or arrays[g]
+                    changed = True
+    return {f: (variables[f], arrays[f]) for f in variables}
+
+
+def escaped(func):
+    '''
+    ids de las variables de func que usa alguna función anidada.
+    '''
+    nested = []
+    for var in func.varlist.varlist if func.varlist else []:
+        if isinstance(var, FunDefinition):
+            nested.extend(functions(var))
+    found = set()
+    for inner in nested:
+        for n in own_nodes(inner):
+            if isinstance(n, (SimpleLocation, ArrayLocation)) and n.binding:
+                found.add(id(n.binding.decl))
+    return found
+
+
+class SSABuilder(Visitor):
+    '''
+    Construye la Function de una FunDefinition. Los valores actuales
+    de las variables en SSA se buscan por bloque (read_var/write_var);
+    un bloque queda sellado cuando ya se conocen todos sus
+    predecesores, y las phi que se piden antes se completan al
+    sellarlo.
+    '''
+    def __init__(self, decl, returns):
+        self.func = Function(decl)
+        self.decl = decl
+        self.returns = returns
+        self.defs = {}          # id(decl) -> {bloque: valor}
+        self.sealed = set()
+        self.incomplete = {}    # bloque -> [(decl, phi)]
+        self.loops = []         # bloques de salida de los while abiertos
+        self.current = None
+        parms = decl.parmlist.parmlist if decl.parmlist else []
+        locals_ = [var for var in (decl.varlist.varlist if decl.varlist else [])
+                   if isinstance(var, VarDefinition)]
+        outside = escaped(decl)
+        self.promoted = {id(var) for var in parms + locals_ if id(var) not in outside}
+
+    @classmethod
+    def build(cls, decl, returns):
+        builder = cls(decl, returns)
+        builder.body()
+        return builder.func
+
+    # Bloques ----------------------------------------------------------
+    def new_block(self):
+        block = Block()
+        self.func.blocks.append(block)
+        return block
+
+    def emit(self, op, args=(), attr=None, type=None, name='t'):
+        block = self.current
+        if block.terminator:
+            # Código después de un return o un break: bloque sin predecesores
+            block = self.current = self.new_block()
+            self.seal(block)
+        dest = self.func.new_value(name, type) if type is not False else None
+        block.instrs.append(Instr(op, dest, args, attr))
+        return dest
+
+    def jump(self, target):
+        if self.current.terminator:
+            return
+        self.emit('jump', attr=(target,), type=False)
+        target.preds.append(self.current)
+
+    def branch(self, cond, true, false):
+        self.emit('branch', [cond], (true, false), type=False)
+        true.preds.append(self.current)
+        false.preds.append(self.current)
+
+    @property
+    def open(self):
+        return self.current.terminator is None
+
+    # Variables en SSA -------------------------------------------------
+    def write_var(self, decl, block, value):
+        self.defs.setdefault(id(decl), {})[block] = value
+
+    def read_var(self, decl, block):
+        found = self.defs.get(id(decl), {}).get(block)
+        if found is not None:
+            return found
+        if block not in self.sealed:
+            value = self.phi(decl, block)
+            self.incomplete.setdefault(block, []).append((decl, block.phis[-1]))
+        elif not block.preds:
+            value = Const(zero_value(decl.datatype))
+        elif len(block.preds) == 1:
+            value = self.read_var(decl, block.preds[0])
+        else:
+            value = self.phi(decl, block)
+            self.write_var(decl, block, value)
+            self.phi_operands(decl, block.phis[-1], block)
+        self.write_var(decl, block, value)
+        return value
+
+    def phi(self, decl, block):
+        dest = self.func.new_value(decl.name, self.var_type(decl))
+        block.phis.append(Instr('phi', dest))
+        return dest
+
+    def phi_operands(self, decl, phi, block):
+        phi.args = [self.read_var(decl, pred) for pred in block.preds]
+
+    def seal(self, block):
+        for decl, phi in self.incomplete.pop(block, []):
+            self.phi_operands(decl, phi, block)
+        self.sealed.add(block)
+
+    def var_type(self, decl):
+        return decl.datatype if isinstance(decl.datatype, ArrayType) else expr_type_of(decl)
+
+    # Variables en memoria ---------------------------------------------
+    def variable(self, loc):
+        decl = loc.binding.decl
+        if id(decl) in self.promoted:
+            return self.read_var(decl, self.current)
+        return self.emit('load', attr=self.where(loc.binding), type=self.var_type(decl), name=decl.name)
+
+    def assign(self, loc, value):
+        decl = loc.binding.decl
+        if id(decl) in self.promoted:
+            copy = self.emit('copy', [value], type=self.var_type(decl), name=decl.name)
+            self.write_var(decl, self.current, copy)
+        else:
+            self.emit('store', [value], self.where(loc.binding), type=False)
+
+    def where(self, binding):
+        return (binding.depth, binding.slot, binding.decl.name, id(binding.decl))
+
+    # Función ----------------------------------------------------------
+    def body(self):
+        decl = self.decl
+        entry = self.current = self.new_block()
+        self.seal(entry)
+        for k, parm in enumerate(decl.parmlist.parmlist if decl.parmlist else []):
+            if id(parm) in self.promoted:
+                value = self.emit('param', attr=k, type=self.var_type(parm), name=parm.name)
+                self.write_var(parm, entry, value)
+        for var in decl.varlist.varlist if decl.varlist else []:
+            if not isinstance(var, VarDefinition):
+                continue
+            if isinstance(var.datatype, ArrayType):
+                dim = self.visit(var.datatype.dim)
+                array = self.emit('newarray', [dim], zero_value(var.datatype), var.datatype, var.name)
+                if id(var) in self.promoted:
+                    self.write_var(var, self.current, array)
+                else:
+                    self.emit('store', [array], (0, var.slot, var.name, id(var)), type=False)
+            elif id(var) in self.promoted:
+                self.write_var(var, self.current, Const(zero_value(var.datatype)))
+        self.statement(decl.stmtlist)
+        if self.open:
+            self.emit('ret', [Const(None)], type=False)
+        self.finish()
+
+    def finish(self):
+        # Quita los bloques inalcanzables (y sus argumentos en las phi)
+        func = self.func
+        reachable = set()
+        stack = [func.blocks[0]]
+        while stack:
+            b = stack.pop()
+            if b not in reachable:
+                reachable.add(b)
+                stack.extend(b.succs)
+        for b in func.blocks:
+            if b in reachable and any(p not in reachable for p in b.preds):
+                keep = [i for i, p in enumerate(b.preds) if p in reachable]
+                b.preds = [b.preds[i] for i in keep]
+                for phi in b.phis:
+                    phi.args = [phi.args[i] for i in keep]
+        func.blocks = [b for b in func.blocks if b in reachable]
+        for n, b in enumerate(func.blocks):
+            b.n = n
+        func.loops = [Loop(loop.header, loop.preheader, loop.blocks & reachable, loop.latch)
+                      for loop in func.loops if loop.header in reachable]
+
+    # Instrucciones ----------------------------------------------------
+    def statement(self, n):
+        self.visit(n)
+
+    def visit(self, n: StmtList):
+        for stmt in n.stmtlist:
+            self.statement(stmt)
+
+    def visit(self, n: Skip):
+        pass
+
+    def visit(self, n: Assign):
+        loc = n.location
+        value = self.visit(n.expr)
+        if isinstance(loc, ArrayLocation):
+            # Como en el intérprete: valor, array y después el índice
+            array = self.variable(loc)
+            index = self.visit(loc.index)
+            self.emit('astore', [array, index, value], loc.name, type=False)
+        else:
+            self.assign(loc, value)
+
+    def visit(self, n: Read):
+        loc = n.location
+        decl = loc.binding.decl
+        value = self.emit('read', attr=(decl.datatype.name, loc.name), type=expr_type_of(decl))
+        if isinstance(loc, ArrayLocation):
+            array = self.variable(loc)
+            index = self.visit(loc.index)
+            self.emit('astore', [array, index, value], loc.name, type=False)
+        else:
+            self.assign(loc, value)
+
+    def visit(self, n: Write):
+        self.emit('write', [self.visit(n.expr)], type=False)
+
+    def visit(self, n: Print):
+        self.emit('print', attr=decode_string(n.value), type=False)
+
+    def visit(self, n: Return):
+        self.emit('ret', [self.visit(n.value)], type=False)
+
+    def visit(self, n: Break):
+        if not self.loops:
+            raise PL0RuntimeError('break outside of a while loop', n)
+        self.jump(self.loops[-1])
+
+    def visit(self, n: IfStmt):
+        cond = self.visit(n.relation)
+        then, other, join = self.new_block(), Block(), Block()
+        self.branch(cond, then, other if n.elsestmt else join)
+        self.seal(then)
+        self.current = then
+        self.statement(n.thenstmt)
+        self.jump(join)
+        if n.elsestmt:
+            self.func.blocks.append(other)
+            self.seal(other)
+            self.current = other
+            self.statement(n.elsestmt)
+            self.jump(join)
+        self.func.blocks.append(join)
+        self.seal(join)
+        self.current = join
+
+    def visit(self, n: While):
+        preheader = self.new_block()
+        self.jump(preheader)
+        self.seal(preheader)
+        self.current = preheader
+        header = self.new_block()
+        self.jump(header)
+        first = len(self.func.blocks) - 1
+
+        self.current = header
+        cond = self.visit(n.relation)
+        body, exit = self.new_block(), Block()
+        self.branch(cond, body, exit)
+        self.seal(body)
+        self.current = body
+        self.loops.append(exit)
+        self.statement(n.stmt)
+        self.loops.pop()
+        latch = self.current if self.open else None
+        self.jump(header)
+        blocks = set(self.func.blocks[first:])
+        self.seal(header)
+
+        self.func.blocks.append(exit)
+        self.seal(exit)
+        self.current = exit
+        self.func.loops.append(Loop(header, preheader, blocks, latch))
+
+    # Expresiones ------------------------------------------------------
+    def visit(self, n: Integer):
+        return Const(int(n.value))
+
+    def visit(self, n: Float):
+        return Const(float(n.value))
+
+    def visit(self, n: SimpleLocation):
+        return self.variable(n)
+
+    def visit(self, n: ArrayLocation):
+        array = self.variable(n)
+        index = self.visit(n.index)
+        return self.emit('aload', [array, index], n.name, type=expr_type(n, self.returns))
+
+    def visit(self, n: TypeCast):
+        value = self.visit(n.expr)
+        op = 'ftoi' if n.name == 'int' else 'itof'
+        return self.emit(op, [value], type=expr_type(n, self.returns))
+
+    def visit(self, n: Binary):
+        left = self.visit(n.left)
+        right = self.visit(n.right)
+        return self.emit(_binary_ops[n.op], [left, right], type=expr_type(n, self.returns))
+
+    def visit(self, n: Unary):
+        value = self.visit(n.fact)
+        if n.op == '+':
+            return value
+        return self.emit('neg' if n.op == '-' else 'not', [value], type=expr_type(n, self.returns))
+
+    def visit(self, n: Logical):
+        if n.op not in ('and', 'or'):
+            left = self.visit(n.left)
+            right = self.visit(n.right)
+            return self.emit(_relation_ops[n.op], [left, right], type=bool_type)
+        # Cortocircuito: una phi junta el valor de la izquierda (si
+        # decide) con el de la derecha
+        left = self.visit(n.left)
+        right_block, join = self.new_block(), Block()
+        if n.op == 'and':
+            self.branch(left, right_block, join)
+        else:
+            self.branch(left, join, right_block)
+        source = self.current
+        self.seal(right_block)
+        self.current = right_block
+        right = self.visit(n.right)
+        self.jump(join)
+        self.func.blocks.append(join)
+        self.seal(join)
+        self.current = join
+        decided = Const(n.op == 'or')
+        dest = self.func.new_value('t', bool_type)
+        join.phis.append(Instr('phi', dest, [decided if p is source else right for p in join.preds]))
+        return dest
+
+    def visit(self, n: FuncCall):
+        decl = n.binding.decl
+        args = n.arglist.arglist if n.arglist else []
+        nparms = len(decl.parmlist.parmlist) if decl.parmlist else 0
+        if len(args) != nparms:
+            raise PL0RuntimeError(f'{n.name} expects {nparms} arguments, got {len(args)}', n)
+        values = [self.visit(arg) for arg in args]
+        depth = n.binding.depth if decl.level else None
+        return self.emit('call', values, (decl, depth), type=self.returns[id(decl)])
+
+
+def expr_type_of(decl):
+    from typesys import lookup_type
+    return lookup_type(decl.datatype.name)
+
+
+def build(program):
+    '''
+    Module con una Function por cada FunDefinition de program.
+    '''
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    errors = Resolver.resolve(program)
+    if errors:
+        raise PL0RuntimeError(*errors[0])
+    funcs = functions(program)
+    returns = return_types(funcs)
+    module = Module(program)
+    module.effects = effects(funcs)
+    for decl in funcs:
+        fn = SSABuilder.build(decl, returns)
+        module.functions.append(fn)
+        module.by_decl[id(decl)] = fn
+    return module
+
+
+# ---------------------------------------------------------------------
+#  Utilidades de las pasadas
+# ---------------------------------------------------------------------
+def resolve(operand, mapping):
+    while isinstance(operand, Value) and operand in mapping:
+        operand = mapping[operand]
+    return operand
+
+
+def substitute(func, mapping):
+    if mapping:
+        for ins in func.instructions():
+            ins.args = [resolve(arg, mapping) for arg in ins.args]
+
+
+def dominators(func):
+    '''
+    (idom, rpo): dominador inmediato de cada bloque y los bloques en
+    orden posterior inverso (Cooper, Harvey y Kennedy, "A Simple, Fast
+    Dominance Algorithm").
+    '''
+    entry = func.blocks[0]
+    order, seen, stack = [], {entry}, [(entry, iter(entry.succs))]
+    while stack:
+        b, succs = stack[-1]
+        for s in succs:
+            if s not in seen:
+                seen.add(s)
+                stack.append((s, iter(s.succs)))
+                break
+        else:
+            stack.pop()
+            order.append(b)
+    rpo = order[::-1]
+    index = {b: i for i, b in enumerate(rpo)}
+    idom = {entry: entry}
+    changed = True
+    while changed:
+        changed = False
+        for b in rpo[1:]:
+            preds = [p for p in b.preds if p in idom]
+            new = preds[0]
+            for p in preds[1:]:
+                a = p
+                while a is not new:
+                    while index[a] > index[new]:
+                        a = idom[a]
+                    while index[new] > index[a]:
+                        new = idom[new]
+            if idom.get(b) is not new:
+                idom[b] = new
+                changed = True
+    return idom, rpo
+
+
+def call_kills(ins, module):
+    return module.effects.get(id(ins.attr[0]), (set(), True))
+
+
+# ---------------------------------------------------------------------
+#  Pasadas
+# ---------------------------------------------------------------------
+def copy_propagation(func, module):
+    '''
+    Reemplaza cada copia por su origen y cada phi trivial (todos sus
+    argumentos iguales, sin contarse a sí misma) por ese argumento.
+    '''
+    mapping = {}
+    removed = 0
+    for b in func.blocks:
+        keep = []
+        for ins in b.instrs:
+            if ins.op == 'copy':
+                mapping[ins.dest] = ins.args[0]
+                removed += 1
+            else:
+                keep.append(ins)
+        b.instrs = keep
+    changed = True
+    while changed:
+        changed = False
+        for b in func.blocks:
+            keep = []
+            for phi in b.phis:
+                args = {key(a): a for a in (resolve(a, mapping) for a in phi.args)
+                        if a is not phi.dest}
+                args.pop(key(phi.dest), None)
+                if len(args) == 1:
+                    mapping[phi.dest] = next(iter(args.values()))
+                    removed += 1
+                    changed = True
+                else:
+                    keep.append(phi)
+            b.phis = keep
+    substitute(func, mapping)
+    return removed
+
+
+def cse(func, module):
+    '''
+    Numeración de valores sobre el árbol de dominadores: una operación
+    pura igual a una que la domina se reemplaza por el valor de esa.
+    Los load y aload se reutilizan dentro del bloque hasta que un
+    store, un astore o una llamada con efectos los invalida; un store
+    deja disponible el valor guardado.
+    '''
+    idom, rpo = dominators(func)
+    kids = {b: [] for b in rpo}
+    for b in rpo[1:]:
+        kids[idom[b]].append(b)
+    table, mapping = {}, {}
+    removed = 0
+
+    def signature(ins):
+        args = tuple(key(resolve(a, mapping)) for a in ins.args)
+        if ins.op in COMMUTATIVE:
+            args = tuple(sorted(args, key=repr))
+        return (ins.op, args)
+
+    stack = [(func.blocks[0], None)]
+    while stack:
+        b, undo = stack.pop()
+        if b is None:
+            for k in undo:
+                del table[k]
+            continue
+        undo = []
+        keep = []
+        for phi in b.phis:
+            k = ('phi', id(b), tuple(key(resolve(a, mapping)) for a in phi.args))
+            if k in table:
+                mapping[phi.dest] = table[k]
+                removed += 1
+            else:
+                table[k] = phi.dest
+                undo.append(k)
+                keep.append(phi)
+        b.phis = keep
+
+        memory = {}
+        keep = []
+        for ins in b.instrs:
+            ins.args = [resolve(a, mapping) for a in ins.args]
+            op = ins.op
+            if op in PURE or op == 'div':
+                k = signature(ins)
+                if k in table:
+                    mapping[ins.dest] = table[k]
+                    removed += 1
+                    continue
+                table[k] = ins.dest
+                undo.append(k)
+            elif op in ('load', 'aload'):
+                k = ('load', ins.attr[3]) if op == 'load' else ('aload',) + signature(ins)[1]
+                if k in memory:
+                    mapping[ins.dest] = memory[k]
+                    removed += 1
+                    continue
+                memory[k] = ins.dest
+            elif op == 'store':
+                memory[('load', ins.attr[3])] = ins.args[0]
+            elif op == 'astore':
+                memory = {k: v for k, v in memory.items() if k[0] != 'aload'}
+                memory[('aload', key(ins.args[0]), key(ins.args[1]))] = ins.args[2]
+            elif op == 'call':
+                variables, arrays = call_kills(ins, module)
+                memory = {k: v for k, v in memory.items()
+                          if not (k[0] == 'load' and k[1] in variables or k[0] == 'aload' and arrays)}
+            keep.append(ins)
+        b.instrs = keep
+
+        stack.append((None, undo))
+        for child in reversed(kids[b]):
+            stack.append((child, None))
+    substitute(func, mapping)
+    return removed
+
+
+def invariant_op(ins, kills):
+    '''
+    ins se puede ejecutar antes del ciclo: no tiene efectos ni puede
+    fallar, o es un load de una variable que el ciclo no cambia.
+    '''
+    if ins.op in PURE:
+        return True
+    if ins.op == 'div':
+        divisor = ins.args[1]
+        return isinstance(divisor, Const) and type(divisor.value) is int and divisor.value != 0
+    if ins.op == 'load':
+        return ins.attr[3] not in kills
+    return False
+
+
+def licm(func, module):
+    '''
+    Mueve al bloque previo de cada while las instrucciones invariantes
+    del ciclo, de los ciclos internos a los externos.
+    '''
+    moved = 0
+    for loop in func.loops:
+        kills = set()
+        defined = set()
+        for b in loop.blocks:
+            for ins in b.phis + b.instrs:
+                if ins.dest is not None:
+                    defined.add(ins.dest)
+                if ins.op == 'store':
+                    kills.add(ins.attr[3])
+                elif ins.op == 'call':
+                    kills |= call_kills(ins, module)[0]
+        preheader = loop.preheader
+        changed = True
+        while changed:
+            changed = False
+            for b in sorted(loop.blocks, key=lambda b: b.n):
+                keep = []
+                for ins in b.instrs:
+                    if invariant_op(ins, kills) and not any(a in defined for a in ins.args
+                                                            if isinstance(a, Value)):
+                        preheader.instrs.insert(len(preheader.instrs) - 1, ins)
+                        defined.discard(ins.dest)
+                        moved += 1
+                        changed = True
+                    else:
+                        keep.append(ins)
+                b.instrs = keep
+    return moved
+
+
+def induction_variables(loop):
+    '''
+    Variables de inducción básicas del ciclo: {phi de la cabecera:
+    (valor inicial, instrucción del incremento, paso constante)}.
+    '''
+    header, latch = loop.header, loop.latch
+    if latch is None or len(header.preds) != 2 or loop.preheader not in header.preds:
+        return {}
+    entry, back = header.preds.index(loop.preheader), header.preds.index(latch)
+    defs = {ins.dest: ins for b in loop.blocks for ins in b.instrs if ins.dest is not None}
+    found = {}
+    for phi in header.phis:
+        if phi.dest.type is not int_type:
+            continue
+        step = defs.get(phi.args[back])
+        if step is None or step.op not in ('add', 'sub'):
+            continue
+        a, b = step.args
+        if step.op == 'add' and b is phi.dest:
+            a, b = b, a
+        if a is phi.dest and isinstance(b, Const) and type(b.value) is int:
+            found[phi.dest] = (phi.args[entry], step, b.value if step.op == 'add' else -b.value)
+    return found
+
+
+def strength_reduction(func, module):
+    '''
+    Cada i * c dentro de un ciclo, con i variable de inducción básica
+    (i := i + paso) y c constante, pasa a ser una variable de inducción
+    nueva: se inicializa con inicial * c antes del ciclo y se le suma
+    paso * c donde se incrementa i.
+    '''
+    reduced = 0
+    for loop in func.loops:
+        ivs = induction_variables(loop)
+        if not ivs:
+            continue
+        header, preheader = loop.header, loop.preheader
+        entry, back = header.preds.index(preheader), header.preds.index(loop.latch)
+        mapping, made = {}, {}
+        for b in sorted(loop.blocks, key=lambda b: b.n):
+            for ins in b.instrs:
+                if ins.op != 'mul' or ins.dest.type is not int_type:
+                    continue
+                a, c = ins.args
+                if a not in ivs:
+                    a, c = c, a
+                if a not in ivs or not isinstance(c, Const) or type(c.value) is not int:
+                    continue
+                if (a, c.value) in made:
+                    mapping[ins.dest] = made[a, c.value]
+                    reduced += 1
+                    continue
+                init, step, delta = ivs[a]
+                if isinstance(init, Const) and type(init.value) is int:
+                    start = Const(init.value * c.value)
+                else:
+                    start = func.new_value('t', int_type)
+                    preheader.instrs.insert(len(preheader.instrs) - 1, Instr('mul', start, [init, c]))
+                current = func.new_value('t', int_type)
+                following = func.new_value('t', int_type)
+                args = [None] * len(header.preds)
+                args[entry], args[back] = start, following
+                header.phis.append(Instr('phi', current, args))
+                for block in loop.blocks:
+                    if step in block.instrs:
+                        block.instrs.insert(block.instrs.index(step) + 1,
+                                            Instr('add', following, [current, Const(delta * c.value)]))
+                        break
+                mapping[ins.dest] = made[a, c.value] = current
+                reduced += 1
+        substitute(func, mapping)
+    return reduced
+
+
+def dead_code(func, module):
+    '''
+    Quita las instrucciones sin efectos cuyo valor no llega a ninguna
+    con efectos (también los ciclos de phi que solo se usan entre sí).
+    '''
+    defs, live, work = {}, set(), []
+    for ins in func.instructions():
+        if ins.dest is not None:
+            defs[ins.dest] = ins
+        if ins.op != 'phi' and not (ins.dest is not None and invariant_op(ins, ())):
+            live.add(ins)
+            work.append(ins)
+    while work:
+        for arg in work.pop().args:
+            ins = defs.get(arg)
+            if ins is not None and ins not in live:
+                live.add(ins)
+                work.append(ins)
+    removed = 0
+    for b in func.blocks:
+        phis = [phi for phi in b.phis if phi in live]
+        instrs = [ins for ins in b.instrs if ins in live]
+        removed += len(b.phis) - len(phis) + len(b.instrs) - len(instrs)
+        b.phis, b.instrs = phis, instrs
+    return removed
+
+
+def frame_variables(fn):
+    '''
+    fn guarda variables en su propio frame: las que usan sus funciones
+    anidadas, que quedan fuera de SSA.
+    '''
+    return bool(escaped(fn.decl)) or any(ins.op in ('load', 'store') and ins.attr[0] == 0
+                                         for ins in fn.instructions())
+
+
+def renumber(func):
+    for n, b in enumerate(func.blocks):
+        b.n = n
+
+
+def retarget(block, old):
+    # block heredó el terminador de old: sus sucesores lo tienen de predecesor
+    for succ in block.succs:
+        succ.preds = [block if p is old else p for p in succ.preds]
+
+
+ACCUMULATE = {'add': 0, 'mul': 1}       # operación -> neutro
+
+
+def tail_calls(func, module):
+    '''
+    Convierte la recursión de cola de func en un ciclo: cada
+    ret call func(args) salta a una cabecera nueva con una phi por
+    parámetro. También ret x + func(args) y ret x * func(args) con
+    enteros, acumulando x en otra phi (la suma y el producto de int son
+    asociativos); los demás ret devuelven el acumulado con su valor.
+    Solo si func no tiene variables en el frame, que se reutiliza.
+    '''
+    if frame_variables(func):
+        return 0
+    sites, accumulate = [], None
+    for b in func.blocks:
+        ins = b.instrs
+        if len(ins) >= 2 and ins[-2].op == 'call' and ins[-2].attr[0] is func.decl \
+                and ins[-1].op == 'ret' and ins[-1].args[0] is ins[-2].dest:
+            sites.append((b, 2))
+        elif len(ins) >= 3 and ins[-3].op == 'call' and ins[-3].attr[0] is func.decl \
+                and ins[-2].op in ACCUMULATE and ins[-2].dest.type is int_type \
+                and ins[-1].op == 'ret' and ins[-1].args[0] is ins[-2].dest \
+                and ins[-2].args.count(ins[-3].dest) == 1 and accumulate in (None, ins[-2].op):
+            sites.append((b, 3))
+            accumulate = ins[-2].op
+    returns = [b for b in func.blocks
+               if b.terminator and b.terminator.op == 'ret' and b not in {site for site, _ in sites}]
+    if accumulate and any(isinstance(b.terminator.args[0], Const) and b.terminator.args[0].value is None
+                          for b in returns):
+        # Un camino sin return devuelve None: no hay con qué acumular
+        sites = [(b, k) for b, k in sites if k == 2]
+        accumulate = None
+    if not sites:
+        return 0
+
+    entry = func.blocks[0]
+    head = Block()
+    head.instrs = [ins for ins in entry.instrs if ins.op != 'param']
+    entry.instrs = [ins for ins in entry.instrs if ins.op == 'param']
+    retarget(head, entry)
+    entry.instrs.append(Instr('jump', attr=(head,)))
+    head.preds = [entry]
+    func.blocks.insert(1, head)
+    sites = [(head if b is entry else b, k) for b, k in sites]
+    returns = [head if b is entry else b for b in returns]
+
+    phis, mapping = {}, {}
+    for ins in entry.instrs[:-1]:
+        phis[ins.attr] = Instr('phi', func.new_value(ins.dest.name, ins.dest.type), [ins.dest])
+        mapping[ins.dest] = phis[ins.attr].dest
+    substitute(func, mapping)
+    head.phis = list(phis.values())
+    if accumulate:
+        total = Instr('phi', func.new_value('acc', int_type), [Const(ACCUMULATE[accumulate])])
+        head.phis.append(total)
+        for b in returns:
+            term = b.terminator
+            value = func.new_value('t', int_type)
+            b.instrs.insert(len(b.instrs) - 1, Instr(accumulate, value, [total.dest, term.args[0]]))
+            term.args = [value]
+
+    for b, k in sites:
+        call = b.instrs[-k]
+        if k == 3:
+            step = b.instrs[-2]
+            other = step.args[1] if step.args[0] is call.dest else step.args[0]
+        b.instrs = b.instrs[:-k]
+        for n, phi in phis.items():
+            phi.args.append(call.args[n])
+        if accumulate:
+            if k == 3:
+                value = func.new_value('acc', int_type)
+                b.instrs.append(Instr(accumulate, value, [total.dest, other]))
+                total.args.append(value)
+            else:
+                total.args.append(total.dest)
+        b.instrs.append(Instr('jump', attr=(head,)))
+        head.preds.append(b)
+    renumber(func)
+    return len(sites)
+
+
+INLINE_SIZE = 40        # instrucciones de las funciones que se copian
+INLINE_GROWTH = 4       # tope de crecimiento de la función que llama
+
+
+def recursive(module):
+    '''
+    ids de las FunDefinition que pueden volver a llamarse a sí mismas.
+    '''
+    graph = {id(fn.decl): {id(ins.attr[0]) for ins in fn.instructions() if ins.op == 'call'}
+             for fn in module.functions}
+    found = set()
+    for f, callees in graph.items():
+        seen, stack = set(), list(callees)
+        while stack:
+            g = stack.pop()
+            if g == f:
+                found.add(f)
+                break
+            if g not in seen:
+                seen.add(g)
+                stack.extend(graph.get(g, ()))
+    return found
+
+
+def inlinable(callee, func, recursive_):
+    if callee is func or id(callee.decl) in recursive_ or callee.size() > INLINE_SIZE:
+        return False
+    if frame_variables(callee):
+        return False
+    # Las funciones anidadas en callee necesitan su frame como enlace
+    if any(ins.op == 'call' and ins.attr[1] == 0 for ins in callee.instructions()):
+        return False
+    return any(b.terminator and b.terminator.op == 'ret' for b in callee.blocks)
+
+
+def copy_blocks(callee, func, args, hops):
+    '''
+    Copia los bloques de callee con valores nuevos de func. Los param
+    pasan a ser los argumentos y las profundidades de load, store y
+    call se cuentan desde el frame de func (el de callee enlazaba con
+    el que está hops más afuera).
+    '''
+    blocks = {b: Block() for b in callee.blocks}
+    values = {ins.dest: args[ins.attr] for ins in callee.instructions() if ins.op == 'param'}
+
+    def operand(a):
+        if isinstance(a, Value):
+            if a not in values:
+                values[a] = func.new_value(a.name, a.type)
+            return values[a]
+        return a
+
+    for b, copy in blocks.items():
+        copy.preds = [blocks[p] for p in b.preds]
+        copy.phis = [Instr('phi', operand(phi.dest), map(operand, phi.args)) for phi in b.phis]
+        for ins in b.instrs:
+            if ins.op == 'param':
+                continue
+            attr = ins.attr
+            if ins.op in ('jump', 'branch'):
+                attr = tuple(blocks[t] for t in attr)
+            elif ins.op in ('load', 'store'):
+                attr = (hops + attr[0] - 1,) + attr[1:]
+            elif ins.op == 'call' and attr[1] is not None:
+                attr = (attr[0], hops + attr[1] - 1)
+            dest = operand(ins.dest) if ins.dest is not None else None
+            copy.instrs.append(Instr(ins.op, dest, map(operand, ins.args), attr))
+    loops = [Loop(blocks[l.header], blocks[l.preheader], {blocks[b] for b in l.blocks},
+                  blocks[l.latch] if l.latch else None) for l in callee.loops]
+    return [blocks[b] for b in callee.blocks], loops
+
+
+def inline(func, module):
+    '''
+    Reemplaza las llamadas a funciones chicas (hasta INLINE_SIZE
+    instrucciones) y no recursivas por una copia de su cuerpo: el
+    bloque se corta en la llamada, salta a la copia y cada ret de la
+    copia salta a la continuación, donde una phi junta el resultado.
+    Quedan afuera las funciones con variables en su propio frame.
+    '''
+    recursive_ = recursive(module)
+    limit = func.size() * INLINE_GROWTH + 200
+    inlined = 0
+    work = list(func.blocks)
+    while work:
+        b = work.pop()
+        for i, ins in enumerate(b.instrs):
+            if ins.op != 'call':
+                continue
+            callee = module.by_decl[id(ins.attr[0])]
+            if inlinable(callee, func, recursive_) and func.size() + callee.size() <= limit:
+                break
+        else:
+            continue
+        cont = Block()
+        cont.instrs = b.instrs[i + 1:]
+        b.instrs = b.instrs[:i]
+        retarget(cont, b)
+        copies, loops = copy_blocks(callee, func, ins.args, ins.attr[1])
+        b.instrs.append(Instr('jump', attr=(copies[0],)))
+        copies[0].preds = [b]
+        results = []
+        for copy in copies:
+            term = copy.terminator
+            if term and term.op == 'ret':
+                results.append(term.args[0])
+                copy.instrs[-1] = Instr('jump', attr=(cont,))
+                cont.preds.append(copy)
+        cont.phis = [Instr('phi', ins.dest, results)]
+
+        for loop in func.loops:
+            if b in loop.blocks:
+                loop.blocks |= set(copies) | {cont}
+                if loop.latch is b:
+                    loop.latch = cont
+        func.loops[:0] = loops
+        at = func.blocks.index(b) + 1
+        func.blocks[at:at] = copies + [cont]
+        work.extend(copies + [cont])
+        inlined += 1
+    renumber(func)
+    return inlined
+
+
+PIPELINE = [
+    ('tailcall', tail_calls),
+    ('inline', inline),
+    ('copyprop', copy_propagation),
+    ('cse', cse),
+    ('licm', licm),
+    ('strength', strength_reduction),
+    ('dce', dead_code),
+]
+
+
+class PassReport:
+    __slots__ = ('name', 'seconds', 'before', 'after', 'changes')
+
+    def __init__(self, name, seconds, before, after, changes):
+        self.name = name
+        self.seconds = seconds
+        self.before = before
+        self.after = after
+        self.changes = changes
+
+    def __str__(self):
+        return (f'{self.name:<10} {self.seconds * 1000:8.2f}ms  {self.before:6} -> {self.after:6} '
+                f'instructions ({self.after - self.before:+})  {self.changes} changes')
+
+
+class PassManager:
+    '''
+    Corre una lista de pasadas (nombre, función(func, module) que
+    devuelve cuántos cambios hizo) sobre todas las funciones del módulo.
+    '''
+    def __init__(self, passes=None):
+        self.passes = PIPELINE if passes is None else passes
+
+    def run(self, module):
+        reports = []
+        for name, run in self.passes:
+            before = module.size()
+            t = time.perf_counter()
+            changes = sum(run(fn, module) for fn in module.functions)
+            seconds = time.perf_counter() - t
+            reports.append(PassReport(name, seconds, before, module.size(), changes))
+        return reports
+
+
+# ---------------------------------------------------------------------
+#  Ejecución
+# ---------------------------------------------------------------------
+def _div(a, b):
+    try:
+        if type(a) is int:
+            return idiv(a, b)
+        return a / b
+    except ZeroDivisionError:
+        raise PL0RuntimeError('Division by zero') from None
+
+
+_operations = {
+    'add': operator.add, 'sub': operator.sub, 'mul': operator.mul, 'div': _div,
+    'lt': operator.lt, 'le': operator.le, 'gt': operator.gt, 'ge': operator.ge,
+    'eq': operator.eq, 'ne': operator.ne,
+    'neg': operator.neg, 'not': operator.not_, 'itof': float, 'ftoi': int, 'copy': lambda x: x,
+}
+
+
+class Machine:
+    '''
+    Ejecuta un Module empezando por main(), con los frames de interp.py
+    para las variables que no están en SSA. self.count cuenta las
+    instrucciones ejecutadas (phi incluidas) y self.calls las llamadas.
+    '''
+    def __init__(self, module, stdin=None, stdout=None):
+        self.module = module
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self.count = 0
+        self.calls = 0
+
+    def run(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        for fn in self.module.functions:
+            if fn.name == 'main' and fn.decl.level == 0:
+                parms = fn.decl.parmlist.parmlist if fn.decl.parmlist else []
+                try:
+                    return self.call(fn, [zero_value(p.datatype) for p in parms], None)
+                except RecursionError:
+                    raise PL0RuntimeError('Stack overflow') from None
+        raise PL0RuntimeError('Program has no main function')
+
+    def call(self, fn, args, link):
+        self.calls += 1
+        decl = fn.decl
+        frame = [link] + [None] * decl.nslots
+        for var in decl.varlist.varlist if decl.varlist else []:
+            if isinstance(var, VarDefinition):
+                frame[1 + var.slot] = zero_value(var.datatype)
+        frame[1:1 + len(args)] = args
+        values = {}
+        operations = _operations
+
+        def get(a):
+            return a.value if type(a) is Const else values[a]
+
+        block, previous = fn.blocks[0], None
+        while True:
+            if block.phis:
+                k = block.preds.index(previous)
+                incoming = [get(phi.args[k]) for phi in block.phis]
+                for phi, value in zip(block.phis, incoming):
+                    values[phi.dest] = value
+                self.count += len(block.phis)
+            self.count += len(block.instrs)
+            for ins in block.instrs:
+                op = ins.op
+                if op in operations:
+                    values[ins.dest] = operations[op](*[get(a) for a in ins.args])
+                elif op == 'aload':
+                    array, index = get(ins.args[0]), get(ins.args[1])
+                    try:
+                        if index < 0:
+                            raise IndexError
+                        values[ins.dest] = array[index]
+                    except IndexError:
+                        raise PL0RuntimeError(f'Index out of range in {ins.attr}') from None
+                elif op == 'astore':
+                    array, index = get(ins.args[0]), get(ins.args[1])
+                    try:
+                        if index < 0:
+                            raise IndexError
+                        array[index] = get(ins.args[2])
+                    except IndexError:
+                        raise PL0RuntimeError(f'Index out of range in {ins.attr}') from None
+                    except OverflowError:
+                        raise PL0RuntimeError(f'Integer overflow in {ins.attr}') from None
+                    except TypeError:
+                        raise PL0RuntimeError(f'Type mismatch in {ins.attr}') from None
+                elif op == 'load':
+                    f = frame
+                    for _ in range(ins.attr[0]):
+                        f = f[0]
+                    values[ins.dest] = f[1 + ins.attr[1]]
+                elif op == 'store':
+                    f = frame
+                    for _ in range(ins.attr[0]):
+                        f = f[0]
+                    f[1 + ins.attr[1]] = get(ins.args[0])
+                elif op == 'call':
+                    callee, depth = ins.attr
+                    f = None
+                    if depth is not None:
+                        f = frame
+                        for _ in range(depth):
+                            f = f[0]
+                    values[ins.dest] = self.call(self.module.by_decl[id(callee)],
+                                                 [get(a) for a in ins.args], f)
+                elif op == 'param':
+                    values[ins.dest] = frame[1 + ins.attr]
+                elif op == 'newarray':
+                    values[ins.dest] = new_array(ins.attr, get(ins.args[0]))
+                elif op == 'jump':
+                    previous, block = block, ins.attr[0]
+                    break
+                elif op == 'branch':
+                    previous, block = block, ins.attr[0] if get(ins.args[0]) else ins.attr[1]
+                    break
+                elif op == 'ret':
+                    return get(ins.args[0])
+                elif op == 'write':
+                    self.stdout.write(str(get(ins.args[0])))
+                elif op == 'print':
+                    self.stdout.write(ins.attr)
+                elif op == 'read':
+                    kind, name = ins.attr
+                    line = self.stdin.readline()
+                    try:
+                        values[ins.dest] = (float if kind == 'float' else int)(line.strip())
+                    except ValueError:
+                        raise PL0RuntimeError(f'Invalid input {line.strip()!r} for {name}') from None
+                else:
+                    raise PL0RuntimeError(f'Bad instruction {op}')
+
+
+def main(argv):
+    import argparse
+    from context import Context
+
+    cli = argparse.ArgumentParser(prog='ssa.py', description='SSA IR of a PL0 program')
+    cli.add_argument('input')
+    cli.add_argument('-O', '--optimize', action='store_true', help='run the pass pipeline and report each pass')
+    cli.add_argument('-r', '--run', action='store_true', help='execute the IR instead of printing it')
+    args = cli.parse_args(argv[1:])
+
+    context = Context()
+    with open(args.input, encoding='utf-8') as f:
+        context.parse(f.read())
+    if context.have_errors:
+        sys.exit(1)
+    try:
+        module = build(context.ast)
+    except PL0RuntimeError as e:
+        context.error(str(e), e.node)
+        sys.exit(1)
+    if args.optimize:
+        for report in PassManager().run(module):
+            print(f'# {report}', file=sys.stderr if args.run else sys.stdout)
+    if not args.run:
+        print(module.dump())
+        return
+    machine = Machine(module)
+    try:
+        machine.run()
+    except PL0RuntimeError as e:
+        context.error(str(e), e.node)
+        sys.exit(1)
+    finally:
+        print(f'\n# {machine.count} instructions executed, {machine.calls} calls', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
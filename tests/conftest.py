@@ -0,0 +1,50 @@
+# conftest.py
+'''
+Los módulos del compilador están en la raíz del repositorio y se
+importan por nombre (from context import Context), como desde pl0.py.
+statement() genera instrucciones al azar para las pruebas de
+optimize, cfg y dataflow.
+
+usage: python -m pytest tests
+'''
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+
+
+def relation(rng, depth=2):
+    c = rng.random()
+    if c < 0.3:
+        return f'{rng.randint(0, 3)} {rng.choice(["<", "<=", ">", ">=", "==", "!="])} {rng.randint(0, 3)}'
+    if c < 0.5 and depth:
+        return f'({relation(rng, depth - 1)}) {rng.choice(["and", "or"])} ({relation(rng, depth - 1)})'
+    if c < 0.6 and depth:
+        return f'not ({relation(rng, depth - 1)})'
+    return f'v{rng.randint(0, 3)} {rng.choice(["<", ">", "=="])} {rng.randint(0, 6)}'
+
+
+def statement(rng, depth, inloop):
+    '''
+    Instrucción al azar con las variables int v0 ... v3 y k, que tiene
+    que empezar en 0: cada while sale después de 30 vueltas.
+    '''
+    c = rng.random()
+    if depth == 0 or c < 0.3:
+        k = rng.random()
+        if k < 0.15 and inloop:
+            return 'break'
+        if k < 0.25:
+            return f'return v{rng.randint(0, 3)}'
+        if k < 0.5:
+            return f'write(v{rng.randint(0, 3)})'
+        return f'v{rng.randint(0, 3)} := v{rng.randint(0, 3)} + {rng.randint(1, 2)}'
+    if c < 0.55:
+        other = f' else {statement(rng, depth - 1, inloop)}' if rng.random() < 0.5 else ''
+        return f'if {relation(rng)} then {statement(rng, depth - 1, inloop)}{other}'
+    if c < 0.75:
+        return f'while {relation(rng)} do begin {statement(rng, depth - 1, True)}; k := k + 1; if k > 30 then break end'
+    return 'begin ' + '; '.join(statement(rng, depth - 1, inloop) for _ in range(rng.randint(1, 3))) + ' end'
@@ -0,0 +1,49 @@
+# test_batch.py
+'''
+pl0.py -B: cada archivo da los mismos diagnósticos solo o en un lote.
+'''
+from batch import compile_files
+
+CALL_IN_WHILE = '''
+fun f()
+begin
+  return 1
+end
+
+fun main()
+  x: int;
+begin
+  while x < 3 do
+    x := x + f()
+end
+'''
+
+BREAK_OUTSIDE = '''
+fun main()
+  x: int;
+begin
+  x := 1;
+  break
+end
+'''
+
+
+def messages(result):
+    return [d.message for d in result.diagnostics]
+
+
+def test_call_without_arguments_inside_while(tmp_path):
+    path = tmp_path / 'a.pl0'
+    path.write_text(CALL_IN_WHILE)
+    [result] = compile_files([str(path)], jobs=1, cache=False)
+    assert messages(result) == []
+
+
+def test_checker_state_does_not_leak_between_files(tmp_path):
+    a, b = tmp_path / 'a.pl0', tmp_path / 'b.pl0'
+    a.write_text(CALL_IN_WHILE)
+    b.write_text(BREAK_OUTSIDE)
+    [alone] = compile_files([str(b)], jobs=1, cache=False)
+    _, after = compile_files([str(a), str(b)], jobs=1, cache=False)
+    assert messages(alone) == ['Error: Break fuera de un bucle while.']
+    assert messages(after) == messages(alone)
@@ -0,0 +1,153 @@
+# test_bounds.py
+'''
+BoundsAnalysis: los accesos que marca como seguros están dentro del
+rango. Se cuentan los de Pi_Spigot, se prueban accesos que no tiene
+que marcar y se comparan, en programas generados al azar con semilla
+fija, las salidas del intérprete con y sin los chequeos eliminados.
+'''
+import io
+import os
+import random
+
+import pytest
+
+import bounds
+from bounds import BoundsAnalysis
+from cfg import functions, own_nodes
+from conftest import ROOT
+from context import Context
+from interp import Interpreter
+from model import ArrayLocation
+
+
+def analyze(source):
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    assert not context.have_errors, source
+    return context, BoundsAnalysis(context.ast)
+
+
+def accesses(source):
+    '''
+    (función, fuente del acceso, seguro) en el orden del fuente.
+    '''
+    context, analysis = analyze(source)
+    found = [(context.parser.index_position(n)[0], func.name, context.find_source(n), id(n) in analysis.safe)
+             for func in functions(context.ast)
+             for n in own_nodes(func) if isinstance(n, ArrayLocation)]
+    return [access[1:] for access in sorted(found)]
+
+
+def test_pi_spigot():
+    with open(os.path.join(ROOT, 'Pi_Spigot.pl0'), encoding='utf-8') as f:
+        _, analysis = analyze(f.read())
+    assert str(analysis) == 'bounds checks: eliminated 3 of 4'
+
+
+def test_unproven_accesses_are_checked():
+    assert accesses('''
+fun down(len: int)
+  a: int[len + 1];
+  i: int;
+begin
+  i := len;
+  while i >= 0 do begin a[i] := 1; i := i - 1 end;
+  i := len;
+  while i >= -1 do begin a[i] := 2; i := i - 1 end
+end
+
+fun copy(len: int)
+  a: int[len + 1];
+  i: int;
+  j: int;
+begin
+  i := 0;
+  while i <= len do begin
+    j := i;
+    write(a[j]);
+    i := i + 1
+  end;
+  j := i;
+  write(a[j])
+end
+
+fun main()
+begin
+  down(3);
+  copy(3)
+end
+''') == [('down', 'a[i]', True), ('down', 'a[i]', False),
+         ('copy', 'a[j]', True), ('copy', 'a[j]', False)]
+
+
+# Diferencial -----------------------------------------------------------
+class Unproven(BoundsAnalysis):
+    def __init__(self, ast):
+        super().__init__(ast)
+        self.safe = set()
+
+
+def loop(rng):
+    start = rng.choice(['-1', '0', '1', 'len', 'len + 1'])
+    if rng.random() < 0.5:
+        test = f'i {rng.choice(["<", "<="])} {rng.choice(["len", "len + 1", "len - 1", "8"])}'
+        step = 'i := i + 1'
+    else:
+        test = f'i {rng.choice([">", ">="])} {rng.choice(["-1", "0", "1"])}'
+        step = 'i := i - 1'
+    array = rng.choice(['a', 'b'])
+    body = rng.choice([f'{array}[i] := {array}[i] + i', f'write({array}[i])', f'j := i; s := s + {array}[j]'])
+    return f'i := {start}; while {test} do begin {body}; {step} end'
+
+
+def access(rng):
+    index = rng.choice(['i', 'j', 'len', 'len - 1', '0', '2'])
+    array = rng.choice(['a', 'b'])
+    if rng.random() < 0.4:
+        return f'if {index} >= 0 and {index} {rng.choice(["<", "<="])} len then write({array}[{index}])'
+    return f'j := {index}; write({array}[j])'
+
+
+def program(rng):
+    body = '; '.join(loop(rng) if rng.random() < 0.6 else access(rng) for _ in range(rng.randint(2, 5)))
+    return f'''
+fun f(len: int)
+  a: int[len + 1];
+  b: int[8];
+  i: int;
+  j: int;
+  s: int;
+begin
+  {body};
+  write(s)
+end
+
+fun main()
+begin
+  f({rng.choice([0, 3, 7, 12])})
+end
+'''
+
+
+def output(source, monkeypatch, analysis):
+    monkeypatch.setattr(bounds, 'BoundsAnalysis', analysis)
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    out = io.StringIO()
+    try:
+        Interpreter(stdout=out).compile(context.ast)()
+    except Exception as e:
+        out.write(f'{type(e).__name__}: {e}')
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_eliminated_checks_keep_output(seed, monkeypatch):
+    rng = random.Random(seed)
+    eliminated = 0
+    for _ in range(50):
+        source = program(rng)
+        eliminated += analyze(source)[1].eliminated
+        want = output(source, monkeypatch, Unproven)
+        assert output(source, monkeypatch, BoundsAnalysis) == want, source
+    assert eliminated > 0
@@ -0,0 +1,94 @@
+# test_cache.py
+'''
+Cache de análisis en disco (cache.ASTCache): aciertos y fallos, los
+mismos diagnósticos desde el cache, desalojo LRU e invalidación cuando
+cambia un módulo del front-end.
+'''
+import os
+import shutil
+import sys
+
+import cache
+from cache import ASTCache, frontend_files
+from conftest import ROOT
+from context import Context
+
+ILL_TYPED = '''
+fun main()
+  x: int;
+begin
+  x := 1.5;
+  write(x)
+end
+'''
+
+
+def analyze(store, source):
+    context = Context(quiet=True, cache=store)
+    context.analyze(source, check=True)
+    return context
+
+
+def test_hit_after_miss(tmp_path):
+    store = ASTCache(str(tmp_path))
+    first = analyze(store, ILL_TYPED)
+    second = analyze(store, ILL_TYPED)
+    assert (first.cached, second.cached) == (False, True)
+    assert (store.hits, store.misses) == (1, 1)
+    assert second.diagnostics == first.diagnostics
+    assert [(d.message, d.lineno) for d in second.diagnostics] == [('Error assign', 5)]
+    # Un análisis sin checker es otra entrada
+    Context(quiet=True, cache=store).analyze(ILL_TYPED)
+    assert store.misses == 2
+
+
+def test_lru_eviction(tmp_path):
+    store = ASTCache(str(tmp_path))
+    for name in 'abc':
+        store.store(name, {'data': name * 1000})
+    size = max(size for _, size, _ in store.entries())
+    for name, age in zip('abc', (30, 20, 10)):
+        os.utime(store.path(name), (0, 10**9 - age))
+    store.load('a')                     # a pasa a ser la más reciente
+    store.maxsize = 3 * size
+    store.store('d', {'data': 'd' * 1000})
+    assert not os.path.exists(store.path('b'))
+    assert all(os.path.exists(store.path(name)) for name in 'acd')
+    assert store.evictions == 1
+
+
+def test_load_keeps_recursion_limit(tmp_path):
+    store = ASTCache(str(tmp_path))
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(1000)
+    try:
+        store.store('x', [1])
+        store.load('x')
+        assert sys.getrecursionlimit() == 1000
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def test_frontend_includes_checker_imports():
+    files = frontend_files(ROOT)
+    assert {'checker.py', 'typeinfo.py', 'cfg.py', 'resolve.py'} <= set(files)
+    assert 'asmcode.py' not in files
+
+
+def test_frontend_change_invalidates(tmp_path, monkeypatch):
+    for name in os.listdir(ROOT):
+        if name.endswith('.py'):
+            shutil.copy(os.path.join(ROOT, name), tmp_path)
+    monkeypatch.setattr(cache, '_here', str(tmp_path))
+
+    def version():
+        monkeypatch.setattr(cache, '_version', None)
+        return cache.compiler_version()
+
+    before = version()
+    with open(tmp_path / 'asmcode.py', 'a') as f:
+        f.write('# otro backend\n')
+    assert version() == before
+    with open(tmp_path / 'typeinfo.py', 'a') as f:
+        f.write('# otro tipo de retorno\n')
+    assert version() != before
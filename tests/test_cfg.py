@@ -0,0 +1,102 @@
+# test_cfg.py
+'''
+Grafo de flujo: recorrer los bloques de cfg.build() siguiendo las
+aristas y las condiciones da la misma salida que el intérprete, y los
+sucesores y predecesores describen las mismas aristas. Los programas
+se generan al azar con semilla fija.
+'''
+import io
+import random
+
+import pytest
+
+import cfg
+from conftest import statement
+from context import Context
+from interp import Interpreter, idiv
+from model import *
+
+COMPARISONS = {
+    '<': lambda a, b: a < b, '<=': lambda a, b: a <= b, '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b, '==': lambda a, b: a == b, '!=': lambda a, b: a != b,
+}
+ARITHMETIC = {'+': lambda a, b: a + b, '-': lambda a, b: a - b, '*': lambda a, b: a * b, '/': idiv}
+
+
+def evaluate(n, env):
+    if isinstance(n, Integer):
+        return int(n.value)
+    if isinstance(n, SimpleLocation):
+        return env[n.name]
+    if isinstance(n, Binary):
+        return ARITHMETIC[n.op](evaluate(n.left, env), evaluate(n.right, env))
+    if isinstance(n, Logical):
+        if n.op == 'and':
+            return evaluate(n.left, env) and evaluate(n.right, env)
+        if n.op == 'or':
+            return evaluate(n.left, env) or evaluate(n.right, env)
+        return COMPARISONS[n.op](evaluate(n.left, env), evaluate(n.right, env))
+    if isinstance(n, Unary):
+        return not evaluate(n.fact, env) if n.op == 'not' else -evaluate(n.fact, env)
+    raise TypeError(type(n).__name__)
+
+
+def walk(graph, v0, out):
+    '''
+    Ejecuta la función del grafo con v0 y devuelve lo que retorna.
+    '''
+    env = {'v0': v0, 'v1': 0, 'v2': 0, 'v3': 0, 'k': 0}
+    b = graph.entry
+    for _ in range(100000):
+        for node in graph.block(b):
+            if isinstance(node, Assign):
+                env[node.location.name] = evaluate(node.expr, env)
+            elif isinstance(node, Write):
+                out.write(str(evaluate(node.expr, env)))
+            elif isinstance(node, Return):
+                return evaluate(node.value, env)
+        if b == graph.exit:
+            return None
+        succs = graph.successors(b)
+        if graph.condition(b) is not None:
+            b = succs[0] if evaluate(graph.condition(b), env) else succs[1]
+        else:
+            assert len(succs) == 1
+            b = succs[0]
+    raise AssertionError('the walk does not end')
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_walk_matches_interpreter(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        body = '; '.join(statement(rng, 4, False) for _ in range(rng.randint(2, 6)))
+        source = f'''
+fun f(v0: int)
+  v1: int; v2: int; v3: int; k: int;
+begin
+  k := 0; v1 := 1; v2 := 2; v3 := 3;
+  {body};
+  return v1
+end
+
+fun main()
+  r: int;
+begin
+  r := f(0); write(r); r := f(2); write(r)
+end
+'''
+        context = Context(quiet=True)
+        context.analyze(source, check=True)
+        assert not context.have_errors, source
+        want = io.StringIO()
+        Interpreter(stdout=want).compile(context.ast)()
+
+        graph = cfg.build(context.ast)[0]
+        assert graph.func.name == 'f'
+        edges = sorted((b, s) for b in range(graph.nblocks) for s in graph.successors(b))
+        assert edges == sorted((p, b) for b in range(graph.nblocks) for p in graph.predecessors(b))
+        got = io.StringIO()
+        for v0 in (0, 2):
+            got.write(str(walk(graph, v0, got)))
+        assert got.getvalue() == want.getvalue(), source
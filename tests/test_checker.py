@@ -0,0 +1,133 @@
+# test_checker.py
+'''
+Checker: programas válidos sin errores y programas mal tipados
+rechazados antes de llegar a los motores (-R, --vm, -S, -o).
+'''
+import glob
+import os
+
+import pytest
+
+from conftest import ROOT
+from context import Context
+
+VALID = sorted(glob.glob(os.path.join(ROOT, 'test3', '*.pl0'))) + [os.path.join(ROOT, 'Pi_Spigot.pl0')]
+
+
+def check(source):
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    return context
+
+
+def messages(context):
+    return [d.message for d in context.diagnostics]
+
+
+@pytest.mark.parametrize('path', VALID, ids=os.path.basename)
+def test_valid_programs(path):
+    with open(path, encoding='utf-8') as f:
+        assert messages(check(f.read())) == []
+
+
+def test_recursive_function_has_its_return_type():
+    context = check('''
+fun fact(n: int)
+begin
+  if n == 1 then return 1
+  else return n * fact(n - 1)
+end
+
+fun main()
+  x: int;
+begin
+  x := fact(5);
+  write(x)
+end
+''')
+    assert messages(context) == []
+
+
+def test_mutual_recursion():
+    context = check('''
+fun main()
+  x: float;
+  fun even(n: int)
+  begin
+    if n == 0 then return 1.0 else return odd(n - 1)
+  end;
+  fun odd(n: int)
+  begin
+    if n == 0 then return 0.0 else return even(n - 1)
+  end;
+begin
+  x := even(10)
+end
+''')
+    assert messages(context) == []
+
+
+@pytest.mark.parametrize('body, message', [
+    ('a[x] := 2', 'Error index'),
+    ('if x > 1 then a[0] := x', 'Error assign'),
+    ('while n < x do skip', 'Error no bool'),
+    ('n := a', 'Error assign'),
+])
+def test_ill_typed(body, message):
+    context = check(f'''
+fun main()
+  a: int[3];
+  x: float;
+  n: int;
+begin
+  {body}
+end
+''')
+    assert message in messages(context)
+
+
+def test_mixed_return_types():
+    context = check('''
+fun f(n: int)
+begin
+  if n > 0 then return 1 else return 2.0
+end
+
+fun main()
+begin
+  write(f(1))
+end
+''')
+    assert 'Error return' in messages(context)
+
+
+def test_run_stops_at_checker_errors(capsys):
+    context = check('''
+fun main()
+  a: int[3];
+  x: float;
+begin
+  x := 1.5;
+  a[x] := 2
+end
+''')
+    assert context.have_errors
+    assert context.run() is None
+
+
+def test_errors_have_lines():
+    context = check('''
+fun main()
+  x: int;
+  y: float;
+begin
+  x := 1;
+  x := 1.5;
+  if x < y then write(x)
+end
+''')
+    assert [(d.message, d.lineno) for d in context.diagnostics] == [
+        ('Error assign', 7),
+        ('error logical < int float', 8),
+        ('Error no bool', 8),
+    ]
@@ -0,0 +1,75 @@
+# test_cli.py
+'''
+pl0.py desde la línea de comandos: combinaciones de opciones que
+terminan bien, y código de salida 1 cuando hay errores.
+'''
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+OUT_OF_RANGE = '''
+fun main()
+  a: int[2];
+  i: int;
+begin
+  i := 5;
+  a[i] := 1
+end
+'''
+ILL_TYPED = '''
+fun main()
+  x: int;
+begin
+  x := 1.5;
+  write(x)
+end
+'''
+
+SUM = '''
+fun sum(n: int)
+begin
+  if n == 0 then return 0;
+  return n + sum(n - 1)
+end
+
+fun main()
+begin
+  write(sum(100000))
+end
+'''
+
+
+def pl0(*args, stdin=''):
+    return subprocess.run([sys.executable, 'pl0.py', *args], cwd=ROOT, input=stdin,
+                          capture_output=True, text=True)
+
+
+def test_memo_with_cache_stats():
+    result = pl0('-R', '-M', '--cache-stats', 'test3/fib.pl0', stdin='15\n')
+    assert result.returncode == 0, result.stderr
+    assert '610' in result.stdout
+    assert 'memo fib:' in result.stderr
+    assert 'cache:' in result.stdout
+
+
+@pytest.mark.parametrize('args, source', [
+    (['-R'], OUT_OF_RANGE), (['-R', '--vm'], OUT_OF_RANGE),
+    (['-R', '--ssa'], OUT_OF_RANGE),
+    (['-R'], ILL_TYPED), (['-R', '--vm'], ILL_TYPED), (['-R', '--ssa'], ILL_TYPED), (['-I'], ILL_TYPED),
+], ids=['R-runtime', 'vm-runtime', 'ssa-runtime', 'R-checker', 'vm-checker', 'ssa-checker', 'I-checker'])
+def test_errors_exit_1(args, source, tmp_path):
+    path = tmp_path / 'bad.pl0'
+    path.write_text(source, encoding='utf-8')
+    assert pl0(*args, str(path)).returncode == 1
+
+
+def test_ssa_runs_tail_calls(tmp_path):
+    # Solo ssa.Machine corre la pasada de recursión de cola
+    path = tmp_path / 'sum.pl0'
+    path.write_text(SUM, encoding='utf-8')
+    result = pl0('-R', '--ssa', str(path))
+    assert (result.returncode, result.stdout) == (0, '5000050000'), result.stderr
+    assert pl0('-R', str(path)).returncode == 1
@@ -0,0 +1,86 @@
+# test_daemon.py
+'''
+El compilador residente: un servidor en un hilo sobre un socket
+temporal, atendiendo check, run e ir sobre un archivo que se edita
+mientras el servidor lo vigila.
+'''
+import threading
+import time
+
+import pytest
+
+import daemon
+
+GOOD = '''\
+fun main()
+  x: int;
+begin
+  read(x);
+  write(x * 2)
+end
+'''
+
+ILL_TYPED = '''\
+fun main()
+  x: int;
+begin
+  x := 1.5;
+  write(x)
+end
+'''
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / 'daemon.sock')
+    thread = threading.Thread(target=daemon.serve, args=(path, 0.05), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            daemon.request({'cmd': 'status'}, path)
+            break
+        except OSError:
+            assert time.monotonic() < deadline, 'el servidor no arrancó'
+            time.sleep(0.02)
+    yield path
+    daemon.request({'cmd': 'stop'}, path)
+    thread.join(5)
+
+
+def diagnostics(response):
+    return [(stage, lineno) for stage, _, lineno in response['diagnostics']]
+
+
+def test_check_and_run(server, tmp_path):
+    fname = tmp_path / 'prog.pl0'
+    fname.write_text(GOOD, encoding='utf-8')
+    response = daemon.request({'cmd': 'check', 'file': str(fname)}, server)
+    assert (response['diagnostics'], response['exit']) == ([], 0)
+    for vm in (False, True):
+        response = daemon.request({'cmd': 'run', 'file': str(fname), 'stdin': '21\n', 'vm': vm}, server)
+        assert (response['output'], response['exit']) == ('42', 0)
+
+
+def test_errors_refuse_run(server, tmp_path):
+    fname = tmp_path / 'prog.pl0'
+    fname.write_text(ILL_TYPED, encoding='utf-8')
+    for cmd in ('check', 'run', 'ir'):
+        response = daemon.request({'cmd': cmd, 'file': str(fname)}, server)
+        assert response['output'] == ''
+        assert diagnostics(response) == [('checker', 4)]
+        assert response['exit'] == 1
+
+
+def test_watcher_picks_up_edit(server, tmp_path):
+    fname = tmp_path / 'prog.pl0'
+    fname.write_text(GOOD, encoding='utf-8')
+    assert daemon.request({'cmd': 'check', 'file': str(fname)}, server)['exit'] == 0
+    fname.write_text(ILL_TYPED, encoding='utf-8')
+    time.sleep(0.3)
+    response = daemon.request({'cmd': 'check', 'file': str(fname)}, server)
+    assert diagnostics(response) == [('checker', 4)]
+    fname.write_text(GOOD.replace('x * 2', 'x * 3'), encoding='utf-8')
+    time.sleep(0.3)
+    response = daemon.request({'cmd': 'run', 'file': str(fname), 'stdin': '5\n'}, server)
+    assert (response['output'], response['exit']) == ('15', 0)
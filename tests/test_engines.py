@@ -0,0 +1,194 @@
+# test_engines.py
+'''
+Errores en tiempo de ejecución: el intérprete (-R) y la VM (--vm) los
+reportan como diagnósticos, sin tracebacks de Python. Los programas
+válidos dan la misma salida en los dos, en el código nativo (-o) y
+memoizando las funciones puras (-M).
+'''
+import io
+import shutil
+import subprocess
+
+import pytest
+
+import ssa
+from context import Context
+from interp import Interpreter, PL0RuntimeError
+
+DEEP = '''
+fun r(n: int)
+begin
+  if n == 0 then return 0
+  else return r(n - 1) + 1
+end
+
+fun main()
+begin
+  write(r(100000))
+end
+'''
+
+
+def run(source, vm):
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    assert not context.have_errors
+    context.run(vm=vm)
+    return [d.message for d in context.diagnostics]
+
+
+@pytest.mark.parametrize('vm', [False, True], ids=['interp', 'vm'])
+def test_deep_recursion_is_a_stack_overflow(vm, capsys):
+    assert run(DEEP, vm) == ['Stack overflow']
+
+
+FLOAT_IN_INT_ARRAY = '''
+fun main()
+  a: int[3];
+  x: float;
+begin
+  x := 1.5;
+  a[0] := x;
+  write(a[0])
+end
+'''
+
+
+@pytest.mark.parametrize('vm', [False, True], ids=['interp', 'vm'])
+def test_float_in_int_array_unchecked(vm):
+    # Sin el checker (que lo rechaza), el error llega a la ejecución
+    context = Context(quiet=True)
+    context.analyze(FLOAT_IN_INT_ARRAY)
+    assert not context.have_errors
+    context.run(vm=vm)
+    assert [d.message for d in context.diagnostics] == ['Type mismatch in a']
+
+
+RUNTIME_ERRORS = {
+    'load': ('i := 5; write(a[i])', 'Index out of range in a'),
+    'store': ('i := -1; a[i] := 1', 'Index out of range in a'),
+    'division': ('write(1 / i)', 'Division by zero'),
+    'read': ('read(a[1])', "Invalid input 'x' for a"),
+}
+
+
+@pytest.mark.parametrize('stmts, message', RUNTIME_ERRORS.values(), ids=RUNTIME_ERRORS)
+def test_runtime_errors_have_name_and_line(stmts, message, monkeypatch):
+    source = f'''
+fun main()
+  a: int[2];
+  i: int;
+begin
+  {stmts}
+end
+'''
+    found = []
+    for vm in (False, True):
+        monkeypatch.setattr('sys.stdin', io.StringIO('x\n'))
+        context = Context(quiet=True)
+        context.analyze(source, check=True)
+        context.run(vm=vm)
+        found.append([(d.message, d.lineno) for d in context.diagnostics])
+    assert found == [[(message, 6)]] * 2
+
+
+def test_float_in_int_array_ssa():
+    context = Context(quiet=True)
+    context.parse(FLOAT_IN_INT_ARRAY)
+    machine = ssa.Machine(ssa.build(context.ast), stdout=io.StringIO())
+    with pytest.raises(PL0RuntimeError, match='Type mismatch in a'):
+        machine.run()
+
+
+def test_float_in_int_array_is_rejected():
+    context = Context(quiet=True)
+    context.analyze(FLOAT_IN_INT_ARRAY, check=True)
+    assert [d.message for d in context.diagnostics] == ['Error assign']
+
+
+RETURNED_ARRAYS = '''
+fun mk()
+  a: int[3];
+begin
+  a[0] := 417;
+  return a
+end
+
+fun outer()
+  a: int[2];
+  b: int[2];
+  fun inner()
+  begin
+    return b
+  end;
+begin
+  b[1] := 3;
+  return inner()
+end
+
+fun first(c: int[3])
+begin
+  return c[0]
+end
+
+fun second(c: int[2])
+begin
+  return c[1]
+end
+
+fun main()
+begin
+  write(first(mk()));
+  write(first(mk()));
+  write(second(outer()))
+end
+'''
+
+
+def output(source, capsys, vm):
+    assert run(source, vm) == []
+    return capsys.readouterr().out
+
+
+@pytest.mark.skipif(not shutil.which('cc'), reason='no C compiler')
+def test_native_returns_local_array(capsys, tmp_path):
+    want = output(RETURNED_ARRAYS, capsys, False)
+    assert want == output(RETURNED_ARRAYS, capsys, True)
+    context = Context(quiet=True)
+    context.analyze(RETURNED_ARRAYS, check=True)
+    exe = str(tmp_path / 'returned')
+    assert context.executable(exe)
+    result = subprocess.run([exe], capture_output=True, text=True)
+    assert (result.returncode, result.stdout) == (0, want)
+
+
+SHARED_RETURN = '''
+fun mk()
+  a: int[3];
+begin
+  return a
+end
+
+fun inc(c: int[3])
+begin
+  c[0] := c[0] + 1;
+  return c[0]
+end
+
+fun main()
+begin
+  write(inc(mk()));
+  write(inc(mk()));
+  write(inc(mk()))
+end
+'''
+
+
+@pytest.mark.parametrize('memo', [0, 1024], ids=['plain', 'memo'])
+def test_memo_keeps_returned_arrays_apart(memo):
+    # Cada llamada a mk() devuelve un array nuevo, memoizando o no
+    context = Context(quiet=True)
+    context.analyze(SHARED_RETURN, check=True)
+    out = io.StringIO()
+    Interpreter(stdout=out, memo=memo).compile(context.ast)()
+    assert out.getvalue() == '111'
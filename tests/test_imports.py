@@ -0,0 +1,43 @@
+# test_imports.py
+'''
+Arranque de pl0.py: las bibliotecas de presentación (rich, prettytable,
+graphviz) se cargan solo para --dot, --png, --sym o las tablas de
+depuración, nunca al chequear o ejecutar. Los módulos cargados salen
+de python -X importtime, como en bench.py imports.
+'''
+import subprocess
+import sys
+
+import pytest
+
+from bench import import_times
+from conftest import ROOT
+
+PRESENTATION = ('rich', 'prettytable', 'graphviz')
+
+
+def loaded(stderr):
+    return {line.split('|')[-1].strip().split('.')[0]
+            for line in stderr.splitlines() if line.startswith('import time:') and '|' in line}
+
+
+@pytest.mark.parametrize('module', ['pl0', 'context', 'batch', 'incremental'])
+def test_import_skips_presentation(module):
+    names = {name.split('.')[0] for name, _, _ in import_times(module)}
+    assert module in names
+    assert names.isdisjoint(PRESENTATION)
+
+
+@pytest.mark.parametrize('args', [['-R'], ['--vm']], ids=lambda args: args[0])
+def test_run_skips_presentation(args):
+    out = subprocess.run([sys.executable, '-X', 'importtime', 'pl0.py', *args, 'test3/hello.pl0'],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    names = loaded(out.stderr)
+    assert 'context' in names
+    assert names.isdisjoint(PRESENTATION)
+
+
+@pytest.mark.parametrize('module', ['checker', 'ssa'])
+def test_front_end_skips_native_backend(module):
+    names = {name for name, _, _ in import_times(module)}
+    assert names.isdisjoint({'asmcode', 'bounds', 'subprocess', 'tempfile'})
@@ -0,0 +1,151 @@
+# test_optimize.py
+'''
+ConstantFolder y DeadCodeEliminator: los programas dan la misma salida
+en el intérprete y en la VM antes y después de Context.optimize().
+Los programas se generan al azar con semilla fija: expresiones int y
+float para el plegado, e if, while, break y return anidados para el
+código muerto.
+'''
+import io
+import random
+
+import pytest
+
+from conftest import statement
+from asmcode import AsmGenerator
+from context import Context
+from interp import Interpreter
+from ircode import IRGenerator, VM
+
+
+def run(ast, vm):
+    out = io.StringIO()
+    try:
+        if vm:
+            VM(IRGenerator.gencode(ast), io.StringIO(''), out).run()
+        else:
+            Interpreter(stdin=io.StringIO(''), stdout=out).compile(ast)()
+    except Exception as e:
+        # Un error en ejecución también tiene que ser el mismo
+        out.write(f'{type(e).__name__}: {e}')
+    return out.getvalue()
+
+
+def outputs(source, optimize):
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    assert not context.have_errors, source
+    if optimize:
+        context.optimize()
+    return run(context.ast, False), run(context.ast, True)
+
+
+def assert_same(source):
+    assert outputs(source, True) == outputs(source, False), source
+
+
+# Plegado ---------------------------------------------------------------
+def expression(rng, depth, dtype):
+    if depth == 0 or rng.random() < 0.25:
+        if rng.random() < 0.4:
+            return rng.choice(['a', 'b', 'c'] if dtype == 'int' else ['x', 'y'])
+        if dtype == 'int':
+            return str(rng.choice([0, 1, 2, 3, 7, 10, 100]))
+        return rng.choice(['0.0', '1.0', '2.5', '0.1', '3.0'])
+    c = rng.random()
+    if c < 0.6:
+        return f'({expression(rng, depth - 1, dtype)} {rng.choice("+-*/")} {expression(rng, depth - 1, dtype)})'
+    if c < 0.75:
+        return f'{rng.choice("+-")}{expression(rng, depth - 1, dtype)}'
+    return f'{dtype}({expression(rng, depth - 1, rng.choice(["int", "float"]))})'
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_fold_random_expressions(seed):
+    rng = random.Random(seed)
+    for _ in range(60):
+        dtype = rng.choice(['int', 'float'])
+        assert_same(f'''
+fun main()
+  a: int; b: int; c: int; x: float; y: float; r: {dtype};
+begin
+  a := 5; b := -3; c := 0; x := -0.0; y := 2.5;
+  r := {expression(rng, 5, dtype)};
+  write(r)
+end
+''')
+
+
+@pytest.mark.parametrize('expr', ['100000000000 * 100000000000', '-(9223372036854775807 + 1)',
+                                  'int(1.0e30)', '-9223372036854775807 - 2'])
+def test_fold_keeps_int_outside_64_bits(expr):
+    source = f'''
+fun main()
+begin
+  write({expr})
+end
+'''
+    assert_same(source)
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    context.optimize()
+    # Sin el plegado asmcode genera el cálculo en vez de una constante
+    # que no entra en un registro
+    AsmGenerator.gencode(context.ast)
+
+
+# Código muerto ---------------------------------------------------------
+@pytest.mark.parametrize('seed', range(4))
+def test_dce_random_programs(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        body = '; '.join(statement(rng, 3, False) for _ in range(rng.randint(2, 5)))
+        unused = ' '.join(f'u{k}: int;' for k in range(rng.randint(0, 3)))
+        assert_same(f'''
+fun f(v0: int)
+  v1: int; v2: int; v3: int; k: int; {unused}
+begin
+  k := 0; v1 := 1; v2 := 2; v3 := 3;
+  {body};
+  return v1
+end
+
+fun main()
+  r: int;
+begin
+  r := f(0); write(r); r := f(2); write(r)
+end
+''')
+
+
+@pytest.mark.parametrize('dim', ['f(3)', 'f(3) + 1', '6 / f(0)', 'b[2]'])
+def test_dce_keeps_array_with_effects_in_dim(dim):
+    assert_same(f'''
+fun f(n: int)
+begin
+  write(n);
+  return n
+end
+
+fun main()
+  b: int[2];
+  a: int[{dim}];
+begin
+  write(1)
+end
+''')
+
+
+def test_dce_removes_unused_variables():
+    context = Context(quiet=True)
+    context.analyze('''
+fun main()
+  n: int;
+  a: int[n * 2 + 1];
+  x: float;
+begin
+  write(n)
+end
+''', check=True)
+    _, stats = context.optimize()
+    assert stats.variables == 2
@@ -0,0 +1,28 @@
+# test_scanner.py
+'''
+Scanner escrito a mano contra el Lexer de SLY: los mismos tokens (tipo,
+valor, línea y posición) y los mismos errores en cada archivo de
+prueba.
+'''
+import glob
+import os
+
+import pytest
+
+from conftest import ROOT
+from plex import Lexer, Scanner
+
+FILES = sorted(glob.glob(os.path.join(ROOT, 'test[0-9]', '**', '*.pl0'), recursive=True))
+
+
+def token_stream(lexer, source):
+    lex = lexer(quiet=True)
+    tokens = [(t.type, t.value, t.lineno, t.index, t.end) for t in lex.tokenize(source)]
+    return tokens, [(d.message, d.lineno, d.code) for d in lex.diagnostics]
+
+
+@pytest.mark.parametrize('path', FILES, ids=lambda path: os.path.relpath(path, ROOT))
+def test_same_tokens(path):
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    assert token_stream(Scanner, source) == token_stream(Lexer, source)
@@ -0,0 +1,140 @@
+# test_ssa.py
+'''
+El IR SSA después de PassManager da la misma salida que el intérprete.
+Los programas se generan al azar con semilla fija con lo que buscan
+las pasadas: recursión de cola, funciones chicas para copiar en la
+llamada, ciclos con i * c y cálculos invariantes, arrays y variables
+usadas desde una función anidada.
+'''
+import io
+import os
+import random
+
+import pytest
+
+import ssa
+from conftest import ROOT, statement
+from context import Context
+from interp import Interpreter
+
+
+def parse(source):
+    context = Context(quiet=True)
+    context.analyze(source, check=True)
+    assert not context.have_errors, source
+    return context.ast
+
+
+def interpreted(source):
+    out = io.StringIO()
+    try:
+        Interpreter(stdin=io.StringIO(''), stdout=out).compile(parse(source))()
+    except Exception as e:
+        out.write(f'{type(e).__name__}: {e}')
+    return out.getvalue()
+
+
+def optimized(source, passes=None):
+    '''
+    Salida y Machine que ejecutó el módulo después de las pasadas.
+    '''
+    module = ssa.build(parse(source))
+    ssa.PassManager(passes).run(module)
+    out = io.StringIO()
+    machine = ssa.Machine(module, io.StringIO(''), out)
+    try:
+        machine.run()
+    except Exception as e:
+        out.write(f'{type(e).__name__}: {e}')
+    return out.getvalue(), machine
+
+
+def extra(rng):
+    j, m = rng.randint(0, 3), rng.randint(0, 3)
+    return rng.choice([
+        f'v{j} := g(v{m}, {rng.randint(1, 3)})',
+        f'v{j} := t(v{m}, {rng.randint(0, 2)})',
+        f'v{j} := a[{rng.randint(0, 7)}] * {rng.randint(1, 3)}',
+        f'a[{rng.randint(0, 7)}] := v{j} + v{m}',
+        f'bump(v{j})',
+        f'i := 0; while i < 8 do begin a[i] := a[i] + i * {rng.randint(2, 5)} + v{j} * {rng.randint(1, 3)}; i := i + 1 end',
+    ])
+
+
+def program(rng):
+    body = '; '.join(extra(rng) if rng.random() < 0.4 else statement(rng, 3, False)
+                     for _ in range(rng.randint(3, 7)))
+    return f'''
+fun g(x: int, y: int)
+begin
+  return x - (x / y) * y
+end
+
+fun t(n: int, acc: int)
+begin
+  if n <= 0 then return acc;
+  return t(n - 1, acc + n * 2)
+end
+
+fun f(v0: int)
+  v1: int; v2: int; v3: int; k: int; i: int;
+  a: int[8];
+  fun bump(x: int)
+  begin
+    v1 := v1 + 1;
+    a[v1 - (v1 / 8) * 8] := x
+  end;
+begin
+  k := 0; v1 := 1; v2 := 2; v3 := 3;
+  i := 0;
+  while i < 8 do begin a[i] := i * 3 + v0; i := i + 1 end;
+  {body};
+  i := 0;
+  while i < 8 do begin write(a[i]); i := i + 1 end;
+  return v1 + v2 * v3
+end
+
+fun main()
+  r: int;
+begin
+  r := f(0); write(r); r := f(5); write(r)
+end
+'''
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_passes_keep_output(seed):
+    rng = random.Random(seed)
+    for _ in range(30):
+        source = program(rng)
+        assert optimized(source)[0] == interpreted(source), source
+
+
+def test_tail_call_runs_deep_recursion():
+    source = '''
+fun sum(n: int)
+begin
+  if n == 0 then return 0;
+  return n + sum(n - 1)
+end
+
+fun main()
+begin
+  write(sum(100000))
+end
+'''
+    assert optimized(source, [])[0] == 'PL0RuntimeError: Stack overflow'
+    out, machine = optimized(source, [('tailcall', ssa.tail_calls)])
+    assert (out, machine.calls) == ('5000050000', 2)
+
+
+def test_inline_removes_mod_and_writeln_calls():
+    with open(os.path.join(ROOT, 'Pi_Spigot.pl0'), encoding='utf-8') as f:
+        source = f.read().replace('n := 1000', 'n := 30')
+    want = interpreted(source)
+    # main, spigot y writeln, y mod len + 1 veces por cada uno de los
+    # n = 30 dígitos (len = 100)
+    out, machine = optimized(source, [])
+    assert (out, machine.calls) == (want, 3 + 30 * 101)
+    out, machine = optimized(source)
+    assert (out, machine.calls) == (want, 2)
@@ -0,0 +1,91 @@
+# typeinfo.py
+'''
+Tipos sin generar código
+========================
+El tipo de una variable, de una expresión y el de retorno de cada
+función, a partir de los enlaces del Resolver y de los literales. Los
+usan el checker, el generador de SSA y el de código nativo; solo
+dependen de model y de typesys.
+'''
+from model import *
+from typesys import bool_type, check_binary_code, float_type, int_type, lookup_type, opcodes
+
+
+def datatype(decl):
+    '''
+    Tipo canónico de una variable o parámetro; el ArrayType mismo si
+    es un array usado sin índice.
+    '''
+    if isinstance(decl.datatype, ArrayType):
+        return decl.datatype
+    return lookup_type(decl.datatype.name)
+
+
+def element_type(decl):
+    return lookup_type(decl.datatype.name)
+
+
+def expr_type(n, returns):
+    '''
+    Tipo de una expresión sin generar código. returns tiene el tipo
+    de retorno de cada función (id de la FunDefinition).
+    '''
+    if isinstance(n, Integer):
+        return int_type
+    if isinstance(n, Float):
+        return float_type
+    if isinstance(n, SimpleLocation):
+        return datatype(n.binding.decl)
+    if isinstance(n, ArrayLocation):
+        return element_type(n.binding.decl)
+    if isinstance(n, TypeCast):
+        return lookup_type(n.name)
+    if isinstance(n, Logical):
+        return bool_type
+    if isinstance(n, Unary):
+        return bool_type if n.op == 'not' else expr_type(n.fact, returns)
+    if isinstance(n, Binary):
+        left = expr_type(n.left, returns)
+        return check_binary_code(opcodes[n.op], left, expr_type(n.right, returns)) or left
+    if isinstance(n, FuncCall):
+        return returns.get(id(n.binding.decl))
+    return None
+
+
+def return_types(functions, known=None, default=int_type):
+    '''
+    Tipo de retorno de cada función según sus Return, hasta un punto
+    fijo (una función puede devolver lo que devuelve otra que se define
+    después). known tiene los tipos ya sabidos de otras funciones. Sin
+    ningún Return tipado queda default: int, como el 0 que devuelve, o
+    None para dejarla sin tipo.
+    '''
+    returns = dict(known or {})
+    stmts = {}
+    for func in functions:
+        found = stmts[id(func)] = []
+        stack = [func.stmtlist]
+        while stack:
+            n = stack.pop()
+            if isinstance(n, list):
+                stack.extend(n)
+            elif isinstance(n, Return):
+                found.append(n)
+            elif isinstance(n, Stmt):
+                stack.extend(children(n))
+    changed = True
+    while changed:
+        changed = False
+        for func in functions:
+            if id(func) in returns:
+                continue
+            for ret in stmts[id(func)]:
+                dtype = expr_type(ret.value, returns)
+                if dtype is not None:
+                    returns[id(func)] = dtype
+                    changed = True
+                    break
+    if default is not None:
+        for func in functions:
+            returns.setdefault(id(func), default)
+    return returns
@@ -12,8 +12,24 @@ Una forma de lograr todos estos objetivos es comenzar con algún tipo de enfoqu
 Puedes regresar y refactorizar el sistema de tipos más tarde.
 '''
 
+import copyreg
+
+from model import SimpleType
+
+# Canonical type objects. There is exactly one instance per primitive
+# type, so types can be compared by identity (t is int_type)
+int_type   = SimpleType('int')
+float_type = SimpleType('float')
+bool_type  = SimpleType('bool')
+
+_types = {
+  'int'   : int_type,
+  'float' : float_type,
+  'bool'  : bool_type,
+}
+
 # Set of valid typenames
-typenames = { 'int', 'float', 'bool' }
+typenames = set(_types)
 
 # Table of all supported binary operations and result types
 _binary_ops = {
@@ -66,22 +82,67 @@ _unary_ops = {
   ('not', 'bool') : 'bool',
 }
 
+# Integer codes
+# -------------
+# Operators and types are interned to small integers so the checker can
+# look up an operation in a flat list instead of building and hashing a
+# (op, left, right) tuple of strings. The dicts above remain the
+# declaration of the type rules; the tables below are derived from them.
+opnames = ['+', '-', '*', '/', '<', '<=', '>', '>=', '==', '!=', 'and', 'or', 'not']
+opcodes = { op: code for code, op in enumerate(opnames) }
+
+_typelist = [ int_type, float_type, bool_type ]
+for code, t in enumerate(_typelist):
+  t.code = code
+NTYPES = len(_typelist)
+
+_binary_table = [ None ] * (len(opnames) * NTYPES * NTYPES)
+for (op, left, right), result in _binary_ops.items():
+  _binary_table[(opcodes[op] * NTYPES + _types[left].code) * NTYPES + _types[right].code] = _types[result]
+
+_unary_table = [ None ] * (len(opnames) * NTYPES)
+for (op, expr), result in _unary_ops.items():
+  _unary_table[opcodes[op] * NTYPES + _types[expr].code] = _types[result]
+
 def lookup_type(name):
   # Given the name of a primitive type, this looks up the
-  # appropriate "type" object here.  For starting out, types are
-  # just names, but later on they could be more advanced objects.
-  if name in typenames:
-    return name
-  else:
+  # appropriate "type" object here (one of int_type, float_type or
+  # bool_type). Returns None for unknown names.
+  return _types.get(name)
+
+def _reduce_type(t):
+  # Canonical types are pickled by name so that they load back as the
+  # same object and identity comparisons keep working on cached ASTs
+  if _types.get(t.name) is t:
+    return (lookup_type, (t.name,))
+  return (SimpleType, (t.name,))
+
+copyreg.pickle(SimpleType, _reduce_type)
+
+def check_binary_code(op, left, right):
+  # Check a binary operation given the operator code and the canonical
+  # type objects of both operands. Returns the result type object or
+  # None if not supported (or if an operand type is unknown).
+  try:
+    return _binary_table[(op * NTYPES + left.code) * NTYPES + right.code]
+  except (AttributeError, TypeError):
+    return None
+
+def check_unary_code(op, expr):
+  # Same as check_binary_code for unary operations.
+  try:
+    return _unary_table[op * NTYPES + expr.code]
+  except (AttributeError, TypeError):
     return None
 
 def check_binary_op(op, left, right):
   # Check if a binary operation is allowed or not.  Returns the
   # result type or None if not supported.
-  return _binary_ops.get((op, left, right))
+  result = check_binary_code(opcodes.get(op), _types.get(left), _types.get(right))
+  return result.name if result else None
 
 def check_unary_op(op, expr):
   # Check if a unary operation is allowed or not. Returns the result
   # type or None if not supported.
-  return _unary_ops.get((op, expr))
-
+  result = check_unary_code(opcodes.get(op), _types.get(expr))
+  return result.name if result else None